@@ -0,0 +1,147 @@
+# BSD 3-Clause License
+#
+# Copyright (c) 2024, ddelange, <ddelange@delange.dev>
+#
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#
+# 1. Redistributions of source code must retain the above copyright notice, this
+#    list of conditions and the following disclaimer.
+#
+# 2. Redistributions in binary form must reproduce the above copyright notice,
+#    this list of conditions and the following disclaimer in the documentation
+#    and/or other materials provided with the distribution.
+#
+# 3. Neither the name of the copyright holder nor the names of its
+#    contributors may be used to endorse or promote products derived from
+#    this software without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+# DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE
+# FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL
+# DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR
+# SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER
+# CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY,
+# OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+# OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+#
+# SPDX-License-Identifier: BSD-3-Clause
+"""Benchmark suite comparing mapply to plain pandas apply.
+
+Requires pytest-benchmark. Run with ``make bench``, or select benchmarks with e.g.:
+::
+
+    python -m pytest benchmarks -o addopts="" -o python_files="bench_*.py" \
+        -o python_functions="bench_*" -k series
+
+After the pytest-benchmark tables, a summary lists the speedup of mapply over apply
+for each case, and the smallest amount of rows from which mapply is faster.
+"""
+
+import multiprocess
+import numpy as np
+import pandas as pd
+import pytest
+
+import mapply
+from mapply import parallel
+
+ENGINES = ("apply", "mapply")
+N_ROWS = (1_000, 10_000, 100_000)
+
+
+def cheap(x):
+    """Cost of a vectorizable one-liner."""
+    return x * 2
+
+
+def heavy(x):
+    """Cost of a pure-Python loop (~10µs)."""
+    total = 0
+    for i in range(200):
+        total += i
+    return x + total
+
+
+COSTS = {"cheap": cheap, "heavy": heavy}
+
+
+@pytest.fixture(autouse=True)
+def _init():
+    mapply.init(progressbar=False)
+
+
+def _apply(obj, engine, func, **kwargs):
+    return getattr(obj, engine)(func, **kwargs)
+
+
+def _frame(n_rows, n_cols=4):
+    rng = np.random.default_rng(1)
+    return pd.DataFrame(
+        rng.integers(0, 300, size=(n_rows, n_cols)),
+        columns=[f"c{i}" for i in range(n_cols)],
+    )
+
+
+@pytest.mark.parametrize("engine", ENGINES)
+@pytest.mark.parametrize("n_rows", N_ROWS)
+@pytest.mark.parametrize("cost", COSTS)
+def bench_series(measure, engine, n_rows, cost):  # noqa: D103
+    measure(_apply, _frame(n_rows).c0, engine, COSTS[cost])
+
+
+@pytest.mark.parametrize("engine", ENGINES)
+@pytest.mark.parametrize("n_rows", N_ROWS[:2])
+@pytest.mark.parametrize("n_cols", [4, 64])
+@pytest.mark.parametrize("cost", COSTS)
+def bench_dataframe_axis1(measure, engine, n_rows, n_cols, cost):  # noqa: D103
+    measure(_apply, _frame(n_rows, n_cols), engine, COSTS[cost], axis=1)
+
+
+@pytest.mark.parametrize("engine", ENGINES)
+@pytest.mark.parametrize("n_rows", N_ROWS)
+@pytest.mark.parametrize("n_cols", [64, 1_024])
+def bench_dataframe_axis0(measure, engine, n_rows, n_cols):  # noqa: D103
+    measure(_apply, _frame(n_rows, n_cols), engine, np.median, axis=0)
+
+
+@pytest.mark.parametrize("engine", ENGINES)
+@pytest.mark.parametrize("n_groups", [8, 1_000])
+def bench_groupby(measure, engine, n_groups):  # noqa: D103
+    df = _frame(100_000)
+    df["key"] = np.arange(len(df)) % n_groups
+    measure(_apply, df.groupby("key"), engine, lambda g: g.c1.rank().mean())
+
+
+@pytest.mark.parametrize("engine", ENGINES)
+@pytest.mark.parametrize("n_groups", [8, 100])
+@pytest.mark.parametrize("window", ["rolling", "expanding"])
+def bench_window_groupby(measure, engine, n_groups, window):  # noqa: D103
+    df = _frame(20_000, 2)
+    df["key"] = np.arange(len(df)) % n_groups
+    grouped = df.groupby("key")
+    windowed = grouped.rolling(10) if window == "rolling" else grouped.expanding()
+    measure(_apply, windowed, engine, np.mean, raw=True)
+
+
+@pytest.mark.parametrize("chunk_size", [1, 100, 10_000, "auto"])
+@pytest.mark.parametrize("max_chunks_per_worker", [0, 1, 8])
+def bench_chunking(measure, chunk_size, max_chunks_per_worker):  # noqa: D103
+    mapply.init(
+        progressbar=False,
+        chunk_size=chunk_size,
+        max_chunks_per_worker=max_chunks_per_worker,
+    )
+    measure(_apply, _frame(100_000).c0, "mapply", heavy)
+
+
+@pytest.mark.parametrize("start_method", multiprocess.get_all_start_methods())
+@pytest.mark.parametrize("pool_engine", parallel.ENGINES)
+def bench_pool(measure, monkeypatch, start_method, pool_engine):  # noqa: D103
+    monkeypatch.setattr(parallel, "CONTEXT", multiprocess.get_context(start_method))
+    mapply.init(progressbar=False, engine=pool_engine)
+    measure(_apply, _frame(100_000).c0, "mapply", heavy)
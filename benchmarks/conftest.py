@@ -0,0 +1,95 @@
+# BSD 3-Clause License
+#
+# Copyright (c) 2024, ddelange, <ddelange@delange.dev>
+#
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#
+# 1. Redistributions of source code must retain the above copyright notice, this
+#    list of conditions and the following disclaimer.
+#
+# 2. Redistributions in binary form must reproduce the above copyright notice,
+#    this list of conditions and the following disclaimer in the documentation
+#    and/or other materials provided with the distribution.
+#
+# 3. Neither the name of the copyright holder nor the names of its
+#    contributors may be used to endorse or promote products derived from
+#    this software without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+# DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE
+# FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL
+# DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR
+# SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER
+# CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY,
+# OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+# OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+#
+# SPDX-License-Identifier: BSD-3-Clause
+"""Fixtures and reporting for the benchmark suite, see bench_mapply.py."""
+
+from collections import defaultdict
+
+import pytest
+
+ROUNDS = 3
+
+# {(benchmark name, case): {engine: median seconds}}
+MEDIANS: dict[tuple[str, tuple[tuple[str, object], ...]], dict[str, float]] = (
+    defaultdict(dict)
+)
+
+
+def _format(name, case):
+    return f"{name}[{', '.join(f'{key}={value}' for key, value in case)}]"
+
+
+@pytest.fixture
+def measure(benchmark, request):
+    """Benchmark fn, and record its median runtime for the speedup summary."""
+    params = dict(request.node.callspec.params)
+    engine = params.pop("engine", "mapply")
+    case = tuple(sorted(params.items()))
+    benchmark.group = _format(request.node.originalname, case)
+
+    def run(fn, *args, **kwargs):
+        benchmark.pedantic(fn, args, kwargs, rounds=ROUNDS, iterations=1)
+        MEDIANS[request.node.originalname, case][engine] = benchmark.stats.stats.median
+
+    return run
+
+
+def _speedups():
+    for (name, case), medians in sorted(MEDIANS.items(), key=str):
+        if {"apply", "mapply"} <= medians.keys():
+            yield name, case, medians["apply"] / medians["mapply"]
+
+
+def pytest_terminal_summary(terminalreporter):
+    """Print the speedup of mapply over apply, and break-even points per n_rows."""
+    speedups = list(_speedups())
+    if not speedups:
+        return
+
+    write = terminalreporter.write_line
+    terminalreporter.section("mapply speedup over apply (median)")
+    for name, case, speedup in speedups:
+        write(f"{_format(name, case)}: {speedup:.2f}x")
+
+    # smallest n_rows for which mapply beats apply, for each case apart from n_rows
+    break_even: dict[tuple[str, tuple], list[tuple[int, float]]] = defaultdict(list)
+    for name, case, speedup in speedups:
+        params = dict(case)
+        if "n_rows" in params:
+            n_rows = params.pop("n_rows")
+            break_even[name, tuple(params.items())].append((n_rows, speedup))
+
+    terminalreporter.section("mapply break-even points")
+    for (name, case), points in sorted(break_even.items(), key=str):
+        faster = [n_rows for n_rows, speedup in sorted(points) if speedup > 1]
+        result = f">= {faster[0]} rows" if faster else "not reached"
+        write(f"{_format(name, case)}: {result}")
@@ -48,26 +48,141 @@ Example usage:
     df = pd.DataFrame({"A": list(range(100))})
 
     df["squared"] = df.A.mapply(lambda x: x ** 2)
+
+Reusing the same workers for many consecutive calls:
+::
+
+    with mapply.Pool(n_workers=-1):
+        for _ in range(100):
+            df.A.mapply(lambda x: x ** 2)
+
+Finding out where time is spent:
+::
+
+    stats = mapply.MapplyStats()
+    df.A.mapply(lambda x: x ** 2, stats=stats)
+    print(stats.summary())
+
+Awaiting results without blocking the event loop:
+::
+
+    squared = await mapply.amapply(df.A, lambda x: x ** 2)
+
+Only recomputing chunks that changed since the previous call:
+::
+
+    df.A.mapply(lambda x: x ** 2, cache="~/.cache/mapply")
+
+Loading an expensive resource once per worker instead of with every chunk:
+::
+
+    def load_model(path):
+        mapply.worker_state()["model"] = joblib.load(path)
+
+    def predict(row):
+        return mapply.worker_state()["model"].predict([row])[0]
+
+    df.mapply(predict, axis=1, initializer=load_model, initargs=("model.pkl",))
+
+Sending a large lookup table to each worker once, instead of with every chunk:
+::
+
+    mapping = mapply.broadcast(big_dict)
+    df.A.mapply(lambda x, mapping: mapping.get(x), args=(mapping,))
+
+Scaling out to workers on other machines, each running ``python -m mapply.cluster``:
+::
+
+    with mapply.Cluster(["node1:7070", "node2:7070"]):
+        df.mapply(featurize, axis=1)
 """
 
-import contextlib
+from collections.abc import Callable
 from functools import partialmethod
-from importlib.metadata import PackageNotFoundError, version
+from os import PathLike
+from typing import TYPE_CHECKING, Any
 
-from mapply.mapply import DEFAULT_CHUNK_SIZE, DEFAULT_MAX_CHUNKS_PER_WORKER
+from mapply._broadcast import Broadcast, broadcast
+from mapply.cache import ChunkCache, as_cache
+from mapply.mapply import (
+    DEFAULT_CHUNK_SIZE,
+    DEFAULT_MAX_CHUNKS_PER_WORKER,
+    PANDAS_ENGINES,
+    amapply,
+    stream,
+)
 from mapply.mapply import mapply as _mapply
+from mapply.parallel import Pool, shutdown, worker_state
+from mapply.stats import MapplyStats
 
-with contextlib.suppress(PackageNotFoundError):
-    __version__ = version("mapply")
+if TYPE_CHECKING:
+    from mapply.cluster import Cluster
 
+__all__ = [
+    "Broadcast",
+    "ChunkCache",
+    "Cluster",
+    "MapplyStats",
+    "Pool",
+    "amapply",
+    "broadcast",
+    "init",
+    "shutdown",
+    "stream",
+    "worker_state",
+]
 
-def init(
+_init_pool: Pool | None = None
+
+
+def __getattr__(name: str) -> Any:
+    """Look up __version__ and Cluster on first access, as their imports are slow.
+
+    Args:
+        name: Name of the attribute.
+
+    Returns:
+        The installed version of mapply, or the :class:`mapply.cluster.Cluster` class.
+
+    Raises:
+        AttributeError: If name is not a module attribute, or mapply isn't installed.
+    """
+    if name == "Cluster":
+        from mapply.cluster import Cluster
+
+        return Cluster
+    if name == "__version__":
+        from importlib.metadata import PackageNotFoundError, version
+
+        try:
+            value = globals()[name] = version("mapply")
+        except PackageNotFoundError:
+            pass
+        else:
+            return value
+    msg = f"module {__name__!r} has no attribute {name!r}"
+    raise AttributeError(msg)
+
+
+def init(  # noqa: PLR0913
     *,
-    n_workers: int = -1,
-    chunk_size: int = DEFAULT_CHUNK_SIZE,
+    n_workers: int | str = -1,
+    chunk_size: int | str = DEFAULT_CHUNK_SIZE,
     max_chunks_per_worker: int = DEFAULT_MAX_CHUNKS_PER_WORKER,
     progressbar: bool = True,
     apply_name: str = "mapply",
+    persistent_pool: bool = False,
+    max_tasks_per_child: int | None = None,
+    engine: str = "auto",
+    transport: str = "pickle",
+    batch: bool = False,
+    ordered: bool = True,
+    cache: str | PathLike | ChunkCache | None = None,
+    initializer: Callable | None = None,
+    initargs: tuple[Any, ...] = (),
+    max_memory: float | None = None,
+    retries: int = 0,
+    split_failed: bool = False,
 ) -> None:
     """Patch Pandas, adding multi-core methods to PandasObject.
 
@@ -77,13 +192,44 @@ def init(
         n_workers: Maximum amount of workers (processes) to spawn. Might be lowered
             depending on chunk_size and max_chunks_per_worker. Will throw a warning if
             set higher than is sensible (see :meth:`mapply.parallel.sensible_cpu_count`).
+            Set to "auto" to only go multi-core if the measured runtime of func makes it
+            pay off, see :meth:`mapply.mapply.mapply`.
         chunk_size: Minimum amount of columns/rows per chunk. Higher value means a higher
             threshold to go multi-core. Set to 1 to let max_chunks_per_worker decide.
+            Set to "auto" to size chunks based on the measured runtime of func.
         max_chunks_per_worker: Upper limit on amount of chunks per worker. Will lower
             n_chunks determined by chunk_size if necessary. Set to 0 to skip this check.
         progressbar: Whether to wrap the chunks in a :meth:`tqdm.auto.tqdm`.
         apply_name: Method name for the patched apply function.
+        persistent_pool: Whether to keep n_workers alive across calls, avoiding the
+            overhead of spawning a new pool for every call. Shut it down with
+            :meth:`mapply.shutdown` or by calling init again without this flag.
+        max_tasks_per_child: Amount of tasks after which a worker of the persistent
+            pool is replaced by a fresh one. Defaults to None, keeping workers warm for
+            the lifetime of the pool, see :class:`mapply.Pool`.
+        engine: Either "processes", or "threads" for functions that release the GIL,
+            or "auto" to let piloting choose, or a pandas engine ("cython", "numba",
+            "python") to pass on to pandas' apply, see :meth:`mapply.mapply.mapply`. A
+            persistent pool of "auto" or a pandas engine uses processes.
+        transport: How chunks are sent to the workers, see :meth:`mapply.mapply.mapply`.
+        batch: Whether to call func once per chunk instead of once per column/row, see
+            :meth:`mapply.mapply.mapply`.
+        ordered: Whether to process chunks in order, see :meth:`mapply.mapply.mapply`.
+        cache: A directory (or :class:`mapply.cache.ChunkCache`) to store chunk results
+            in, such that repeated calls only recompute chunks that changed, see
+            :meth:`mapply.mapply.mapply`.
+        initializer: Function to run once in every worker, e.g. to load a model into
+            :meth:`mapply.worker_state`, see :meth:`mapply.mapply.mapply`. With
+            persistent_pool, it runs once per worker for the lifetime of the pool.
+        initargs: Positional arguments to pass to initializer.
+        max_memory: Memory budget in bytes, or as a fraction (up to 1.0) of the
+            available memory, to throttle chunks in flight and recycle workers by, see
+            :meth:`mapply.mapply.mapply`.
+        retries: Amount of times to retry failed chunks, with exponential backoff, see
+            :meth:`mapply.mapply.mapply`.
+        split_failed: Whether to cut failed chunks in halves before retrying them.
     """
+    global _init_pool  # noqa: PLW0603
     from pandas.core.base import PandasObject
 
     apply = partialmethod(
@@ -92,6 +238,16 @@ def init(
         chunk_size=chunk_size,
         max_chunks_per_worker=max_chunks_per_worker,
         progressbar=progressbar,
+        engine=engine,
+        transport=transport,
+        batch=batch,
+        ordered=ordered,
+        cache=as_cache(cache),
+        initializer=initializer,
+        initargs=initargs,
+        max_memory=max_memory,
+        retries=retries,
+        split_failed=split_failed,
     )
 
     setattr(PandasObject, apply_name, apply)
@@ -99,3 +255,16 @@ def init(
     from pandas.core.window.rolling import BaseWindowGroupby
 
     setattr(BaseWindowGroupby, apply_name, apply)
+
+    # only replace the pool that was started by a previous call to init
+    if _init_pool is not None:
+        _init_pool.shutdown()
+        _init_pool = None
+    if persistent_pool:
+        _init_pool = Pool(
+            -1 if n_workers == "auto" else int(n_workers),
+            engine="processes" if engine in {"auto", *PANDAS_ENGINES} else engine,
+            max_tasks_per_child=max_tasks_per_child,
+            initializer=initializer,
+            initargs=initargs,
+        ).activate()
@@ -0,0 +1,157 @@
+# BSD 3-Clause License
+#
+# Copyright (c) 2024, ddelange, <ddelange@delange.dev>
+#
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#
+# 1. Redistributions of source code must retain the above copyright notice, this
+#    list of conditions and the following disclaimer.
+#
+# 2. Redistributions in binary form must reproduce the above copyright notice,
+#    this list of conditions and the following disclaimer in the documentation
+#    and/or other materials provided with the distribution.
+#
+# 3. Neither the name of the copyright holder nor the names of its
+#    contributors may be used to endorse or promote products derived from
+#    this software without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+# DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE
+# FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL
+# DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR
+# SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER
+# CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY,
+# OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+# OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+#
+# SPDX-License-Identifier: BSD-3-Clause
+"""Assembly of chunk results into the final result.
+
+The common case of func returning a scalar per column/row yields one Series of a numpy
+dtype per chunk. These are written into a preallocated array as they arrive, at the
+positions of their chunk, such that each chunk can be freed right away and the final
+result is built without concatenating: peak memory stays at about one copy of the
+result. The index is the original one, instead of a concatenation of the chunks' indexes.
+
+Any other result (DataFrames, extension dtypes, differing dtypes or names) falls back
+to :meth:`pandas.concat`.
+"""
+
+from collections.abc import Iterable
+from typing import Any
+
+
+def concat_chunks(results: list[Any], df_or_series: Any, *, isseries: bool) -> Any:
+    """Concatenate the results of the chunks along the right axis."""
+    from pandas import concat
+
+    if isseries or len(results) == 1 or sum(map(len, results)) in df_or_series.shape:
+        return concat(results)
+
+    return concat(results, axis=1)
+
+
+class Assembler:
+    """Collects chunk results, writing scalar Series results into a preallocated array.
+
+    Args:
+        df_or_series: Object the chunks were sliced from.
+        axis: Axis along which the chunks were sliced.
+        isseries: Whether df_or_series is a Series.
+    """
+
+    def __init__(self, df_or_series: Any, axis: int, *, isseries: bool) -> None:
+        self.df_or_series = df_or_series
+        self.isseries = isseries
+        self.labels = df_or_series.axes[axis]
+        # preallocated values, and the (start, stop) positions written to them
+        self.values: Any = None
+        self.name: Any = None
+        self.written: list[tuple[int, int]] = []
+        # results that didn't fit in values, by their (start, stop) positions
+        self.chunks: dict[tuple[int, int], Any] | None = None
+
+    def _fits(self, bounds: tuple[int, int], result: Any) -> bool:
+        """Whether result is a Series of the preallocated dtype labeled like its chunk."""
+        from numpy import dtype
+        from pandas import Series
+
+        start, stop = bounds
+        if not isinstance(result, Series) or len(result) != stop - start:
+            return False
+        if self.values is None:
+            if not isinstance(result.dtype, dtype):
+                return False
+        elif result.dtype != self.values.dtype or result.name != self.name:
+            return False
+        return result.index.equals(self.labels[start:stop])
+
+    def add(self, bounds: tuple[int, int], result: Any) -> None:
+        """Add the result of a chunk.
+
+        Args:
+            bounds: (start, stop) positions of the chunk.
+            result: Result of the chunk.
+        """
+        from numpy import empty
+
+        if self.chunks is None and self._fits(bounds, result):
+            if self.values is None:
+                self.values = empty(len(self.labels), dtype=result.dtype)
+                self.name = result.name
+            start, stop = bounds
+            self.values[start:stop] = result.to_numpy()
+            self.written.append(bounds)
+            return
+        self._fall_back()[bounds] = result
+
+    def extend(self, pairs: Iterable[tuple[tuple[int, int], Any]]) -> None:
+        """Add the result of each chunk, as they arrive.
+
+        Args:
+            pairs: (start, stop) positions and result of each chunk.
+        """
+        for bounds, result in pairs:
+            self.add(bounds, result)
+
+    def _fall_back(self) -> dict[tuple[int, int], Any]:
+        """Turn the values written so far back into chunks, to be concatenated."""
+        from pandas import Series
+
+        if self.chunks is not None:
+            return self.chunks
+        self.chunks = {
+            (start, stop): Series(
+                self.values[start:stop],
+                index=self.labels[start:stop],
+                name=self.name,
+                copy=False,
+            )
+            for start, stop in self.written
+        }
+        self.written = []
+        return self.chunks
+
+    def result(self) -> Any:
+        """Return the final result, after all chunks were added.
+
+        Returns:
+            Series or DataFrame.
+        """
+        from pandas import Series
+
+        covered = sum(stop - start for start, stop in self.written)
+        if (
+            self.chunks is None
+            and self.values is not None
+            and covered == len(self.labels)
+        ):
+            return Series(self.values, index=self.labels, name=self.name, copy=False)
+        chunks = self._fall_back()
+        results = [chunks[bounds] for bounds in sorted(chunks)]
+        return concat_chunks(results, self.df_or_series, isseries=self.isseries)
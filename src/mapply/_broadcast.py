@@ -0,0 +1,321 @@
+# BSD 3-Clause License
+#
+# Copyright (c) 2024, ddelange, <ddelange@delange.dev>
+#
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#
+# 1. Redistributions of source code must retain the above copyright notice, this
+#    list of conditions and the following disclaimer.
+#
+# 2. Redistributions in binary form must reproduce the above copyright notice,
+#    this list of conditions and the following disclaimer in the documentation
+#    and/or other materials provided with the distribution.
+#
+# 3. Neither the name of the copyright holder nor the names of its
+#    contributors may be used to endorse or promote products derived from
+#    this software without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+# DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE
+# FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL
+# DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR
+# SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER
+# CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY,
+# OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+# OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+#
+# SPDX-License-Identifier: BSD-3-Clause
+"""Handles to large read-only arguments, shipped once per worker.
+
+Arguments passed via args and kwargs are pickled along with every chunk. Wrapping a
+large object in :meth:`broadcast` instead pickles it only once:
+::
+
+    import pandas as pd
+    import mapply
+
+    mapply.init()
+
+    mapping = mapply.broadcast(big_dict)
+    df["mapped"] = df.A.mapply(lambda x, mapping: mapping.get(x), args=(mapping,))
+
+Handles passed via args and kwargs are replaced by the object before func is called.
+Elsewhere (e.g. captured in a closure), look the object up with
+:attr:`mapply.Broadcast.value`.
+
+The first time a handle is pickled, the object is written to a file in
+``MAPPLY_SHARED_MEMORY_DIR`` (defaults to the RAM-backed ``/dev/shm`` where available),
+and from then on handles only carry the path to that file. Each worker loads the object
+once and caches it. NumPy arrays (including numeric pandas columns) are stored out of
+band, and memory-mapped read-only instead of copied. Workers forked after the handle was
+created (and threads) find the object in memory instead, without loading the file.
+
+The file is removed when the handle is closed or garbage collected in the process that
+created it, so keep a reference to the handle while it is in use.
+
+Handles carry a digest of the object, computed once when first needed (by
+:class:`mapply.ChunkCache` keys), such that cache keys don't depend on the (random)
+token of the handle.
+
+Workers of a :class:`mapply.cluster.Cluster` can't read local files, so while one is
+active the object is pickled along with every task instead. Pass a directory on a
+filesystem shared by all machines to keep sending it once.
+"""
+
+import hashlib
+import logging
+import mmap
+import os
+import pickle
+import struct
+import weakref
+from collections.abc import Callable
+from functools import cached_property, lru_cache, partial
+from pathlib import Path
+from tempfile import gettempdir
+from typing import Any, Self
+from uuid import uuid4
+
+logger = logging.getLogger(__name__)
+
+# amount of loaded objects each worker keeps cached
+MAX_LOADED = 8
+ALIGNMENT = 64
+# the offset of the pickled layout, at the end of the file
+FOOTER = struct.Struct("<Q")
+
+# objects broadcast from this process (inherited by forked workers), by token
+_REGISTRY: dict[str, Any] = {}
+
+
+class Broadcast:
+    """Picklable handle to a large read-only object, loaded once per worker.
+
+    Args:
+        obj: Object to broadcast. It should not be modified while the handle is in use.
+        directory: Directory to write the object to, defaults to
+            ``MAPPLY_SHARED_MEMORY_DIR``.
+    """
+
+    def __init__(self, obj: Any, directory: str | os.PathLike | None = None) -> None:
+        from mapply._shared_memory import SHARED_MEMORY_DIR
+
+        self.token = uuid4().hex
+        self._shared = directory is not None
+        directory = directory or SHARED_MEMORY_DIR or gettempdir()
+        self.path = str(Path(directory) / f"mapply-{self.token}.pkl")
+        self._written = False
+        _REGISTRY[self.token] = obj
+        self._finalizer: Any = weakref.finalize(
+            self,
+            _release,
+            self.token,
+            self.path,
+            os.getpid(),
+        )
+
+    def __getstate__(self) -> dict[str, Any]:
+        """Write the object to disk once, and only pickle its location.
+
+        Returns:
+            State of the handle, with the object itself only for remote pools.
+
+        Raises:
+            ValueError: If the handle was closed.
+        """
+        from mapply.parallel import remote_pool
+
+        if self._finalizer is not None and not self._finalizer.alive:
+            msg = "Broadcast handle was closed"
+            raise ValueError(msg)
+        state = {"token": self.token, "path": self.path}
+        if "digest" in self.__dict__:
+            state["digest"] = self.digest
+        if not self._shared and remote_pool() is not None:
+            return {**state, "value": self.value}
+        if not self._written:
+            _dump(_REGISTRY[self.token], self.path)
+            self._written = True
+        return state
+
+    def __setstate__(self, state: dict[str, Any]) -> None:
+        """Restore a handle without ownership of the file."""
+        self.token = state["token"]
+        self.path = state["path"]
+        if "digest" in state:
+            self.digest = state["digest"]
+        self._shared = True
+        self._written = True
+        self._finalizer = None
+        if "value" in state:
+            self._value = state["value"]
+
+    @cached_property
+    def digest(self) -> bytes:
+        """Digest of the object, computed once per handle (see :class:`ChunkCache`)."""
+        return _digest(self.value)
+
+    @property
+    def value(self) -> Any:
+        """The broadcast object, loaded (once per process) if not in memory.
+
+        Raises:
+            ValueError: If the handle was closed.
+        """
+        if self._finalizer is not None and not self._finalizer.alive:
+            msg = "Broadcast handle was closed"
+            raise ValueError(msg)
+        if self.token in _REGISTRY:
+            return _REGISTRY[self.token]
+        if "_value" in self.__dict__:
+            # pickled along, see __getstate__
+            return self._value
+        return _load(self.token, self.path)
+
+    def close(self) -> None:
+        """Release the object and remove its file (if created by this handle)."""
+        if self._finalizer is not None:
+            self._finalizer()
+
+    def __enter__(self) -> Self:
+        """Return the handle."""
+        return self
+
+    def __exit__(self, *exc_info: object) -> None:
+        """Close the handle."""
+        self.close()
+
+    def __repr__(self) -> str:
+        """Identify the handle by its token."""
+        return f"{type(self).__name__}({self.token})"
+
+
+def broadcast(obj: Any, directory: str | os.PathLike | None = None) -> Broadcast:
+    """Wrap obj in a :class:`Broadcast` handle, such that it is pickled once.
+
+    Args:
+        obj: Object to broadcast, e.g. a large lookup table.
+        directory: Directory to write the object to, defaults to
+            ``MAPPLY_SHARED_MEMORY_DIR``.
+
+    Returns:
+        Handle to pass via args or kwargs instead of obj.
+    """
+    return Broadcast(obj, directory)
+
+
+def _release(token: str, path: str, pid: int) -> None:
+    _REGISTRY.pop(token, None)
+    # forked workers inherit the handle, but don't own the file
+    if os.getpid() == pid:
+        Path(path).unlink(missing_ok=True)
+
+
+@lru_cache(maxsize=1)
+def _out_of_band_pickler() -> type:
+    """Dill Pickler handing NumPy arrays to buffer_callback, as pickle does."""
+    import dill
+    from numpy import ndarray
+
+    class OutOfBandPickler(dill.Pickler):
+        dispatch = dill.Pickler.dispatch.copy()
+        # dill pickles arrays in band
+        dispatch.pop(ndarray, None)
+
+    return OutOfBandPickler
+
+
+class _HashWriter:
+    """File-like object hashing what is written to it, instead of storing it."""
+
+    def __init__(self) -> None:
+        self.hash = hashlib.sha256()
+
+    def write(self, data: Any) -> None:
+        """Hash data."""
+        self.hash.update(data)
+
+
+def _digest(obj: Any) -> bytes:
+    """Digest of obj, pickled the way _dump does, without keeping a copy in memory."""
+    writer = _HashWriter()
+
+    def hash_buffer(buffer: pickle.PickleBuffer) -> None:
+        writer.write(buffer.raw())
+
+    _out_of_band_pickler()(writer, protocol=5, buffer_callback=hash_buffer).dump(obj)
+    return writer.hash.digest()
+
+
+def _dump(obj: Any, path: str) -> None:
+    """Write obj to path: aligned raw array buffers, followed by the pickle stream."""
+    import io
+
+    buffers: list[pickle.PickleBuffer] = []
+    stream = io.BytesIO()
+    _out_of_band_pickler()(stream, protocol=5, buffer_callback=buffers.append).dump(obj)
+
+    tmp = Path(f"{path}.{uuid4().hex}")
+    layout = []
+    with tmp.open("wb") as f:
+        for buffer in buffers:
+            f.write(b"\0" * (-f.tell() % ALIGNMENT))
+            raw = buffer.raw()
+            layout.append((f.tell(), raw.nbytes))
+            f.write(raw)
+        offset = f.tell()
+        # pickled in band without copying the stream, loaded as bytes
+        pickle.dump((layout, pickle.PickleBuffer(stream.getbuffer())), f, protocol=5)
+        f.write(FOOTER.pack(offset))
+    tmp.replace(path)
+    logger.debug("Broadcast %d bytes to %s", offset + stream.tell(), path)
+
+
+@lru_cache(maxsize=MAX_LOADED)
+def _load(token: str, path: str) -> Any:  # noqa: ARG001
+    """Load the object written by _dump, memory-mapping its array buffers read-only."""
+    import dill
+
+    with Path(path).open("rb") as f:
+        # the mmap stays alive as long as arrays reference it
+        buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    view = memoryview(buffer)
+    (offset,) = FOOTER.unpack(view[-FOOTER.size :])
+    layout, payload = pickle.loads(view[offset : -FOOTER.size])  # noqa: S301
+    return dill.loads(  # noqa: S301
+        payload,
+        buffers=[view[start : start + nbytes] for start, nbytes in layout],
+    )
+
+
+def _resolve(arg: Any) -> Any:
+    return arg.value if isinstance(arg, Broadcast) else arg
+
+
+def has_broadcasts(args: tuple[Any, ...], kwargs: dict[str, Any]) -> bool:
+    """Whether any of args or kwargs is a :class:`Broadcast` handle."""
+    return any(isinstance(arg, Broadcast) for arg in (*args, *kwargs.values()))
+
+
+def call_resolved(func: Callable, *args: Any, **kwargs: Any) -> Any:
+    """Call func, replacing :class:`Broadcast` handles in args and kwargs by their value."""
+    return func(
+        *map(_resolve, args),
+        **{key: _resolve(value) for key, value in kwargs.items()},
+    )
+
+
+def resolving(
+    func: Callable,
+    args: tuple[Any, ...],
+    kwargs: dict[str, Any],
+) -> Callable:
+    """Wrap func to resolve handles in its arguments, if args or kwargs contain any."""
+    if has_broadcasts(args, kwargs):
+        return partial(call_resolved, func)
+    return func
@@ -0,0 +1,404 @@
+# BSD 3-Clause License
+#
+# Copyright (c) 2024, ddelange, <ddelange@delange.dev>
+#
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#
+# 1. Redistributions of source code must retain the above copyright notice, this
+#    list of conditions and the following disclaimer.
+#
+# 2. Redistributions in binary form must reproduce the above copyright notice,
+#    this list of conditions and the following disclaimer in the documentation
+#    and/or other materials provided with the distribution.
+#
+# 3. Neither the name of the copyright holder nor the names of its
+#    contributors may be used to endorse or promote products derived from
+#    this software without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+# DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE
+# FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL
+# DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR
+# SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER
+# CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY,
+# OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+# OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+#
+# SPDX-License-Identifier: BSD-3-Clause
+"""Helpers to cut pandas objects into chunks, statically or adaptively.
+
+The adaptive scheduler first applies func to a few small pilot chunks in the parent
+process, doubling their size until the measurement is meaningful. From the measured
+compute and serialization time per row, it sizes the remaining chunks to take about
+``TARGET_CHUNK_SECONDS`` each, shrinking them towards the tail (guided
+self-scheduling) so that all workers finish at around the same time.
+
+Groups are batched by cost instead: expensive groups are scheduled first, each on their
+own, and cheap groups are batched into contiguous runs of similar total cost.
+
+The same measurements feed a simple cost model deciding whether running in parallel
+pays off at all: serial time is compared with the projected parallel time (pool startup,
+plus the share of serialization that happens in the parent, plus the remaining work
+divided over the workers). When the engine is left to choose, threads are piloted too:
+they skip serialization, but only divide the work if func releases the GIL, so their
+speedup is measured rather than assumed.
+"""
+
+import logging
+from collections.abc import Callable
+from itertools import pairwise
+from math import ceil
+from time import perf_counter
+from typing import Any
+
+from mapply import parallel
+
+logger = logging.getLogger(__name__)
+
+TARGET_CHUNK_SECONDS = 0.2
+# dispatching a chunk to a thread is cheap, so smaller chunks balance the load better
+THREAD_TARGET_CHUNK_SECONDS = 0.05
+MIN_PILOT_SECONDS = 0.02
+MIN_PILOT_SIZE = 8
+# stop piloting after this fraction of the input has been processed serially
+MAX_PILOT_FRACTION = 0.05
+# serialization is timed this many times, keeping the fastest (least noisy) run
+ROUNDTRIP_REPEATS = 3
+# input slices are grown until (un)pickling them takes at least this long
+MIN_SERIALIZE_SECONDS = 0.002
+# lower bound on chunk size near the tail, as a fraction of the target chunk size
+MIN_CHUNK_FRACTION = 0.125
+# rough seconds to start a pool and ship func to the workers, per start method
+POOL_STARTUP_SECONDS = {"fork": 0.05, "forkserver": 0.3, "spawn": 1.0}
+THREAD_POOL_STARTUP_SECONDS = 0.001
+# projected speedup required to go parallel, as the estimates are rough
+MIN_SPEEDUP = 1.5
+
+
+def slice_chunk(df_or_series: Any, axis: int, start: int, stop: int) -> Any:
+    """Slice df_or_series positionally along axis."""
+    if axis:
+        return df_or_series.iloc[:, start:stop]
+    return df_or_series.iloc[start:stop]
+
+
+def split_bounds(length: int, n_chunks: int) -> list[tuple[int, int]]:
+    """Split range(length) into n_chunks (start, stop) pairs, like numpy.array_split."""
+    size, extra = divmod(length, n_chunks)
+    bounds = []
+    start = 0
+    for i in range(n_chunks):
+        stop = start + size + (i < extra)
+        bounds.append((start, stop))
+        start = stop
+    return bounds
+
+
+def _roundtrip_seconds(obj: Any) -> float:
+    """Measure how long it takes to (un)pickle obj, as a worker would (fastest run)."""
+    import dill
+
+    fastest = float("inf")
+    for _ in range(ROUNDTRIP_REPEATS):
+        tic = perf_counter()
+        dill.loads(dill.dumps(obj))  # noqa: S301
+        fastest = min(fastest, perf_counter() - tic)
+    return fastest
+
+
+def _empty_like(obj: Any) -> Any:
+    """Empty slice of obj if it is a pandas object, to measure fixed pickling overhead."""
+    return obj.iloc[:0] if hasattr(obj, "iloc") else None
+
+
+def balanced_bounds(costs: Any, n_bins: int) -> list[tuple[int, int]]:
+    """Split range(len(costs)) into contiguous (start, stop) pairs of balanced cost.
+
+    Items costing at least the average bin cost each get their own pair, the others are
+    cut into pairs by cumulative cost. Pairs are returned most expensive first, such
+    that big items are scheduled early (longest processing time first), and the small
+    ones fill up the gaps at the end.
+
+    Args:
+        costs: Relative cost of each item.
+        n_bins: Desired amount of pairs (slightly exceeded when expensive items split
+            the runs of cheap items).
+
+    Returns:
+        List of (start, stop) pairs covering all items, sorted by descending cost.
+    """
+    import numpy as np
+
+    costs = np.asarray(costs, dtype=float)
+    n_items = len(costs)
+    if not n_items:
+        return []
+    n_bins = max(1, min(n_bins, n_items))
+    total = costs.sum()
+    if total <= 0:
+        return split_bounds(n_items, n_bins)
+
+    large = costs >= total / n_bins
+    small_costs = np.where(large, 0.0, costs)
+    small_target = small_costs.sum() / max(1, n_bins - int(large.sum()))
+    # bin of each cheap item, by the cost of the cheap items before it
+    cost_before = np.cumsum(small_costs) - small_costs
+    bins = np.floor(cost_before / small_target) if small_target else np.zeros(n_items)
+
+    large_positions = np.flatnonzero(large)
+    cuts = np.union1d(
+        np.flatnonzero(np.diff(bins)) + 1,
+        np.concatenate([large_positions, large_positions + 1]),
+    )
+    edges = [0, *(int(cut) for cut in cuts if 0 < cut < n_items), n_items]
+    bounds = list(pairwise(edges))
+
+    cumulative = np.concatenate([[0.0], np.cumsum(costs)])
+    return sorted(bounds, key=lambda b: cumulative[b[0]] - cumulative[b[1]])
+
+
+def _serialize_seconds_per_row(
+    df_or_series: Any,
+    axis: int,
+    results: list[tuple[tuple[int, int], Any]],
+    stop: int,
+) -> float:
+    """Measure the cost of (un)pickling chunk and result per row, for stop pilot rows.
+
+    Results of all pilot chunks are timed at once. Input slices are doubled (without
+    applying func) until their roundtrip is long enough to tell apart from timing noise.
+    The fixed cost per chunk (of an empty slice) is excluded, as real chunks are much
+    larger than the pilot chunks.
+    """
+    length = df_or_series.shape[axis]
+    rows = stop
+    chunk = slice_chunk(df_or_series, axis, 0, rows)
+    overhead = _roundtrip_seconds(_empty_like(chunk))
+    seconds = _roundtrip_seconds(chunk)
+    while seconds - overhead < MIN_SERIALIZE_SECONDS and rows < length:
+        rows = min(2 * rows, length)
+        seconds = _roundtrip_seconds(slice_chunk(df_or_series, axis, 0, rows))
+    per_row = max(0.0, seconds - overhead) / rows
+
+    outputs = [result for _, result in results]
+    overhead = _roundtrip_seconds([_empty_like(result) for result in outputs])
+    return per_row + max(0.0, _roundtrip_seconds(outputs) - overhead) / stop
+
+
+def run_pilot(
+    func: Callable,
+    df_or_series: Any,
+    axis: int,
+    *,
+    measure_serialization: bool = True,
+) -> tuple[list[tuple[tuple[int, int], Any]], int, float, float]:
+    """Apply func to chunks of doubling size until the runtime can be measured.
+
+    Args:
+        func: Function to apply to each chunk.
+        df_or_series: Object to slice the pilot chunks from.
+        axis: Axis along which to slice the chunks.
+        measure_serialization: Whether to measure serialization, which threads don't
+            need.
+
+    Returns:
+        (start, stop) positions and result of each pilot chunk, the amount of rows
+        processed, and the measured seconds per row spent computing and spent
+        (de)serializing chunk and result, see :meth:`_serialize_seconds_per_row`.
+    """
+    length = df_or_series.shape[axis]
+    max_stop = max(MIN_PILOT_SIZE, int(length * MAX_PILOT_FRACTION))
+    results = []
+    stop = 0
+    size = MIN_PILOT_SIZE
+    compute = 0.0
+    while stop < min(length, max_stop) and compute < MIN_PILOT_SECONDS:
+        start, stop = stop, min(stop + size, length)
+        chunk = slice_chunk(df_or_series, axis, start, stop)
+        tic = perf_counter()
+        result = func(chunk)
+        compute += perf_counter() - tic
+        results.append(((start, stop), result))
+        size *= 2
+    if not stop:
+        return results, stop, 0.0, 0.0
+
+    serialize = 0.0
+    if measure_serialization:
+        # a worker would (un)pickle both chunk and result
+        serialize = _serialize_seconds_per_row(df_or_series, axis, results, stop)
+    logger.debug(
+        "Pilot took %.3fs computing %d rows, (de)serializing takes %.2gs per row",
+        compute,
+        stop,
+        serialize,
+    )
+    return results, stop, compute / stop, serialize
+
+
+def run_threaded_pilot(  # noqa: PLR0913
+    func: Callable,
+    df_or_series: Any,
+    axis: int,
+    start: int,
+    *,
+    n_threads: int,
+    seconds_per_row: float,
+) -> tuple[list[tuple[tuple[int, int], Any]], int, float]:
+    """Apply func to the rows following start in n_threads threads at once.
+
+    Only functions releasing the GIL run concurrently in threads, which the serial
+    pilot can't tell. Each thread gets a chunk of about ``MIN_PILOT_SECONDS``.
+
+    Args:
+        func: Function to apply to each chunk.
+        df_or_series: Object to slice the pilot chunks from.
+        axis: Axis along which to slice the chunks.
+        start: Position of the first row that wasn't piloted yet.
+        n_threads: Amount of threads to run at once.
+        seconds_per_row: Cost of func per row, measured by :meth:`run_pilot`.
+
+    Returns:
+        (start, stop) positions and result of each chunk, the position up to which
+        rows were processed, and the measured speedup over processing them serially
+        (about 1 for functions holding the GIL, up to n_threads).
+    """
+    from concurrent.futures import ThreadPoolExecutor
+
+    size = MIN_PILOT_SIZE
+    if seconds_per_row > 0:
+        size = max(1, ceil(MIN_PILOT_SECONDS / seconds_per_row))
+    stop = min(df_or_series.shape[axis], start + n_threads * size)
+    bounds = [
+        (start + i, start + j)
+        for i, j in split_bounds(stop - start, n_threads)
+        if i < j
+    ]
+    chunks = [slice_chunk(df_or_series, axis, i, j) for i, j in bounds]
+    with ThreadPoolExecutor(len(chunks)) as executor:
+        tic = perf_counter()
+        results = list(executor.map(func, chunks))
+        elapsed = perf_counter() - tic
+
+    speedup = seconds_per_row * (stop - start) / elapsed if elapsed else 1.0
+    logger.debug("Pilot ran %.2f times faster on %d threads", speedup, len(chunks))
+    return list(zip(bounds, results, strict=True)), stop, min(speedup, len(chunks))
+
+
+def projected_seconds(
+    rows: int,
+    n_workers: float,
+    compute_seconds_per_row: float,
+    serialize_seconds_per_row: float,
+    *,
+    engine: str = "processes",
+) -> float:
+    """Project the time it takes to process rows on n_workers, including pool startup.
+
+    Args:
+        rows: Amount of rows remaining to be processed.
+        n_workers: (Effective) amount of workers that would process the rows.
+        compute_seconds_per_row: Measured cost of func per row.
+        serialize_seconds_per_row: Measured cost of (de)serializing chunk and result
+            per row. About half of it (pickling chunks, unpickling results) happens in
+            the parent, so it doesn't parallelize. Threads don't serialize.
+        engine: Either "processes" or "threads".
+
+    Returns:
+        Projected wall time in seconds.
+    """
+    persistent_pool = parallel._PERSISTENT_POOLS.get(engine)  # noqa: SLF001
+    if persistent_pool is not None and persistent_pool._pool is not None:  # noqa: SLF001
+        startup = 0.0
+    elif engine == "threads":
+        startup = THREAD_POOL_STARTUP_SECONDS
+    else:
+        startup = POOL_STARTUP_SECONDS.get(parallel.CONTEXT.get_start_method(), 1.0)
+    if engine == "threads":
+        serialize_seconds_per_row = 0.0
+
+    return (
+        startup
+        + rows * serialize_seconds_per_row / 2
+        + rows * (compute_seconds_per_row + serialize_seconds_per_row / 2) / n_workers
+    )
+
+
+def pays_off(
+    rows: int,
+    n_workers: float,
+    compute_seconds_per_row: float,
+    serialize_seconds_per_row: float,
+    *,
+    engine: str = "processes",
+) -> bool:
+    """Whether processing rows on n_workers is projected to be sufficiently faster than serially.
+
+    Args:
+        rows: Amount of rows remaining to be processed.
+        n_workers: (Effective) amount of workers that would process the rows.
+        compute_seconds_per_row: Measured cost of func per row.
+        serialize_seconds_per_row: Measured cost of (de)serializing chunk and result
+            per row, see :meth:`projected_seconds`.
+        engine: Either "processes" or "threads".
+
+    Returns:
+        True if a pool should be used.
+    """
+    serial = rows * compute_seconds_per_row
+    in_parallel = projected_seconds(
+        rows,
+        n_workers,
+        compute_seconds_per_row,
+        serialize_seconds_per_row,
+        engine=engine,
+    )
+    logger.debug(
+        "Projected %.3fs serially versus %.3fs on %.1f %s workers",
+        serial,
+        in_parallel,
+        n_workers,
+        engine,
+    )
+    return in_parallel * MIN_SPEEDUP < serial
+
+
+def adaptive_bounds(
+    start: int,
+    stop: int,
+    n_workers: int,
+    seconds_per_row: float,
+    target_seconds: float = TARGET_CHUNK_SECONDS,
+) -> list[tuple[int, int]]:
+    """Split range(start, stop) into chunks of about target_seconds each.
+
+    Chunk size is capped such that the remainder is spread over at least twice the
+    amount of workers, so chunks shrink towards the tail.
+
+    Args:
+        start: First position to schedule.
+        stop: End position (exclusive).
+        n_workers: Amount of workers that will process the chunks.
+        seconds_per_row: Measured cost per row.
+        target_seconds: Desired wall-time per chunk.
+
+    Returns:
+        List of (start, stop) pairs.
+    """
+    if seconds_per_row <= 0:
+        return [(start, stop)] if start < stop else []
+    target_size = max(1, int(target_seconds / seconds_per_row))
+    min_size = max(1, int(target_size * MIN_CHUNK_FRACTION))
+
+    bounds = []
+    while start < stop:
+        remaining = stop - start
+        size = max(min_size, min(target_size, ceil(remaining / (2 * n_workers))))
+        bounds.append((start, min(start + size, stop)))
+        start += size
+    return bounds
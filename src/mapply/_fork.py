@@ -0,0 +1,142 @@
+# BSD 3-Clause License
+#
+# Copyright (c) 2024, ddelange, <ddelange@delange.dev>
+#
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#
+# 1. Redistributions of source code must retain the above copyright notice, this
+#    list of conditions and the following disclaimer.
+#
+# 2. Redistributions in binary form must reproduce the above copyright notice,
+#    this list of conditions and the following disclaimer in the documentation
+#    and/or other materials provided with the distribution.
+#
+# 3. Neither the name of the copyright holder nor the names of its
+#    contributors may be used to endorse or promote products derived from
+#    this software without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+# DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE
+# FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL
+# DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR
+# SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER
+# CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY,
+# OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+# OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+#
+# SPDX-License-Identifier: BSD-3-Clause
+"""Transport of chunks to workers that inherit the input when forked.
+
+With the fork start method, workers start out with a copy-on-write view of the
+parent's memory. The parent registers the input (and func) in a module-level registry
+before the pool is started, and tasks only carry a token and the (start, stop) positions
+of their chunk, which workers slice from their inherited copy.
+
+Workers forked before registration (like those of a persistent :class:`mapply.Pool`)
+don't have the input, so this transport requires a fresh pool.
+"""
+
+import logging
+from collections.abc import Callable, Iterator, Sequence
+from contextlib import contextmanager
+from dataclasses import dataclass
+from typing import Any
+from uuid import uuid4
+
+from mapply import parallel
+from mapply._chunking import slice_chunk
+from mapply.parallel import enumerated_imap
+
+logger = logging.getLogger(__name__)
+
+# objects inherited by forked workers, by token
+_REGISTRY: dict[str, Any] = {}
+
+
+@dataclass(frozen=True)
+class Inherited:
+    """Picklable handle to an object registered in the parent before forking."""
+
+    token: str
+
+
+def can_inherit(engine: str) -> bool:
+    """Whether workers for engine will be forked from this process after registering.
+
+    Args:
+        engine: Engine of the pool, see :meth:`mapply.parallel.multiprocessing_imap`.
+
+    Returns:
+        False for the threads engine, other start methods, or an active persistent pool.
+    """
+    return (
+        engine != "threads"
+        and parallel.CONTEXT.get_start_method() == "fork"
+        and parallel._PERSISTENT_POOLS.get(engine) is None  # noqa: SLF001
+    )
+
+
+@contextmanager
+def inherit(obj: Any) -> Iterator[Inherited]:
+    """Register obj for workers forked within this context, yielding its handle."""
+    token = uuid4().hex
+    _REGISTRY[token] = obj
+    try:
+        yield Inherited(token)
+    finally:
+        del _REGISTRY[token]
+
+
+def resolve(handle: Inherited) -> Any:
+    """Look up the object behind handle in the (inherited) registry.
+
+    Args:
+        handle: Handle yielded by :meth:`inherit`.
+
+    Returns:
+        The registered object.
+
+    Raises:
+        RuntimeError: If this process was forked before handle was registered.
+    """
+    try:
+        return _REGISTRY[handle.token]
+    except KeyError:
+        msg = "Worker was started before the input was registered, use a fresh pool"
+        raise RuntimeError(msg) from None
+
+
+def _run_chunk(task: tuple[Inherited, int, int]) -> Any:
+    """Apply the registered func to a slice of the registered object."""
+    handle, start, stop = task
+    func, df_or_series, axis = resolve(handle)
+    return func(slice_chunk(df_or_series, axis, start, stop))
+
+
+def inherited_imap(
+    func: Callable,
+    df_or_series: Any,
+    axis: int,
+    bounds: Sequence[tuple[int, int]],
+    **kwargs: Any,
+) -> Iterator[tuple[int, Any]]:
+    """Apply func to chunks of df_or_series in parallel, in workers inheriting both.
+
+    Args:
+        func: Function to apply to each chunk.
+        df_or_series: Object to slice the chunks from.
+        axis: Axis along which to slice the chunks.
+        bounds: (start, stop) positions of each chunk along axis.
+        **kwargs: Keyword arguments for :meth:`mapply.parallel.enumerated_imap`.
+
+    Yields:
+        (ordinal, result) pairs, the ordinal being the position of the chunk in bounds.
+    """
+    with inherit((func, df_or_series, axis)) as handle:
+        tasks = [(handle, start, stop) for start, stop in bounds]
+        yield from enumerated_imap(_run_chunk, tasks, **kwargs)
@@ -33,68 +33,159 @@
 # ruff: noqa: ERA001
 import logging
 from collections.abc import Callable
+from functools import partial
 from types import MethodType
 from typing import Any
 
-from pandas.core.groupby.ops import _is_indexed_like
-
+from mapply import parallel
+from mapply._chunking import balanced_bounds
+from mapply.cache import ChunkCache, cached_results, fingerprint, group_batches
 from mapply.parallel import multiprocessing_imap, tqdm
+from mapply.stats import MapplyStats, Timer
 
 logger = logging.getLogger(__name__)
 
 
-def run_groupwise_apply(
+def _run_batch(
+    f: Callable,
+    chop: Callable,
+    batch: tuple[Any, Any, list[tuple[int, int]]],
+) -> tuple[list, bool]:
+    """Run the original per-group loop on a contiguous block of sorted groups."""
+    from pandas.core.groupby.ops import _is_indexed_like
+
+    keys, block, bounds = batch
+    mutated = False
+    result_values = []
+    for key, (start, stop) in zip(keys, bounds, strict=True):
+        group = chop(block, slice(start, stop))
+        # Pinning name is needed for
+        #  test_group_apply_once_per_group,
+        #  test_inconsistent_return_type, test_set_group_name,
+        #  test_group_name_available_in_inference_pass,
+        #  test_groupby_multi_timezone
+        object.__setattr__(group, "name", key)
+
+        # group might be modified
+        group_axes = group.axes
+        res = f(group)
+        if not mutated and not _is_indexed_like(res, group_axes):
+            mutated = True
+        result_values.append(res)
+    return result_values, mutated
+
+
+def run_groupwise_apply(  # noqa: PLR0913
     df_or_series: Any,
     func: Callable,
     *,
     n_workers: int,
     progressbar: bool,
+    max_chunks_per_worker: int = 0,
+    group_cost: Callable | None = None,
+    stats: MapplyStats | None = None,
+    cache: ChunkCache | None = None,
+    pool_engine: str = "processes",
+    initializer: Callable | None = None,
+    initargs: tuple[Any, ...] = (),
+    max_memory: float | None = None,
     args: tuple[Any, ...] = (),
     **kwargs: Any,
 ) -> Any:
-    """Patch GroupBy._grouper.apply_groupwise, applying func to each group in parallel."""
+    """Patch GroupBy._grouper.apply_groupwise, applying func to batches of groups in parallel.
+
+    The data is sorted by group once, after which each task receives a contiguous
+    block of rows holding many groups, and runs the per-group loop locally.
+    About max_chunks_per_worker batches per worker are sent (0 for one batch per
+    group), balanced by group_cost (group sizes by default), most expensive first.
+    With a cache, batches are cut at content-defined group keys instead, and only
+    batches whose rows changed are sent.
+    """
+    from pandas._libs import lib
+
+    if n_workers < 1:
+        n_workers = parallel.default_n_workers(pool_engine)
 
     def apply(self: Any, f: Callable, data: Any) -> tuple[list, bool]:
         # patching https://github.com/pandas-dev/pandas/blob/v3.0.1/pandas/core/groupby/ops.py#L1014
-        # with a multiprocessing_imap
+        # with a multiprocessing_imap over batches of groups
         mutated = False
         splitter = self._get_splitter(data)
         group_keys = self.result_index
-        result_values = []
-
-        # This calls DataSplitter.__iter__
-        zipped = zip(group_keys, splitter, strict=True)
-
-        # rewrite the original for-loop into an imap
-        def _run_apply(args: Any) -> tuple[Any, Any]:
-            key, group = args
-            # Pinning name is needed for
-            #  test_group_apply_once_per_group,
-            #  test_inconsistent_return_type, test_set_group_name,
-            #  test_group_name_available_in_inference_pass,
-            #  test_groupby_multi_timezone
-            object.__setattr__(group, "name", key)
-
-            # group might be modified
-            group_axes = group.axes
-            res = f(group)
-            return res, group_axes
-
-        # generator with length defined (for progressbar)
-        zipped = tqdm(zipped, disable=True, total=splitter.ngroups)
-        zipped = multiprocessing_imap(
-            _run_apply,
-            zipped,
-            n_workers=n_workers,
-            progressbar=progressbar,
-        )
-
-        # original for-loop leftover
-        for res, group_axes in zipped:
-            # no changes made below this line
-            if not mutated and not _is_indexed_like(res, group_axes):
-                mutated = True
-            result_values.append(res)
+        # This is what DataSplitter.__iter__ does
+        ngroups = splitter.ngroups
+        starts, ends = lib.generate_slices(splitter._slabels, ngroups)  # noqa: SLF001
+        sdata = splitter._sorted_data  # noqa: SLF001
+
+        n_batches = ngroups
+        if max_chunks_per_worker:
+            n_batches = min(n_batches, max_chunks_per_worker * n_workers)
+
+        sizes = ends - starts
+
+        # _chop doesn't use the splitter, avoid pickling it (and all data) along
+        chop = partial(type(splitter)._chop, None)  # noqa: SLF001
+
+        def compute(todo: list[int]) -> Any:
+            def _batches() -> Any:
+                for i in todo:
+                    first, last = batch_bounds[i]
+                    offset = starts[first]
+                    block = sdata.iloc[offset : ends[last - 1]]
+                    bounds = [
+                        (start - offset, end - offset)
+                        for start, end in zip(
+                            starts[first:last],
+                            ends[first:last],
+                            strict=True,
+                        )
+                    ]
+                    yield group_keys[first:last], block, bounds
+
+            # generator with length defined (for progressbar)
+            batches = tqdm(_batches(), disable=True, total=len(todo))
+            zipped = multiprocessing_imap(
+                partial(_run_batch, f, chop),
+                batches,
+                n_workers=n_workers,
+                progressbar=progressbar,
+                stats=stats,
+                engine=pool_engine,
+                initializer=initializer,
+                initargs=initargs,
+                max_memory=max_memory,
+            )
+            return zip(todo, zipped, strict=True)
+
+        if cache is None:
+            batch_bounds = balanced_bounds(
+                sizes if group_cost is None else group_cost(sizes),
+                n_batches,
+            )
+            batch_results = [
+                batch for _, batch in compute(list(range(len(batch_bounds))))
+            ]
+        else:
+            with Timer(stats, "split_seconds"):
+                batch_bounds, cache_keys = group_batches(
+                    fingerprint(f, args, kwargs),
+                    sdata,
+                    group_keys,
+                    sizes,
+                    rows=lambda first, last: slice(starts[first], ends[last - 1]),
+                    n_batches=n_batches,
+                )
+            batch_results = cached_results(cache, cache_keys, compute)
+
+        # original for-loop leftover, putting batches back in order of group_keys
+        result_values: list = [None] * ngroups
+        for (first, last), (batch_values, batch_mutated) in zip(
+            batch_bounds,
+            batch_results,
+            strict=True,
+        ):
+            mutated = mutated or batch_mutated
+            result_values[first:last] = batch_values
         # getattr pattern for __name__ is needed for functools.partial objects
         if len(group_keys) == 0 and getattr(f, "__name__", None) in [
             "skew",
@@ -0,0 +1,184 @@
+# BSD 3-Clause License
+#
+# Copyright (c) 2024, ddelange, <ddelange@delange.dev>
+#
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#
+# 1. Redistributions of source code must retain the above copyright notice, this
+#    list of conditions and the following disclaimer.
+#
+# 2. Redistributions in binary form must reproduce the above copyright notice,
+#    this list of conditions and the following disclaimer in the documentation
+#    and/or other materials provided with the distribution.
+#
+# 3. Neither the name of the copyright holder nor the names of its
+#    contributors may be used to endorse or promote products derived from
+#    this software without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+# DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE
+# FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL
+# DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR
+# SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER
+# CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY,
+# OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+# OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+#
+# SPDX-License-Identifier: BSD-3-Clause
+"""Detection of the CPUs and memory this process may actually use.
+
+In containers, psutil reports the CPUs and memory of the host, while the process is
+restricted by its CPU affinity and by the CPU quota and memory limit of its cgroup (v1
+or v2). Limits of ancestor cgroups apply as well, so the tightest one is used.
+"""
+
+import logging
+import os
+import sys
+from math import ceil
+from pathlib import Path
+
+logger = logging.getLogger(__name__)
+
+CGROUP_ROOT = Path("/sys/fs/cgroup")
+PROC_CGROUP = Path("/proc/self/cgroup")
+# cgroup v1 reports no memory limit as a huge number (page counter max)
+UNLIMITED_BYTES = 1 << 60
+# a worker holds the unpickled chunk and its result, and pickled copies in transit
+WORKER_MEMORY_FACTOR = 3
+
+
+def _read(path: Path) -> str | None:
+    try:
+        return path.read_text().strip()
+    except OSError:
+        return None
+
+
+def _cgroup_dirs(controller: str) -> list[Path]:
+    """Directories of this process' cgroup (and its ancestors) for controller.
+
+    Inside a container, the cgroup path in /proc/self/cgroup often refers to the host
+    hierarchy, while the container's own cgroup is mounted at the root, so ancestors
+    that don't exist are skipped.
+    """
+    content = _read(PROC_CGROUP)
+    if content is None:
+        return []
+    dirs = []
+    for line in content.splitlines():
+        _, controllers, path = line.split(":", 2)
+        if not controllers:
+            # cgroup v2, unified hierarchy
+            mount = CGROUP_ROOT
+        elif controller in controllers.split(","):
+            mount = CGROUP_ROOT / controllers
+            if not mount.is_dir():
+                mount = CGROUP_ROOT / controller
+        else:
+            continue
+        relative = Path(path.lstrip("/"))
+        candidates = [
+            mount / relative,
+            *(mount / parent for parent in relative.parents),
+        ]
+        dirs.extend(directory for directory in candidates if directory.is_dir())
+    return list(dict.fromkeys(dirs))
+
+
+def _cpu_quota(directory: Path) -> float | None:
+    """CPU quota of a cgroup in CPUs, None if unlimited."""
+    content = _read(directory / "cpu.max")
+    if content is not None:
+        quota, period = content.split()
+        return None if quota == "max" else int(quota) / int(period)
+    quota, period = (
+        _read(directory / "cpu.cfs_quota_us"),
+        _read(directory / "cpu.cfs_period_us"),
+    )
+    if quota is None or period is None or int(quota) <= 0:
+        return None
+    return int(quota) / int(period)
+
+
+def cpu_quota() -> float | None:
+    """Tightest cgroup CPU quota of this process in CPUs (e.g. 2.5), None if unlimited."""
+    quotas = [
+        quota
+        for directory in _cgroup_dirs("cpu")
+        if (quota := _cpu_quota(directory)) is not None
+    ]
+    return min(quotas, default=None)
+
+
+def cpu_budget() -> int:
+    """Amount of CPUs this process may run on, capped by its cgroup CPU quota."""
+    try:
+        n_cpus = len(os.sched_getaffinity(0))
+    except AttributeError:  # not available on e.g. macOS
+        n_cpus = os.cpu_count() or 1
+    quota = cpu_quota()
+    if quota is not None:
+        n_cpus = min(n_cpus, max(1, ceil(quota)))
+    return n_cpus
+
+
+def _memory_headroom(directory: Path) -> int | None:
+    """Memory limit of a cgroup minus its usage in bytes, None if unlimited."""
+    for limit_file, usage_file in (
+        ("memory.max", "memory.current"),
+        ("memory.limit_in_bytes", "memory.usage_in_bytes"),
+    ):
+        limit = _read(directory / limit_file)
+        if limit is None:
+            continue
+        if limit == "max" or int(limit) >= UNLIMITED_BYTES:
+            return None
+        usage = _read(directory / usage_file)
+        return max(0, int(limit) - int(usage or 0))
+    return None
+
+
+def memory_budget() -> int:
+    """Bytes of memory this process can still allocate.
+
+    Available memory of the system, capped by the headroom of cgroup memory limits.
+    Override with the ``MAPPLY_MEMORY_BYTES`` environment variable.
+
+    Returns:
+        Amount of bytes.
+    """
+    override = os.environ.get("MAPPLY_MEMORY_BYTES")
+    if override:
+        return int(override)
+    import psutil
+
+    budget = psutil.virtual_memory().available
+    for directory in _cgroup_dirs("memory"):
+        headroom = _memory_headroom(directory)
+        if headroom is not None:
+            budget = min(budget, headroom)
+    return budget
+
+
+def max_workers_for_memory(chunk_bytes: float, budget: int | None = None) -> int:
+    """Amount of workers that fit in the memory budget, processing a chunk each.
+
+    Args:
+        chunk_bytes: Estimated size of a chunk in memory.
+        budget: Amount of bytes available, defaults to :meth:`memory_budget`.
+
+    Returns:
+        Amount of workers, at least 1.
+    """
+    per_worker = WORKER_MEMORY_FACTOR * chunk_bytes
+    if per_worker <= 0:
+        return sys.maxsize
+    if budget is None:
+        budget = memory_budget()
+    return max(1, int(budget // per_worker))
@@ -0,0 +1,247 @@
+# BSD 3-Clause License
+#
+# Copyright (c) 2024, ddelange, <ddelange@delange.dev>
+#
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#
+# 1. Redistributions of source code must retain the above copyright notice, this
+#    list of conditions and the following disclaimer.
+#
+# 2. Redistributions in binary form must reproduce the above copyright notice,
+#    this list of conditions and the following disclaimer in the documentation
+#    and/or other materials provided with the distribution.
+#
+# 3. Neither the name of the copyright holder nor the names of its
+#    contributors may be used to endorse or promote products derived from
+#    this software without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+# DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE
+# FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL
+# DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR
+# SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER
+# CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY,
+# OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+# OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+#
+# SPDX-License-Identifier: BSD-3-Clause
+"""Zero-copy transport of numeric pandas objects via memory-mapped files.
+
+Data is written once to a file in ``MAPPLY_SHARED_MEMORY_DIR`` (defaults to the
+RAM-backed ``/dev/shm`` where available), and workers rebuild read-only pandas objects
+on top of a memory-map of that file instead of unpickling a copy. Large numeric
+results travel back the same way.
+"""
+
+import logging
+import mmap
+import os
+import uuid
+from collections.abc import Callable, Iterator, Sequence
+from dataclasses import dataclass
+from functools import partial
+from pathlib import Path
+from tempfile import TemporaryDirectory
+from typing import Any
+
+from mapply._chunking import slice_chunk
+from mapply.parallel import enumerated_imap
+from mapply.stats import Timer
+
+logger = logging.getLogger(__name__)
+
+SHARED_MEMORY_DIR = os.environ.get("MAPPLY_SHARED_MEMORY_DIR") or (
+    "/dev/shm" if Path("/dev/shm").is_dir() else None  # noqa: S108
+)
+# numpy dtype kinds that can be rebuilt from raw bytes: bool, (u)int, float, complex, datetime, timedelta
+SHAREABLE_KINDS = "biufcmM"
+# results smaller than this are cheaper to pickle
+MIN_SHARED_RESULT_BYTES = 1 << 16
+ALIGNMENT = 64
+
+
+@dataclass(frozen=True)
+class SharedFrame:
+    """Picklable handle to a Series or DataFrame stored in a memory-mapped file."""
+
+    path: str
+    # (dtype, offset) for each column, followed by the index if shared
+    arrays: tuple[tuple[str, int], ...]
+    length: int
+    # Index, or None if the index is stored as the last array
+    index: Any
+    index_name: Any
+    # column labels for a DataFrame, None for a Series
+    columns: Any
+    name: Any
+
+
+def _column_arrays(df_or_series: Any) -> list[Any]:
+    """Return the underlying numpy array of each column."""
+    from pandas import Series
+
+    if isinstance(df_or_series, Series):
+        return [df_or_series.to_numpy()]
+    return [df_or_series.iloc[:, i].to_numpy() for i in range(df_or_series.shape[1])]
+
+
+def _is_shareable_dtype(dtype: Any) -> bool:
+    from numpy import dtype as np_dtype
+
+    return isinstance(dtype, np_dtype) and dtype.kind in SHAREABLE_KINDS
+
+
+def is_shareable(df_or_series: Any) -> bool:
+    """Whether df_or_series only contains numpy dtypes which can be memory-mapped."""
+    from pandas import DataFrame, Series
+
+    if isinstance(df_or_series, Series):
+        return _is_shareable_dtype(df_or_series.dtype)
+    if isinstance(df_or_series, DataFrame):
+        return all(map(_is_shareable_dtype, df_or_series.dtypes))
+    return False
+
+
+def share(df_or_series: Any, directory: str) -> SharedFrame:
+    """Write df_or_series to a new file in directory, returning a handle to it."""
+    from numpy import ascontiguousarray, uint8
+    from pandas import MultiIndex, RangeIndex, Series
+
+    arrays = _column_arrays(df_or_series)
+    index = df_or_series.index
+    if not isinstance(index, (RangeIndex, MultiIndex)) and _is_shareable_dtype(
+        index.dtype,
+    ):
+        arrays.append(index.to_numpy())
+        index = None
+
+    path = Path(directory) / f"{uuid.uuid4().hex}.bin"
+    layout = []
+    offset = 0
+    with path.open("wb") as f:
+        for array in arrays:
+            padding = -offset % ALIGNMENT
+            f.write(b"\0" * padding)
+            offset += padding
+            layout.append((array.dtype.str, offset))
+            f.write(ascontiguousarray(array).view(uint8).data)
+            offset += array.nbytes
+
+    isseries = isinstance(df_or_series, Series)
+    return SharedFrame(
+        path=str(path),
+        arrays=tuple(layout),
+        length=len(df_or_series),
+        index=index,
+        index_name=df_or_series.index.name,
+        columns=None if isseries else df_or_series.columns,
+        name=df_or_series.name if isseries else None,
+    )
+
+
+def shared_directory() -> TemporaryDirectory:
+    """Temporary directory to hold the memory-mapped files of a single call."""
+    return TemporaryDirectory(
+        prefix="mapply-",
+        dir=SHARED_MEMORY_DIR,
+        ignore_cleanup_errors=True,
+    )
+
+
+def load(handle: SharedFrame, *, copy: bool = False) -> Any:
+    """Rebuild the pandas object behind handle.
+
+    Args:
+        handle: Handle returned by :meth:`share`.
+        copy: Whether to read the data into (writable) memory. By default, the data
+            is memory-mapped read-only without copying.
+
+    Returns:
+        Series or DataFrame.
+    """
+    from numpy import frombuffer
+    from pandas import DataFrame, Index, Series
+
+    with Path(handle.path).open("rb") as f:
+        if copy:
+            buffer: Any = bytearray(os.fstat(f.fileno()).st_size)
+            f.readinto(buffer)
+        elif os.fstat(f.fileno()).st_size:
+            # the mmap stays alive as long as arrays reference it
+            buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        else:
+            buffer = b""
+
+    arrays = [
+        frombuffer(buffer, dtype=dtype, count=handle.length, offset=offset)
+        for dtype, offset in handle.arrays
+    ]
+    index = handle.index
+    if index is None:
+        index = Index(arrays.pop(), name=handle.index_name, copy=False)
+
+    if handle.columns is None:
+        return Series(arrays[0], index=index, name=handle.name, copy=False)
+
+    df = DataFrame(dict(enumerate(arrays)), index=index, copy=False)
+    df.columns = handle.columns
+    return df
+
+
+def _run_chunk(
+    func: Callable,
+    task: tuple[SharedFrame, int, int, int],
+    directory: str,
+) -> Any:
+    """Apply func to a slice of the shared object, sharing the result if sensible."""
+    handle, axis, start, stop = task
+    df_or_series = load(handle)
+    result = func(slice_chunk(df_or_series, axis, start, stop))
+    if (
+        is_shareable(result)
+        and sum(array.nbytes for array in _column_arrays(result))
+        >= MIN_SHARED_RESULT_BYTES
+    ):
+        return share(result, directory)
+    return result
+
+
+def shared_imap(
+    func: Callable,
+    df_or_series: Any,
+    axis: int,
+    bounds: Sequence[tuple[int, int]],
+    **kwargs: Any,
+) -> Iterator[tuple[int, Any]]:
+    """Apply func to chunks of df_or_series in parallel, via memory-mapped files.
+
+    Args:
+        func: Function to apply to each chunk.
+        df_or_series: Object to share with the workers.
+        axis: Axis along which to slice the chunks.
+        bounds: (start, stop) positions of each chunk along axis.
+        **kwargs: Keyword arguments for :meth:`mapply.parallel.enumerated_imap`.
+
+    Yields:
+        (ordinal, result) pairs, the ordinal being the position of the chunk in bounds.
+    """
+    with shared_directory() as directory:
+        with Timer(kwargs.get("stats"), "split_seconds"):
+            handle = share(df_or_series, directory)
+        tasks = [(handle, axis, start, stop) for start, stop in bounds]
+        for i, result in enumerated_imap(
+            partial(_run_chunk, func, directory=directory),
+            tasks,
+            **kwargs,
+        ):
+            if isinstance(result, SharedFrame):
+                loaded = load(result, copy=True)
+                Path(result.path).unlink()
+                yield i, loaded
+            else:
+                yield i, result
@@ -32,24 +32,34 @@
 # SPDX-License-Identifier: BSD-3-Clause
 import logging
 from collections.abc import Callable, Iterator
+from contextlib import ExitStack
+from functools import lru_cache, partial
 from typing import Any
 
+from mapply import parallel
+from mapply._chunking import balanced_bounds
+from mapply._fork import Inherited, can_inherit, inherit, resolve
+from mapply._shared_memory import (
+    SharedFrame,
+    is_shareable,
+    load,
+    share,
+    shared_directory,
+)
+from mapply.cache import ChunkCache, cached_results, fingerprint, group_batches
 from mapply.parallel import multiprocessing_imap, tqdm
+from mapply.stats import MapplyStats, Timer
 
 logger = logging.getLogger(__name__)
 
+# pandas engines compiling func on its first call in each worker
+COMPILING_ENGINES = ("numba",)
+# rows of the first group to compile func on when a worker starts
+WARM_UP_ROWS = 8
 
-def run_window_groupby_apply(
-    window_groupby: Any,
-    func: Callable,
-    *,
-    n_workers: int,
-    progressbar: bool,
-    args: tuple[Any, ...] = (),
-    **kwargs: Any,
-) -> Any:
-    """Apply func to each group's window in parallel using multiprocessing_imap."""
-    from pandas import concat
+
+def _window_method(window_groupby: Any) -> tuple[str, dict[str, Any]]:
+    """Name and keyword arguments of the method recreating window_groupby per group."""
     from pandas.core.window.expanding import ExpandingGroupby
     from pandas.core.window.rolling import RollingGroupby
 
@@ -57,8 +67,8 @@ def run_window_groupby_apply(
         window_kwargs = {
             "min_periods": window_groupby.min_periods,
         }
-        window_method = "expanding"
-    elif isinstance(window_groupby, RollingGroupby):
+        return "expanding", window_kwargs
+    if isinstance(window_groupby, RollingGroupby):
         window_kwargs = {
             "window": window_groupby.window,
             "min_periods": window_groupby.min_periods,
@@ -66,10 +76,154 @@ def run_window_groupby_apply(
             "on": window_groupby.on,
             "closed": window_groupby.closed,
         }
-        window_method = "rolling"
-    else:
-        msg = f"Unsupported window groupby type: {type(window_groupby).__name__}"
-        raise TypeError(msg)
+        return "rolling", window_kwargs
+    msg = f"Unsupported window groupby type: {type(window_groupby).__name__}"
+    raise TypeError(msg)
+
+
+@lru_cache(maxsize=8)
+def _load_func(payload: bytes) -> Callable:
+    """Unpickle func once per worker, such that its identity is stable across tasks.
+
+    Pandas caches numba-compiled functions by identity, so this avoids recompiling
+    func for every task.
+    """
+    import dill
+
+    return dill.loads(payload)  # noqa: S301
+
+
+def _run_batch(  # noqa: PLR0913
+    task: tuple[Any, Any, Any, Any],
+    *,
+    window_method: str,
+    window_kwargs: dict[str, Any],
+    func: Callable | bytes,
+    names: list[Any],
+    args: tuple[Any, ...],
+    kwargs: dict[str, Any],
+) -> Any:
+    """Apply func to the windows of a batch of groups, in a single groupby call."""
+    from numpy import arange, repeat
+    from pandas import MultiIndex
+
+    source, positions, sizes, batch_keys = task
+    if isinstance(source, SharedFrame):
+        source = load(source)
+    elif isinstance(source, Inherited):
+        source = resolve(source)
+    if isinstance(func, bytes):
+        func = _load_func(func)
+    block = source if positions is None else source.take(positions)
+
+    # the block holds the groups back to back, so group by their ordinal
+    codes = repeat(arange(len(sizes)), sizes)
+    windows = getattr(block.groupby(codes, sort=False), window_method)(**window_kwargs)
+    result = windows.apply(func, args=args, **kwargs)
+
+    # replace the ordinals by the group keys
+    keys = batch_keys.repeat(sizes)
+    result.index = MultiIndex.from_arrays(
+        [keys.get_level_values(i) for i in range(keys.nlevels)]
+        + [result.index.get_level_values(i) for i in range(1, result.index.nlevels)],
+        names=names,
+    )
+    return result
+
+
+def _warm_up(
+    run_batch: Callable,
+    sample: tuple[Any, Any, Any, Any],
+    initializer: Callable | None,
+    initargs: tuple[Any, ...],
+) -> None:
+    """Run initializer, then compile func on a sample batch before the first task."""
+    if initializer is not None:
+        initializer(*initargs)
+    try:
+        run_batch(sample)
+    except Exception:
+        # a genuine error surfaces again from the first task
+        logger.debug("Warming up func failed", exc_info=True)
+
+
+def _warm_initializer(  # noqa: PLR0913
+    run_batch: Callable,
+    obj: Any,
+    positions: Any,
+    key: Any,
+    *,
+    engine: str | None,
+    pool_engine: str,
+    initializer: Callable | None,
+    initargs: tuple[Any, ...],
+) -> tuple[Callable | None, tuple[Any, ...]]:
+    """Initializer compiling func on the first rows of a group in fresh workers."""
+    from numpy import array
+
+    if (
+        engine not in COMPILING_ENGINES
+        or pool_engine == "threads"
+        # a persistent pool keeps its own initializer, and its workers stay warm
+        or parallel._PERSISTENT_POOLS.get(pool_engine) is not None  # noqa: SLF001
+    ):
+        return initializer, initargs
+    sample = obj.take(positions[:WARM_UP_ROWS])
+    task = (sample, None, array([len(sample)]), key)
+    return _warm_up, (run_batch, task, initializer, initargs)
+
+
+def _source(obj: Any, stack: ExitStack, *, pool_engine: str, transport: str) -> Any:
+    """Send obj to the workers once if possible, else None for one take per batch."""
+    if pool_engine == "threads":
+        return obj
+    if (
+        transport == "shared_memory"
+        and parallel.remote_pool(pool_engine) is None
+        and is_shareable(obj)
+    ):
+        return share(obj, stack.enter_context(shared_directory()))
+    if transport == "fork" and can_inherit(pool_engine):
+        return stack.enter_context(inherit(obj))
+    return None
+
+
+def run_window_groupby_apply(  # noqa: PLR0913
+    window_groupby: Any,
+    func: Callable,
+    *,
+    n_workers: int,
+    progressbar: bool,
+    max_chunks_per_worker: int = 0,
+    group_cost: Callable | None = None,
+    stats: MapplyStats | None = None,
+    cache: ChunkCache | None = None,
+    pool_engine: str = "processes",
+    initializer: Callable | None = None,
+    initargs: tuple[Any, ...] = (),
+    max_memory: float | None = None,
+    transport: str = "pickle",
+    args: tuple[Any, ...] = (),
+    **kwargs: Any,
+) -> Any:
+    """Apply func to each group's window in parallel using multiprocessing_imap.
+
+    Groups are sent in batches, about max_chunks_per_worker per worker (0 for one
+    batch per group), balanced by group_cost (group sizes by default), most expensive
+    first. Each task receives the rows of its groups (or, with the shared_memory or
+    fork transport or threads engine, all of obj once plus the positions of its
+    groups), applies func to all windows of its groups in a single groupby-window call
+    (running one compiled kernel over all groups with raw=True and engine="numba"), and
+    returns a single block, such that the final concat is over tasks instead of groups.
+    With a compiling engine, fresh worker processes compile func on a few rows of the
+    first group when they start, after initializer. With a cache, batches are cut at
+    content-defined group keys instead, and only batches whose rows changed are sent.
+    """
+    import dill
+    from numpy import concatenate, fromiter
+    from pandas import concat
+
+    window_method, window_kwargs = _window_method(window_groupby)
 
     grouper = window_groupby._grouper  # noqa: SLF001
     indices = grouper.indices
@@ -78,38 +232,102 @@ def run_window_groupby_apply(
     as_index = window_groupby._as_index  # noqa: SLF001
     groupby_names = grouper.names
 
-    # lazy generator: yield (key, group_slice) without materializing all groups
-    def _group_iter() -> Iterator[tuple[Any, Any]]:
-        for key in result_index:
-            yield key, obj.iloc[indices[key]]
-
-    def _process_group(key_and_data: Any) -> tuple[Any, Any]:
-        key, group_data = key_and_data
-        window_obj = getattr(group_data, window_method)(**window_kwargs)
-        result = window_obj.apply(func, args=args, **kwargs)
-        return key, result
-
-    # generator with length defined (for progressbar)
-    groups = tqdm(_group_iter(), disable=True, total=len(result_index))
-    processed = multiprocessing_imap(
-        _process_group,
-        groups,
-        n_workers=n_workers,
-        progressbar=progressbar,
-    )
-
-    # consume lazily from the multiprocessing_imap generator
-    keys = []
-    parts = []
-    for key, part in processed:
-        keys.append(key)
-        parts.append(part)
+    if n_workers < 1:
+        n_workers = parallel.default_n_workers(pool_engine)
+    keys = list(result_index)
+    n_batches = len(keys)
+    if max_chunks_per_worker:
+        n_batches = min(n_batches, max_chunks_per_worker * n_workers)
+    sizes = fromiter((len(indices[key]) for key in keys), dtype=int, count=len(keys))
 
-    if not parts:
+    if not keys:
         # delegate to native pandas for the empty case to preserve index dtypes
         return window_groupby.apply(func, args=args, **kwargs)
 
-    result = concat(parts, keys=keys, names=groupby_names + list(obj.index.names))
+    names = groupby_names + list(obj.index.names)
+    run_batch = partial(
+        _run_batch,
+        window_method=window_method,
+        window_kwargs=window_kwargs,
+        # pickled once, unpickled once per worker
+        func=func if pool_engine == "threads" else dill.dumps(func),
+        names=names,
+        args=args,
+        kwargs=kwargs,
+    )
+    initializer, initargs = _warm_initializer(
+        run_batch,
+        obj,
+        indices[keys[0]],
+        result_index[:1],
+        engine=kwargs.get("engine"),
+        pool_engine=pool_engine,
+        initializer=initializer,
+        initargs=initargs,
+    )
+
+    with ExitStack() as stack:
+        source = _source(obj, stack, pool_engine=pool_engine, transport=transport)
+
+        def compute(todo: list[int]) -> Any:
+            # lazy generator: yield positions of a batch of groups without slicing them all
+            def _batch_iter() -> Iterator[tuple[Any, Any, Any, Any]]:
+                for i in todo:
+                    first, last = batch_bounds[i]
+                    positions = concatenate([indices[key] for key in keys[first:last]])
+                    batch_sizes = sizes[first:last]
+                    batch_keys = result_index[first:last]
+                    if source is None:
+                        yield obj.take(positions), None, batch_sizes, batch_keys
+                    else:
+                        yield source, positions, batch_sizes, batch_keys
+
+            # generator with length defined (for progressbar)
+            batches = tqdm(_batch_iter(), disable=True, total=len(todo))
+            processed = multiprocessing_imap(
+                run_batch,
+                batches,
+                n_workers=n_workers,
+                progressbar=progressbar,
+                stats=stats,
+                engine=pool_engine,
+                initializer=initializer,
+                initargs=initargs,
+                max_memory=max_memory,
+            )
+            return zip(todo, processed, strict=True)
+
+        if cache is None:
+            batch_bounds = balanced_bounds(
+                sizes if group_cost is None else group_cost(sizes),
+                n_batches,
+            )
+            # consume lazily from the multiprocessing_imap generator
+            blocks = [block for _, block in compute(list(range(len(batch_bounds))))]
+        else:
+            with Timer(stats, "split_seconds"):
+                batch_bounds, cache_keys = group_batches(
+                    fingerprint(
+                        func,
+                        window_method,
+                        window_kwargs,
+                        names,
+                        args,
+                        kwargs,
+                    ),
+                    obj,
+                    result_index,
+                    sizes,
+                    rows=lambda first, last: concatenate(
+                        [indices[key] for key in keys[first:last]],
+                    ),
+                    n_batches=n_batches,
+                )
+            blocks = cached_results(cache, cache_keys, compute)
+
+    # restore key order
+    ordered_blocks = dict(zip(batch_bounds, blocks, strict=True))
+    result = concat([ordered_blocks[bounds] for bounds in sorted(ordered_blocks)])
 
     if not as_index:
         result = result.reset_index(level=list(range(len(groupby_names))))
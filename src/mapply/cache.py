@@ -0,0 +1,381 @@
+# BSD 3-Clause License
+#
+# Copyright (c) 2024, ddelange, <ddelange@delange.dev>
+#
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#
+# 1. Redistributions of source code must retain the above copyright notice, this
+#    list of conditions and the following disclaimer.
+#
+# 2. Redistributions in binary form must reproduce the above copyright notice,
+#    this list of conditions and the following disclaimer in the documentation
+#    and/or other materials provided with the distribution.
+#
+# 3. Neither the name of the copyright holder nor the names of its
+#    contributors may be used to endorse or promote products derived from
+#    this software without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+# DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE
+# FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL
+# DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR
+# SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER
+# CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY,
+# OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+# OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+#
+# SPDX-License-Identifier: BSD-3-Clause
+"""Submodule containing an opt-in disk cache of chunk results.
+
+Each chunk is keyed by a hash of its content (see
+:meth:`pandas.util.hash_pandas_object`) together with a fingerprint of the applied
+function and its arguments, such that only chunks whose content changed are recomputed.
+
+Example usage:
+::
+
+    import pandas as pd
+    import mapply
+
+    mapply.init(cache="~/.cache/mapply")
+
+    df = pd.read_parquet("daily.parquet")
+    df["squared"] = df.A.mapply(lambda x: x ** 2)  # only recomputes changed chunks
+
+Chunk boundaries are content-defined: a chunk ends where the hash of a row (or column,
+or group key) is divisible by the average chunk length, so that inserting, dropping or
+appending rows only affects the chunks around the change. Rows are hashed including
+their index label.
+
+Functions are fingerprinted using dill, which pickles lambdas and functions defined in
+``__main__`` by value (code, including line numbers, and closure), but functions
+imported from modules by reference. Clear the cache when changing the implementation of
+an imported function.
+"""
+
+import hashlib
+import logging
+import os
+from collections.abc import Callable, Iterable, Sequence
+from contextlib import suppress
+from functools import lru_cache
+from itertools import pairwise
+from pathlib import Path
+from typing import Any
+from uuid import uuid4
+
+logger = logging.getLogger(__name__)
+
+MAX_BYTES = int(os.environ.get("MAPPLY_CACHE_MAX_BYTES", str(1 << 30)))
+# chunks without a content-defined boundary are cut at this multiple of the average size
+MAX_CHUNK_FACTOR = 4
+SUFFIX = ".pkl"
+# 2**64 / golden ratio, spreads hashes over the top bits
+FIBONACCI_MULTIPLIER = 0x9E3779B97F4A7C15
+
+
+class ChunkCache:
+    """Size-bounded directory of pickled chunk results, evicting least recently used.
+
+    Args:
+        directory: Directory to store the results in (created if necessary).
+        max_bytes: Maximum total size of the stored results, defaults to
+            ``MAPPLY_CACHE_MAX_BYTES`` (1 GiB).
+    """
+
+    def __init__(
+        self,
+        directory: str | os.PathLike,
+        max_bytes: int = MAX_BYTES,
+    ) -> None:
+        self.directory = Path(directory).expanduser()
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.max_bytes = max_bytes
+
+    def _path(self, key: str) -> Path:
+        return self.directory / f"{key}{SUFFIX}"
+
+    def get(self, key: str) -> tuple[bool, Any]:
+        """Look up the result stored under key.
+
+        Args:
+            key: Key as returned by :meth:`chunk_keys`.
+
+        Returns:
+            Whether the key was found, and the result (None if not found).
+        """
+        import dill
+
+        path = self._path(key)
+        try:
+            with path.open("rb") as f:
+                value = dill.load(f)  # noqa: S301
+        except (OSError, EOFError, dill.UnpicklingError):
+            return False, None
+        # mark as recently used
+        with suppress(OSError):  # evicted concurrently
+            os.utime(path)
+        return True, value
+
+    def put(self, key: str, value: Any) -> None:
+        """Store value under key, atomically.
+
+        Args:
+            key: Key as returned by :meth:`chunk_keys`.
+            value: Picklable result.
+        """
+        import dill
+
+        path = self._path(key)
+        tmp = path.with_name(f".{path.name}.{uuid4().hex}")
+        with tmp.open("wb") as f:
+            dill.dump(value, f)
+        tmp.replace(path)
+
+    def evict(self) -> None:
+        """Remove least recently used results until the cache fits max_bytes."""
+        entries = []
+        for path in self.directory.glob(f"*{SUFFIX}"):
+            try:
+                stat = path.stat()
+            except OSError:  # removed concurrently
+                continue
+            entries.append((stat.st_mtime, stat.st_size, path))
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries, key=lambda entry: entry[0]):
+            if total <= self.max_bytes:
+                break
+            path.unlink(missing_ok=True)
+            total -= size
+            logger.debug("Evicted %s from cache", path.name)
+
+    def clear(self) -> None:
+        """Remove all results."""
+        for path in self.directory.glob(f"*{SUFFIX}"):
+            path.unlink(missing_ok=True)
+
+
+def as_cache(cache: "str | os.PathLike | ChunkCache | None") -> ChunkCache | None:
+    """Wrap a directory in a :class:`ChunkCache`, if it isn't one already."""
+    if cache is None or isinstance(cache, ChunkCache):
+        return cache
+    return ChunkCache(cache)
+
+
+def fingerprint(*objs: Any) -> bytes:
+    """Digest of the pickled objs, e.g. a function and its arguments.
+
+    :class:`mapply.Broadcast` handles are pickled as the digest of their object, as
+    their tokens differ every time, and pickling them would write them to disk.
+    """
+    import io
+
+    stream = io.BytesIO()
+    _fingerprint_pickler()(stream).dump(objs)
+    return hashlib.sha256(stream.getvalue()).digest()
+
+
+@lru_cache(maxsize=1)
+def _fingerprint_pickler() -> type:
+    """Dill Pickler replacing :class:`mapply.Broadcast` handles by their digest."""
+    import dill
+
+    from mapply._broadcast import Broadcast
+
+    class FingerprintPickler(dill.Pickler):
+        def persistent_id(self, obj: Any) -> Any:
+            if isinstance(obj, Broadcast):
+                return ("mapply.Broadcast", obj.digest)
+            return None
+
+    return FingerprintPickler
+
+
+def label_hashes(labels: Any) -> Any:
+    """Hash each label of an Index (or MultiIndex) to a uint64."""
+    from pandas.util import hash_pandas_object
+
+    return hash_pandas_object(labels).to_numpy()
+
+
+def element_hashes(df_or_series: Any, axis: int) -> Any:
+    """Hash each row (axis=0) or column (axis=1), including its label, to a uint64.
+
+    Args:
+        df_or_series: Object to hash.
+        axis: Axis along which to hash.
+
+    Returns:
+        Array of uint64 hashes.
+    """
+    from numpy import fromiter, uint64
+    from pandas.util import hash_pandas_object
+
+    if axis == 0:
+        return hash_pandas_object(df_or_series, index=True).to_numpy()
+    label_digests = label_hashes(df_or_series.columns)
+    return fromiter(
+        (
+            int.from_bytes(
+                hashlib.sha256(
+                    hash_pandas_object(column, index=True).to_numpy().tobytes()
+                    + label_digests[j : j + 1].tobytes()
+                    + str(column.dtype).encode(),
+                ).digest()[:8],
+            )
+            for j, (_, column) in enumerate(df_or_series.items())
+        ),
+        dtype=uint64,
+        count=df_or_series.shape[1],
+    )
+
+
+def meta_fingerprint(df_or_series: Any, axis: int) -> bytes:
+    """Digest of what element_hashes doesn't cover: the labels and dtypes across axis."""
+    if axis == 1:
+        return fingerprint(None)
+    if hasattr(df_or_series, "columns"):
+        return fingerprint(
+            label_hashes(df_or_series.columns),
+            list(map(str, df_or_series.dtypes)),
+        )
+    return fingerprint(df_or_series.name, str(df_or_series.dtype))
+
+
+def content_defined_bounds(hashes: Any, n_chunks: int) -> list[tuple[int, int]]:
+    """Split range(len(hashes)) into about n_chunks pairs, cutting at 1 in size hashes.
+
+    Boundaries only depend on the hash of the element after them, so they stay put
+    when elements elsewhere change. The average size is rounded to a power of two,
+    such that it stays put when the amount of elements changes a little.
+
+    Args:
+        hashes: Array of uint64 hashes, one per element.
+        n_chunks: Desired amount of chunks.
+
+    Returns:
+        List of (start, stop) pairs covering all elements.
+    """
+    from numpy import arange, flatnonzero, uint64
+
+    n_elements = len(hashes)
+    if not n_elements:
+        return []
+    average = n_elements // max(1, n_chunks)
+    # round to the nearest power of two
+    bits = max(0, (average + average // 2).bit_length() - 1)
+    size = 1 << bits
+    if bits:
+        # the low bits of combined pandas hashes are skewed, so mix and use the top bits
+        mixed = hashes * uint64(FIBONACCI_MULTIPLIER)
+        cuts = flatnonzero(mixed >> uint64(64 - bits) == 0)
+    else:
+        cuts = arange(n_elements)
+    edges = [0, *(int(cut) for cut in cuts if cut), n_elements]
+
+    # cap runs without a boundary at fixed offsets from their start
+    bounds = []
+    max_size = MAX_CHUNK_FACTOR * size
+    for start, stop in pairwise(edges):
+        bounds.extend(
+            (offset, min(offset + max_size, stop))
+            for offset in range(start, stop, max_size)
+        )
+    return bounds
+
+
+def chunk_keys(
+    func_fingerprint: bytes,
+    meta: bytes,
+    payloads: Iterable[bytes],
+) -> list[str]:
+    """Cache key of each chunk.
+
+    Args:
+        func_fingerprint: See :meth:`fingerprint`.
+        meta: Digest of anything else determining the results of all chunks.
+        payloads: Per chunk, the concatenated hashes of its elements.
+
+    Returns:
+        Hex digest for each chunk.
+    """
+    return [
+        hashlib.sha256(func_fingerprint + meta + payload).hexdigest()
+        for payload in payloads
+    ]
+
+
+def group_batches(  # noqa: PLR0913
+    func_fingerprint: bytes,
+    obj: Any,
+    group_keys: Any,
+    sizes: Any,
+    *,
+    rows: Callable[[int, int], Any],
+    n_batches: int,
+) -> tuple[list[tuple[int, int]], list[str]]:
+    """Cut groups into content-defined batches, and compute the cache key of each.
+
+    Args:
+        func_fingerprint: See :meth:`fingerprint`.
+        obj: Series or DataFrame being grouped.
+        group_keys: Index of group keys.
+        sizes: Array of group sizes.
+        rows: Function mapping the (first, last) group ordinals of a batch to the
+            positions of its rows in obj.
+        n_batches: Desired amount of batches.
+
+    Returns:
+        (first, last) group ordinals of each batch, and the key of each batch.
+    """
+    key_hashes = label_hashes(group_keys)
+    row_hashes = element_hashes(obj, 0)
+    batch_bounds = content_defined_bounds(key_hashes, n_batches)
+    keys = chunk_keys(
+        func_fingerprint,
+        meta_fingerprint(obj, 0),
+        (
+            row_hashes[rows(first, last)].tobytes()
+            + sizes[first:last].tobytes()
+            + key_hashes[first:last].tobytes()
+            for first, last in batch_bounds
+        ),
+    )
+    return batch_bounds, keys
+
+
+def cached_results(
+    cache: ChunkCache,
+    keys: Sequence[str],
+    compute: Callable[[list[int]], Iterable[tuple[int, Any]]],
+) -> list[Any]:
+    """Look up the result of each key, computing and storing the missing ones.
+
+    Args:
+        cache: Cache to use.
+        keys: Key of each chunk.
+        compute: Function receiving the ordinals of the missing chunks, yielding
+            (ordinal, result) pairs.
+
+    Returns:
+        Result of each chunk, in the order of keys.
+    """
+    results: list[Any] = [None] * len(keys)
+    missing = []
+    for i, key in enumerate(keys):
+        hit, results[i] = cache.get(key)
+        if not hit:
+            missing.append(i)
+    logger.debug("Found %d of %d chunks in cache", len(keys) - len(missing), len(keys))
+
+    if missing:
+        for i, result in compute(missing):
+            cache.put(keys[i], result)
+            results[i] = result
+        cache.evict()
+    return results
@@ -0,0 +1,716 @@
+# BSD 3-Clause License
+#
+# Copyright (c) 2024, ddelange, <ddelange@delange.dev>
+#
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#
+# 1. Redistributions of source code must retain the above copyright notice, this
+#    list of conditions and the following disclaimer.
+#
+# 2. Redistributions in binary form must reproduce the above copyright notice,
+#    this list of conditions and the following disclaimer in the documentation
+#    and/or other materials provided with the distribution.
+#
+# 3. Neither the name of the copyright holder nor the names of its
+#    contributors may be used to endorse or promote products derived from
+#    this software without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+# DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE
+# FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL
+# DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR
+# SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER
+# CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY,
+# OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+# OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+#
+# SPDX-License-Identifier: BSD-3-Clause
+"""Run mapply on workers across machines, connected over TCP.
+
+Each machine runs a worker server, which processes the tasks it receives in a local
+process pool:
+::
+
+    export MAPPLY_CLUSTER_AUTHKEY=some-shared-secret
+    python -m mapply.cluster --host 0.0.0.0 --port 7070 --n-workers -1
+
+While a :class:`Cluster` of those servers is active, all parallel work (including
+GroupBy and window GroupBy batches) is dispatched to it, like to a persistent
+:class:`mapply.Pool`:
+::
+
+    import mapply
+    from mapply.cluster import Cluster
+
+    with Cluster(["node1:7070", "node2:7070"]):
+        df["features"] = df.mapply(featurize, axis=1)
+
+Servers connect with ``multiprocess.connection``, authenticating with a shared secret
+(the authkey argument, or the ``MAPPLY_CLUSTER_AUTHKEY`` environment variable). Tasks
+are pickled with dill, so servers execute whatever a client with the authkey sends them:
+only expose them on trusted networks.
+
+Tasks go to the node with the least tasks in flight per worker, or to the node hinted
+by the locality function if it has a free worker. When a node is lost, its tasks in
+flight are resubmitted to the remaining nodes, up to ``MAPPLY_CLUSTER_MAX_RETRIES``
+times per task.
+
+Workers can't read files on the machine submitting the tasks, so the shared_memory and
+fork transports fall back to pickling, and :meth:`mapply.broadcast` handles are pickled
+along with each task (unless created with a directory on a shared filesystem).
+
+For tests, :meth:`local_cluster` runs the servers as local processes.
+"""
+
+import logging
+import os
+import subprocess
+import sys
+import threading
+from collections.abc import Callable, Iterable, Iterator, Sequence
+from contextlib import contextmanager, suppress
+from dataclasses import dataclass
+from functools import partial
+from itertools import count
+from secrets import token_hex
+from typing import Any, Self
+
+from mapply import parallel
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_PORT = 7070
+MAX_RETRIES = int(os.environ.get("MAPPLY_CLUSTER_MAX_RETRIES", "2"))
+AUTHKEY_ENV = "MAPPLY_CLUSTER_AUTHKEY"
+
+Address = tuple[str, int]
+
+
+def _authkey(authkey: bytes | str | None) -> bytes:
+    """Resolve authkey, falling back to the environment.
+
+    Args:
+        authkey: Secret shared by clients and servers, or None.
+
+    Returns:
+        The authkey as bytes.
+
+    Raises:
+        ValueError: If no authkey is configured, as servers would run any task.
+    """
+    authkey = authkey or os.environ.get(AUTHKEY_ENV)
+    if not authkey:
+        msg = f"Pass an authkey, or set the {AUTHKEY_ENV} environment variable"
+        raise ValueError(msg)
+    return authkey.encode() if isinstance(authkey, str) else authkey
+
+
+def parse_address(address: str | Address) -> Address:
+    """Parse "host:port" (or "host", for the default port) into a (host, port) pair."""
+    if isinstance(address, str):
+        host, _, port = address.rpartition(":") if ":" in address else (address, "", "")
+        return host, int(port or DEFAULT_PORT)
+    return address[0], int(address[1])
+
+
+def _run_payload(payload: bytes) -> bytes:
+    """Unpickle and call a task in a worker, pickling its result."""
+    import dill
+
+    func, args = dill.loads(payload)  # noqa: S301
+    return dill.dumps(func(*args))
+
+
+def _handle(conn: Any, n_workers: int) -> None:
+    """Process the tasks of one connected client in a local pool, until it disconnects."""
+    lock = threading.Lock()
+
+    def reply(task_id: int, ok: bool, value: Any) -> None:  # noqa: FBT001
+        try:
+            with lock:
+                conn.send(("done", task_id, ok, value))
+        except (OSError, ValueError):
+            # client is gone
+            pass
+        except Exception:  # noqa: BLE001
+            # unpicklable exception
+            reply(task_id, False, RuntimeError(repr(value)))  # noqa: FBT003
+
+    pool = None
+    try:
+        conn.send(("hello", n_workers))
+        _, initializer, initargs = conn.recv()
+        # workers are kept warm, and only recycled on request (see max_worker_rss)
+        pool = parallel._start_pool(  # noqa: SLF001
+            n_workers,
+            None,
+            initializer=initializer,
+            initargs=initargs,
+            # unique id so pathos doesn't share this pool with other clients
+            id=f"mapply-cluster-{id(conn)}",
+        )
+        while True:
+            message = conn.recv()
+            if message[0] == "task":
+                _, task_id, payload = message
+                pool._serve().apply_async(  # noqa: SLF001
+                    _run_payload,
+                    (payload,),
+                    callback=partial(reply, task_id, True),  # noqa: FBT003
+                    error_callback=partial(reply, task_id, False),  # noqa: FBT003
+                )
+            elif message[0] == "restart":
+                pool.restart(force=True)
+            elif message[0] == "terminate":
+                # the pool restarts on next use
+                pool.terminate()
+                pool.clear()
+    except (EOFError, OSError):
+        logger.debug("Client disconnected")
+    finally:
+        if pool is not None:
+            pool.terminate()
+            pool.clear()
+        conn.close()
+
+
+def serve(
+    address: str | Address = ("127.0.0.1", DEFAULT_PORT),
+    n_workers: int = -1,
+    *,
+    authkey: bytes | str | None = None,
+) -> None:
+    """Run a worker server, processing the tasks of connecting clients until killed.
+
+    Each connected client (see :class:`ClusterExecutor`) gets a fresh process pool of
+    n_workers, running the client's initializer.
+
+    Args:
+        address: (host, port) or "host:port" to listen on. Use host "0.0.0.0" to accept
+            connections from other machines, and port 0 for any free port.
+        n_workers: Amount of worker processes per client, see
+            :meth:`mapply.parallel.multiprocessing_imap`.
+        authkey: Secret shared with the clients, defaults to the
+            ``MAPPLY_CLUSTER_AUTHKEY`` environment variable.
+    """
+    from multiprocess import AuthenticationError
+    from multiprocess.connection import Listener
+
+    n_workers = parallel._choose_n_workers(None, n_workers)  # noqa: SLF001
+    with Listener(parse_address(address), authkey=_authkey(authkey)) as listener:
+        host, port = listener.address
+        # announced on stdout, such that callers can discover a free port
+        print(f"Serving {n_workers} workers on {host}:{port}", flush=True)  # noqa: T201
+        while True:
+            try:
+                conn = listener.accept()
+            except (AuthenticationError, EOFError, OSError) as exc:
+                logger.warning("Rejected connection: %r", exc)
+                continue
+            threading.Thread(
+                target=_handle,
+                args=(conn, n_workers),
+                daemon=True,
+            ).start()
+
+
+class ClusterResult:
+    """Result of a task submitted to a :class:`ClusterExecutor`.
+
+    Behaves like the AsyncResult of a multiprocess pool.
+    """
+
+    def __init__(
+        self,
+        callback: Callable[[Any], Any] | None = None,
+        error_callback: Callable[[BaseException], Any] | None = None,
+    ) -> None:
+        self._event = threading.Event()
+        self._ok = False
+        self._value: Any = None
+        self._callback = callback
+        self._error_callback = error_callback
+
+    def _set(self, ok: bool, value: Any) -> None:  # noqa: FBT001
+        self._ok, self._value = ok, value
+        self._event.set()
+        callback = self._callback if ok else self._error_callback
+        if callback is not None:
+            callback(value)
+
+    def ready(self) -> bool:
+        """Whether the task completed."""
+        return self._event.is_set()
+
+    def successful(self) -> bool:
+        """Whether the task completed without raising."""
+        return self.ready() and self._ok
+
+    def wait(self, timeout: float | None = None) -> None:
+        """Wait until the task completed, or until timeout seconds passed."""
+        self._event.wait(timeout)
+
+    def get(self, timeout: float | None = None) -> Any:
+        """Wait for the result of the task.
+
+        Re-raises the exception raised by the task, or a ConnectionError if all
+        attempts to run it were lost.
+
+        Args:
+            timeout: Amount of seconds to wait at most.
+
+        Returns:
+            The value returned by the task.
+
+        Raises:
+            TimeoutError: If the task didn't complete in time.
+        """
+        if not self._event.wait(timeout):
+            raise TimeoutError
+        return self._outcome()
+
+    def _outcome(self) -> Any:
+        """Return the value of a successful task, else raise its exception."""
+        if self._ok:
+            return self._value
+        raise self._value
+
+
+@dataclass
+class _Task:
+    id: int
+    payload: bytes
+    hint: Any
+    result: ClusterResult
+    attempts: int = 0
+
+
+class _Node:
+    """Connection to a worker server, with the tasks it is processing."""
+
+    def __init__(self, address: Address, conn: Any, n_workers: int) -> None:
+        self.address = address
+        self.conn = conn
+        self.n_workers = n_workers
+        self.in_flight: dict[int, _Task] = {}
+        self.alive = True
+        self.send_lock = threading.Lock()
+
+    def matches(self, hint: Any) -> bool:
+        """Whether hint designates this node, by (host, port), "host:port" or host."""
+        host, port = self.address
+        return hint in (self.address, f"{host}:{port}", host)
+
+
+class ClusterExecutor:
+    """Executor (see :class:`mapply.parallel.Executor`) sending tasks to worker servers.
+
+    Args:
+        addresses: Addresses of servers started with :meth:`serve`.
+        authkey: Secret shared with the servers, defaults to the
+            ``MAPPLY_CLUSTER_AUTHKEY`` environment variable.
+        initializer: Function to run once in every worker, see
+            :meth:`mapply.parallel.multiprocessing_imap`.
+        initargs: Positional arguments to pass to initializer.
+        locality: Function mapping a submitted element to the address (or host) of the
+            node that should preferably process it, e.g. the node that has its input
+            files on a local disk. Returns None for no preference.
+        max_retries: Amount of times a task is resubmitted after losing the node it
+            was sent to.
+
+    Raises:
+        ConnectionError: If none of the servers could be reached.
+    """
+
+    def __init__(  # noqa: PLR0913
+        self,
+        addresses: Iterable[str | Address],
+        *,
+        authkey: bytes | str | None = None,
+        initializer: Callable | None = None,
+        initargs: tuple[Any, ...] = (),
+        locality: Callable[[Any], Any] | None = None,
+        max_retries: int = MAX_RETRIES,
+    ) -> None:
+        from multiprocess.connection import Client
+
+        self.locality = locality
+        self.max_retries = max_retries
+        self._lock = threading.Lock()
+        self._ids = count()
+        self._closing = False
+        self.nodes: list[_Node] = []
+        key = _authkey(authkey)
+        for address in map(parse_address, addresses):
+            try:
+                conn = Client(address, authkey=key)
+                _, n_workers = conn.recv()
+                conn.send(("init", initializer, initargs))
+            except (EOFError, OSError) as exc:
+                logger.warning("Skipping node %s:%d: %r", *address, exc)
+                continue
+            node = _Node(address, conn, n_workers)
+            self.nodes.append(node)
+            threading.Thread(target=self._receive, args=(node,), daemon=True).start()
+        if not self.nodes:
+            msg = "None of the cluster nodes could be reached"
+            raise ConnectionError(msg)
+        logger.debug(
+            "Connected to %d workers on %d nodes",
+            self.n_workers,
+            len(self.nodes),
+        )
+
+    @property
+    def n_workers(self) -> int:
+        """Amount of workers on the nodes that are still connected."""
+        return sum(node.n_workers for node in self.nodes if node.alive)
+
+    def apply_async(
+        self,
+        func: Callable,
+        args: tuple[Any, ...] = (),
+        kwds: dict[str, Any] | None = None,
+        callback: Callable[[Any], Any] | None = None,
+        error_callback: Callable[[BaseException], Any] | None = None,
+    ) -> ClusterResult:
+        """Submit func(*args, **kwds), calling callback or error_callback on completion.
+
+        Args:
+            func: Function to call on a worker.
+            args: Positional arguments to pass to func. The first one is passed to the
+                locality function.
+            kwds: Keyword arguments to pass to func.
+            callback: Function to call with the result, from a receiving thread.
+            error_callback: Function to call with the exception, from a receiving
+                thread.
+
+        Returns:
+            Handle to the result.
+        """
+        import dill
+
+        result = ClusterResult(callback, error_callback)
+        hint = self.locality(args[0]) if self.locality is not None and args else None
+        # recurse, such that functions defined in __main__ take their globals along
+        payload = dill.dumps(
+            (partial(func, **kwds) if kwds else func, args),
+            recurse=True,
+        )
+        self._dispatch(_Task(next(self._ids), payload, hint, result))
+        return result
+
+    def apipe(self, func: Callable, *args: Any) -> ClusterResult:
+        """Submit func(*args), see :meth:`apply_async`."""
+        return self.apply_async(func, args)
+
+    def imap(self, func: Callable, iterable: Iterable[Any]) -> Iterator[Any]:
+        """Apply func to each element of iterable, yielding results in order."""
+        return parallel._bounded_imap(  # noqa: SLF001
+            self,
+            func,
+            iterable,
+            max_in_flight=2 * self.n_workers,
+            ordered=True,
+        )
+
+    def uimap(self, func: Callable, iterable: Iterable[Any]) -> Iterator[Any]:
+        """Apply func to each element of iterable, yielding results as they complete."""
+        return parallel._bounded_imap(  # noqa: SLF001
+            self,
+            func,
+            iterable,
+            max_in_flight=2 * self.n_workers,
+            ordered=False,
+        )
+
+    def restart(self, force: bool = False) -> Self:  # noqa: FBT001, FBT002, ARG002
+        """Replace the workers on every node by fresh ones (e.g. to release memory)."""
+        self._broadcast(("restart",))
+        return self
+
+    def terminate(self) -> None:
+        """Stop the workers on every node immediately, abandoning tasks in flight."""
+        with self._lock:
+            for node in self.nodes:
+                node.in_flight.clear()
+        self._broadcast(("terminate",))
+
+    def clear(self) -> None:
+        """Disconnect from all nodes, which then shut down their workers."""
+        self._closing = True
+        for node in self.nodes:
+            node.alive = False
+            node.conn.close()
+
+    def _broadcast(self, message: tuple[Any, ...]) -> None:
+        for node in self.nodes:
+            if node.alive:
+                try:
+                    with node.send_lock:
+                        node.conn.send(message)
+                except (OSError, ValueError):
+                    self._lost(node)
+
+    def _choose(self, hint: Any) -> _Node | None:
+        """Least loaded node, preferring the hinted one if it has a free worker."""
+        nodes = [node for node in self.nodes if node.alive]
+        if hint is not None:
+            preferred = [
+                node
+                for node in nodes
+                if node.matches(hint) and len(node.in_flight) < node.n_workers
+            ]
+            nodes = preferred or nodes
+        if not nodes:
+            return None
+        return min(nodes, key=lambda node: len(node.in_flight) / node.n_workers)
+
+    def _dispatch(self, task: _Task) -> None:
+        with self._lock:
+            node = self._choose(task.hint)
+            if node is not None:
+                node.in_flight[task.id] = task
+        if node is None:
+            msg = "Lost connection to all cluster nodes"
+            task.result._set(False, ConnectionError(msg))  # noqa: FBT003, SLF001
+            return
+        try:
+            with node.send_lock:
+                node.conn.send(("task", task.id, task.payload))
+        except (OSError, ValueError):
+            # resubmits the task
+            self._lost(node)
+
+    def _receive(self, node: _Node) -> None:
+        """Resolve the results sent by node, until it disconnects."""
+        import dill
+
+        while True:
+            try:
+                _, task_id, ok, value = node.conn.recv()
+            except (EOFError, OSError, TypeError):
+                # TypeError when closed by another thread
+                self._lost(node)
+                return
+            with self._lock:
+                task = node.in_flight.pop(task_id, None)
+            if task is None:
+                # terminated
+                continue
+            if ok:
+                value = dill.loads(value)  # noqa: S301
+            task.result._set(ok, value)  # noqa: SLF001
+
+    def _lost(self, node: _Node) -> None:
+        """Mark node as lost, and resubmit its tasks in flight to the other nodes."""
+        with self._lock:
+            if not node.alive and not node.in_flight:
+                return
+            node.alive = False
+            orphans = list(node.in_flight.values())
+            node.in_flight.clear()
+        node.conn.close()
+        if self._closing:
+            return
+        host, port = node.address
+        logger.warning(
+            "Lost connection to %s:%d, resubmitting %d tasks",
+            host,
+            port,
+            len(orphans),
+        )
+        for task in orphans:
+            task.attempts += 1
+            if task.attempts > self.max_retries:
+                msg = f"Lost connection to {host}:{port} after {task.attempts} attempts"
+                task.result._set(False, ConnectionError(msg))  # noqa: FBT003, SLF001
+            else:
+                self._dispatch(task)
+
+
+class Cluster(parallel.Pool):
+    """Persistent pool of workers on other machines, each running a worker server.
+
+    While active (as context manager, or after :meth:`activate`), all parallel work
+    is sent to the workers of the servers, see :class:`ClusterExecutor`. Its size is
+    then the default n_workers (instead of the local CPU count).
+
+    Args:
+        addresses: Addresses of servers started with :meth:`serve` (or
+            ``python -m mapply.cluster``), as "host:port" or (host, port).
+        authkey: Secret shared with the servers, defaults to the
+            ``MAPPLY_CLUSTER_AUTHKEY`` environment variable.
+        initializer: Function to run once in every worker when it starts, see
+            :class:`mapply.Pool`.
+        initargs: Positional arguments to pass to initializer.
+        locality: Function mapping a submitted element to the address (or host) of the
+            node that should preferably process it, see :class:`ClusterExecutor`.
+        max_retries: Amount of times a task is resubmitted after losing its node.
+    """
+
+    def __init__(  # noqa: PLR0913
+        self,
+        addresses: Iterable[str | Address],
+        *,
+        authkey: bytes | str | None = None,
+        initializer: Callable | None = None,
+        initargs: tuple[Any, ...] = (),
+        locality: Callable[[Any], Any] | None = None,
+        max_retries: int = MAX_RETRIES,
+    ) -> None:
+        super().__init__(
+            1,
+            max_tasks_per_child=None,
+            initializer=initializer,
+            initargs=initargs,
+        )
+        self.addresses = list(addresses)
+        self.authkey = _authkey(authkey)
+        self.locality = locality
+        self.max_retries = max_retries
+        # connect right away to learn the amount of workers
+        self.n_workers = self._serve().n_workers
+
+    @property
+    def remote(self) -> bool:
+        """Workers run on other machines."""
+        return True
+
+    def _serve(self) -> ClusterExecutor:
+        """Return the executor, connecting to the servers if necessary."""
+        if self._pool is None:
+            self._pool = ClusterExecutor(
+                self.addresses,
+                authkey=self.authkey,
+                initializer=self.initializer,
+                initargs=self.initargs,
+                locality=self.locality,
+                max_retries=self.max_retries,
+            )
+        return self._pool
+
+
+def spawn_server(
+    n_workers: int = 1,
+    *,
+    authkey: bytes | str | None = None,
+    host: str = "127.0.0.1",
+) -> tuple[subprocess.Popen, Address]:
+    """Start a worker server in a local subprocess, listening on a free port.
+
+    The subprocess inherits the import path of this process, so that it can import the
+    modules defining the submitted functions.
+
+    Args:
+        n_workers: Amount of worker processes of the server.
+        authkey: Secret shared with the clients, defaults to the
+            ``MAPPLY_CLUSTER_AUTHKEY`` environment variable.
+        host: Host to listen on.
+
+    Returns:
+        The server process, and its address.
+
+    Raises:
+        RuntimeError: If the server didn't start.
+    """
+    env = {
+        **os.environ,
+        AUTHKEY_ENV: _authkey(authkey).decode(),
+        "PYTHONPATH": os.pathsep.join(path for path in sys.path if path),
+    }
+    process = subprocess.Popen(  # noqa: S603
+        [
+            sys.executable,
+            "-m",
+            "mapply.cluster",
+            f"--host={host}",
+            "--port=0",
+            f"--n-workers={n_workers}",
+        ],
+        env=env,
+        stdout=subprocess.PIPE,
+        text=True,
+    )
+    line = process.stdout.readline() if process.stdout is not None else ""
+    if not line:
+        process.kill()
+        msg = f"Worker server exited with code {process.wait()}"
+        raise RuntimeError(msg)
+    return process, parse_address(line.split()[-1])
+
+
+@contextmanager
+def local_cluster(
+    n_nodes: int = 2,
+    n_workers: int = 1,
+    **kwargs: Any,
+) -> Iterator[Cluster]:
+    """Run n_nodes worker servers as local processes, yielding an active :class:`Cluster`.
+
+    A stand-in for a real cluster, e.g. in tests.
+
+    Args:
+        n_nodes: Amount of servers to start.
+        n_workers: Amount of worker processes per server.
+        **kwargs: Keyword arguments for :class:`Cluster`. Without authkey, a random one
+            is generated.
+
+    Yields:
+        The active cluster.
+    """
+    kwargs.setdefault("authkey", os.environ.get(AUTHKEY_ENV) or token_hex(16))
+    processes: list[subprocess.Popen] = []
+    try:
+        addresses: Sequence[Address] = []
+        for _ in range(n_nodes):
+            process, address = spawn_server(n_workers, authkey=kwargs["authkey"])
+            processes.append(process)
+            addresses = [*addresses, address]
+        with Cluster(addresses, **kwargs) as cluster:
+            yield cluster
+    finally:
+        for process in processes:
+            process.terminate()
+            process.wait()
+
+
+def main(argv: Sequence[str] | None = None) -> None:
+    """Run a worker server from the command line, see :meth:`serve`."""
+    import argparse
+
+    parser = argparse.ArgumentParser(
+        prog="python -m mapply.cluster",
+        description=(
+            "Serve mapply workers to clusters connecting over TCP. "
+            f"Set {AUTHKEY_ENV} to a secret shared with the clients."
+        ),
+    )
+    parser.add_argument(
+        "--host",
+        default="127.0.0.1",
+        help="host to listen on, 0.0.0.0 to accept other machines",
+    )
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    parser.add_argument(
+        "--n-workers",
+        type=int,
+        default=-1,
+        help="amount of worker processes per client (default: all sensible CPUs)",
+    )
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=logging.INFO)
+    with suppress(KeyboardInterrupt):
+        serve((args.host, args.port), args.n_workers)
+
+
+if __name__ == "__main__":
+    # run the functions of mapply.cluster, not of __main__ (which dill would inline)
+    from mapply.cluster import main as _main
+
+    _main()
@@ -43,50 +43,602 @@ Standalone usage (without init):
     df["squared"] = mapply(df.A, lambda x: x ** 2, progressbar=False)
 """
 
-from collections.abc import Callable
+import logging
+import os
+import sys
+import time
+from collections.abc import Callable, Iterable, Iterator
 from functools import partial
+from os import PathLike
 from typing import Any
 
+from mapply import parallel
+from mapply._assembly import Assembler
+from mapply._broadcast import resolving
+from mapply._chunking import (
+    TARGET_CHUNK_SECONDS,
+    THREAD_TARGET_CHUNK_SECONDS,
+    adaptive_bounds,
+    pays_off,
+    projected_seconds,
+    run_pilot,
+    run_threaded_pilot,
+    slice_chunk,
+    split_bounds,
+)
+from mapply._fork import can_inherit, inherited_imap
 from mapply._groupby import run_groupwise_apply
+from mapply._resources import max_workers_for_memory
+from mapply._shared_memory import is_shareable, shared_imap
 from mapply._window_groupby import run_window_groupby_apply
-from mapply.parallel import N_CORES, multiprocessing_imap
+from mapply.cache import (
+    ChunkCache,
+    as_cache,
+    cached_results,
+    chunk_keys,
+    content_defined_bounds,
+    element_hashes,
+    fingerprint,
+    meta_fingerprint,
+)
+from mapply.parallel import (
+    _call_enumerated,
+    async_imap,
+    call_initialized,
+    check_engine,
+    enumerated_imap,
+    multiprocessing_imap,
+    resolve_max_memory,
+    tqdm,
+)
+from mapply.stats import MapplyStats, Timer
+
+logger = logging.getLogger(__name__)
 
 DEFAULT_CHUNK_SIZE = 100
 DEFAULT_MAX_CHUNKS_PER_WORKER = 8
+TRANSPORTS = ("pickle", "shared_memory", "fork")
+# engines of pandas' apply methods, passed on to pandas
+PANDAS_ENGINES = ("cython", "numba", "python")
+# delay before retrying failed chunks, doubling with every retry
+RETRY_BACKOFF_SECONDS = float(os.environ.get("MAPPLY_RETRY_BACKOFF_SECONDS", "1"))
+
+
+def __getattr__(name: str) -> Any:
+    """Forward N_CORES and N_THREADS to :mod:`mapply.parallel`, detected on first access.
+
+    Args:
+        name: Name of the attribute.
 
+    Returns:
+        The value of the attribute in :mod:`mapply.parallel`.
 
-def _choose_n_chunks(
+    Raises:
+        AttributeError: If name is not a module attribute.
+    """
+    if name in ("N_CORES", "N_THREADS"):
+        return getattr(parallel, name)
+    msg = f"module {__name__!r} has no attribute {name!r}"
+    raise AttributeError(msg)
+
+
+def _n_cores(engine: str) -> int:
+    """Amount of CPUs that workers of engine can make use of."""
+    pool = parallel.remote_pool(engine)
+    if pool is not None:
+        return pool.n_workers
+    # through the module, such that assigning mapply.mapply.N_CORES takes effect
+    this = sys.modules[__name__]
+    return this.N_THREADS if engine == "threads" else this.N_CORES
+
+
+def _choose_n_chunks(  # noqa: PLR0913
     shape: tuple[int, ...],
     axis: int,
     n_workers: int,
     chunk_size: int,
     max_chunks_per_worker: int,
+    *,
+    engine: str = "processes",
 ) -> int:
     """Choose final amount of chunks to be sent to the ProcessPool."""
     # no sense running parallel if data is too small
     n_chunks = int(shape[axis] / chunk_size)
+    n_cores = _n_cores(engine)
     if n_workers < 1:
-        n_workers = N_CORES
+        n_workers = n_cores
 
     if max_chunks_per_worker:
         # no sense making too many chunks
         n_chunks = min(n_chunks, max_chunks_per_worker * n_workers)
-    if n_chunks < 1 or n_workers == 1 or N_CORES == 1:
+    if n_chunks < 1 or n_workers == 1 or n_cores == 1:
         # no sense running parallel
         n_chunks = 1
 
     return n_chunks
 
 
+def _fit_memory(  # noqa: PLR0913
+    n_workers: int,
+    df_or_series: Any,
+    axis: int,
+    bounds: list[tuple[int, int]],
+    *,
+    engine: str,
+    max_memory: float | None = None,
+) -> int:
+    """Lower n_workers such that each can hold its chunk in memory at the same time.
+
+    Chunk sizes are estimated from the shallow memory usage of df_or_series, see
+    :meth:`mapply._resources.max_workers_for_memory`, within max_memory if given.
+    Threads don't copy their chunks.
+    """
+    if engine == "threads" or len(bounds) <= 1:
+        return n_workers
+    if n_workers < 1:
+        n_workers = _n_cores(engine)
+    usage = df_or_series.memory_usage(index=True, deep=False)
+    total = usage.sum() if hasattr(usage, "sum") else usage
+    largest = max(stop - start for start, stop in bounds)
+    chunk_bytes = total * largest / max(1, df_or_series.shape[axis])
+    max_workers = max_workers_for_memory(chunk_bytes, resolve_max_memory(max_memory))
+    if max_workers < n_workers:
+        logger.warning(
+            "Lowering n_workers from %d to %d, such that their chunks of about %d MB fit in memory",
+            n_workers,
+            max_workers,
+            chunk_bytes // 1e6,
+        )
+        return max_workers
+    return n_workers
+
+
+def _choose_engine(  # noqa: PLR0913
+    apply: Callable,
+    df_or_series: Any,
+    axis: int,
+    start: int,
+    *,
+    compute: float,
+    serialize: float,
+) -> tuple[list[tuple[tuple[int, int], Any]], int, str, float]:
+    """Choose the engine projected to be fastest, piloting threads if they could be.
+
+    Returns the bounds and results of the chunks piloted in threads, the position up to
+    which rows were piloted, the engine, and its effective amount of workers.
+    """
+    length = df_or_series.shape[axis]
+    n_cores, n_threads = _n_cores("processes"), _n_cores("threads")
+
+    def fastest(remaining: int, speedup: float) -> str:
+        processes = projected_seconds(remaining, n_cores, compute, serialize)
+        threads = projected_seconds(
+            remaining,
+            speedup,
+            compute,
+            serialize,
+            engine="threads",
+        )
+        return "threads" if threads < processes else "processes"
+
+    # threads win at most when func releases the GIL entirely
+    if (
+        n_threads <= 1
+        or start >= length
+        or fastest(length - start, n_threads) != "threads"
+    ):
+        return [], start, "processes", n_cores
+    results, start, speedup = run_threaded_pilot(
+        apply,
+        df_or_series,
+        axis,
+        start,
+        n_threads=n_threads,
+        seconds_per_row=compute,
+    )
+    if fastest(length - start, speedup) == "threads":
+        return results, start, "threads", speedup
+    return results, start, "processes", n_cores
+
+
+def _choose_bounds(  # noqa: PLR0913
+    apply: Callable,
+    df_or_series: Any,
+    axis: int,
+    *,
+    n_workers: int | str,
+    chunk_size: int | str,
+    max_chunks_per_worker: int,
+    engine: str,
+    choose_engine: bool = False,
+    max_memory: float | None = None,
+) -> tuple[list[tuple[tuple[int, int], Any]], list[tuple[int, int]], int, str]:
+    """Choose (start, stop) positions of the chunks to be sent to the ProcessPool.
+
+    Args:
+        apply: Function that will be applied to each chunk.
+        df_or_series: Object to be chunked.
+        axis: Axis along which to chunk.
+        n_workers: See :meth:`mapply`.
+        chunk_size: See :meth:`mapply`.
+        max_chunks_per_worker: See :meth:`mapply`.
+        engine: See :meth:`mapply`.
+        choose_engine: Whether to choose between threads and processes (starting from
+            engine) when piloting, see engine="auto" in :meth:`mapply`.
+        max_memory: See :meth:`mapply`.
+
+    Returns:
+        Bounds and results of chunks that were already processed in the parent (when
+        piloting an adaptive chunk_size or n_workers), the bounds of the chunks
+        remaining to be processed, the amount of workers to process them with, and
+        the engine of those workers.
+    """
+    length = df_or_series.shape[axis]
+    n_cores = _n_cores(engine)
+    threads = engine == "threads"
+    piloting = n_workers == "auto" or chunk_size == "auto"
+    choose_engine = choose_engine and piloting and _n_cores("threads") > 1
+
+    if piloting:
+        if n_workers == 1 or (n_cores == 1 and not choose_engine):
+            return [], split_bounds(length, 1), 1, engine
+        # measure in the parent how long func takes, and decide accordingly
+        results, start, compute, serialize = run_pilot(
+            apply,
+            df_or_series,
+            axis,
+            measure_serialization=not threads,
+        )
+        workers: float = n_cores
+        if choose_engine:
+            threaded, start, engine, workers = _choose_engine(
+                apply,
+                df_or_series,
+                axis,
+                start,
+                compute=compute,
+                serialize=serialize,
+            )
+            results += threaded
+            n_cores = _n_cores(engine)
+            threads = engine == "threads"
+        if n_workers == "auto":
+            remaining = length - start
+            fast = pays_off(remaining, workers, compute, serialize, engine=engine)
+            n_workers = n_cores if fast else 1
+        if n_workers == 1:
+            return results, [(start, length)] if start < length else [], 1, engine
+        n_workers = int(n_workers)
+        if chunk_size == "auto":
+            bounds = adaptive_bounds(
+                start,
+                length,
+                n_workers if n_workers >= 1 else n_cores,
+                compute + serialize,
+                THREAD_TARGET_CHUNK_SECONDS if threads else TARGET_CHUNK_SECONDS,
+            )
+            return (
+                results,
+                bounds,
+                _fit_memory(
+                    n_workers,
+                    df_or_series,
+                    axis,
+                    bounds,
+                    engine=engine,
+                    max_memory=max_memory,
+                ),
+                engine,
+            )
+    else:
+        results, start = [], 0
+        n_workers = int(n_workers)
+
+    n_chunks = _choose_n_chunks(
+        (length - start,),
+        0,
+        n_workers,
+        int(chunk_size),
+        max_chunks_per_worker,
+        engine=engine,
+    )
+    bounds = [(start + i, start + j) for i, j in split_bounds(length - start, n_chunks)]
+    return (
+        results,
+        bounds,
+        _fit_memory(
+            n_workers,
+            df_or_series,
+            axis,
+            bounds,
+            engine=engine,
+            max_memory=max_memory,
+        ),
+        engine,
+    )
+
+
+def _piloted(
+    apply: Callable,
+    initializer: Callable | None,
+    initargs: tuple[Any, ...],
+) -> Callable:
+    """Wrap apply to run initializer first, as pilot chunks are applied in the parent."""
+    if initializer is None:
+        return apply
+    return partial(call_initialized, initializer, initargs, apply)
+
+
+def _imap_chunks(
+    apply: Callable,
+    df_or_series: Any,
+    axis: int,
+    bounds: list[tuple[int, int]],
+    *,
+    transport: str,
+    **kwargs: Any,
+) -> Iterator[tuple[int, Any]]:
+    """Send chunks to the workers using given transport, yielding (ordinal, result) pairs."""
+    if (
+        transport == "shared_memory"
+        and kwargs.get("engine") != "threads"
+        and len(bounds) > 1
+        and parallel.remote_pool() is None
+        and is_shareable(df_or_series)
+    ):
+        return shared_imap(apply, df_or_series, axis, bounds, **kwargs)
+
+    if (
+        transport == "fork"
+        and len(bounds) > 1
+        and can_inherit(kwargs.get("engine", "processes"))
+    ):
+        return inherited_imap(apply, df_or_series, axis, bounds, **kwargs)
+
+    def _slices() -> Iterator[Any]:
+        # sliced as the workers pull them, such that at most the chunks in flight exist
+        for start, stop in bounds:
+            with Timer(kwargs.get("stats"), "split_seconds"):
+                chunk = slice_chunk(df_or_series, axis, start, stop)
+            yield chunk
+
+    # generator with length defined (for progressbar)
+    dfs = tqdm(_slices(), disable=True, total=len(bounds))
+    return enumerated_imap(apply, dfs, **kwargs)
+
+
+def _halves(start: int, stop: int) -> list[tuple[int, int]]:
+    """Split range(start, stop) in two (start, stop) pairs, if it has multiple positions."""
+    if stop - start < 2:  # noqa: PLR2004
+        return [(start, stop)]
+    middle = (start + stop) // 2
+    return [(start, middle), (middle, stop)]
+
+
+def _assemble_pieces(
+    df_or_series: Any,
+    axis: int,
+    bounds: tuple[int, int],
+    pieces: list[tuple[tuple[int, int], Any]],
+) -> Any:
+    """Assemble the results of the pieces a chunk was split into, as if it wasn't."""
+    from pandas import Series
+
+    start, stop = bounds
+    assembler = Assembler(
+        slice_chunk(df_or_series, axis, start, stop),
+        axis,
+        isseries=isinstance(df_or_series, Series),
+    )
+    assembler.extend(((a - start, b - start), result) for (a, b), result in pieces)
+    return assembler.result()
+
+
+def _retried_imap_chunks(  # noqa: PLR0913
+    apply: Callable,
+    df_or_series: Any,
+    axis: int,
+    bounds: list[tuple[int, int]],
+    *,
+    retries: int,
+    split_failed: bool,
+    **kwargs: Any,
+) -> Iterator[tuple[int, Any]]:
+    """Like :meth:`_imap_chunks`, retrying the chunks that failed (or whose worker died).
+
+    All chunks of a round complete before the failed ones are retried, after
+    ``MAPPLY_RETRY_BACKOFF_SECONDS``, doubling every round. With split_failed, failed
+    chunks are first cut in halves, narrowing down rows that keep failing. Pieces of a
+    chunk are assembled again before the chunk is yielded. After the last round, the
+    first error is raised with a note on the positions that failed.
+    """
+    # (ordinal of the chunk, bounds of the piece) to send
+    todo = list(enumerate(bounds))
+    # results of the pieces of split chunks, by ordinal of the chunk
+    pieces: dict[int, list[tuple[tuple[int, int], Any]]] = {}
+    for attempt in range(retries + 1):
+        failed = []
+        for j, result in _imap_chunks(
+            apply,
+            df_or_series,
+            axis,
+            [piece for _, piece in todo],
+            return_exceptions=True,
+            **kwargs,
+        ):
+            i, piece = todo[j]
+            if isinstance(result, Exception):
+                failed.append((i, piece, result))
+            elif piece == bounds[i]:
+                yield i, result
+            else:
+                pieces.setdefault(i, []).append((piece, result))
+                start, stop = bounds[i]
+                if sum(b - a for (a, b), _ in pieces[i]) == stop - start:
+                    yield (
+                        i,
+                        _assemble_pieces(df_or_series, axis, bounds[i], pieces.pop(i)),
+                    )
+        if not failed or attempt == retries:
+            break
+        delay = RETRY_BACKOFF_SECONDS * 2**attempt
+        logger.warning(
+            "Retrying %d failed chunks in %.1fs (retry %d of %d), first error: %r",
+            len(failed),
+            delay,
+            attempt + 1,
+            retries,
+            failed[0][2],
+        )
+        time.sleep(delay)
+        todo = [
+            (i, half)
+            for i, piece, _ in failed
+            for half in (_halves(*piece) if split_failed else [piece])
+        ]
+
+    if failed:
+        _, (start, stop), error = failed[0]
+        error.add_note(
+            f"Failed for positions {start}:{stop} along axis {axis} after "
+            f"{retries + 1} attempts, {len(failed)} chunks failed in total",
+        )
+        raise error
+
+
+def _cached_imap_chunks(  # noqa: PLR0913
+    cache: ChunkCache,
+    apply: Callable,
+    df_or_series: Any,
+    axis: int,
+    *,
+    n_workers: int,
+    chunk_size: int | str,
+    max_chunks_per_worker: int,
+    engine: str,
+    retries: int,
+    split_failed: bool,
+    **kwargs: Any,
+) -> list[tuple[tuple[int, int], Any]]:
+    """Look up chunks in cache by content, and only send the missing ones to the workers.
+
+    Chunk boundaries are content-defined (see :mod:`mapply.cache`) instead of piloted,
+    so that they are stable across calls. Returns the bounds and result of each chunk.
+
+    Results are stored as they arrive, and the other chunks are completed before an
+    error is raised, so that a failed call can be resumed by calling it again.
+    """
+    length = df_or_series.shape[axis]
+    if chunk_size == "auto":
+        chunk_size = DEFAULT_CHUNK_SIZE
+    n_chunks = max(1, length // int(chunk_size))
+    if max_chunks_per_worker:
+        workers = n_workers if n_workers >= 1 else _n_cores(engine)
+        n_chunks = min(n_chunks, max_chunks_per_worker * workers)
+
+    with Timer(kwargs.get("stats"), "split_seconds"):
+        hashes = element_hashes(df_or_series, axis)
+        bounds = content_defined_bounds(hashes, n_chunks) or [(0, length)]
+        keys = chunk_keys(
+            fingerprint(apply),
+            meta_fingerprint(df_or_series, axis),
+            (hashes[start:stop].tobytes() for start, stop in bounds),
+        )
+
+    def compute(missing: list[int]) -> Iterator[tuple[int, Any]]:
+        for i, result in _retried_imap_chunks(
+            apply,
+            df_or_series,
+            axis,
+            [bounds[i] for i in missing],
+            retries=retries,
+            split_failed=split_failed,
+            n_workers=n_workers,
+            engine=engine,
+            **kwargs,
+        ):
+            yield missing[i], result
+
+    return list(zip(bounds, cached_results(cache, keys, compute), strict=True))
+
+
+def _run_batch(
+    func: Callable,
+    df_or_series: Any,
+    axis: int,
+    *,
+    raw: bool = False,
+    args: tuple[Any, ...] = (),
+    **kwargs: Any,
+) -> Any:
+    """Call func on a whole chunk, wrapping ndarray results in the chunk's labels."""
+    from numpy import asarray
+    from pandas import DataFrame, Series
+
+    result = func(df_or_series.to_numpy() if raw else df_or_series, *args, **kwargs)
+    if isinstance(result, (Series, DataFrame)):
+        return result
+
+    result = asarray(result)
+    labels = df_or_series.axes[axis]
+    if result.shape == df_or_series.shape:
+        if isinstance(df_or_series, Series):
+            return Series(result, index=labels, name=df_or_series.name)
+        return DataFrame(result, index=df_or_series.index, columns=df_or_series.columns)
+    if result.shape == (len(labels),):
+        return Series(result, index=labels)
+
+    msg = f"Batch func returned an array of shape {result.shape} for a chunk of shape {df_or_series.shape}"
+    raise ValueError(msg)
+
+
+def _run_apply(
+    func: Callable,
+    df_or_series: Any,
+    *,
+    axis: int,
+    batch: bool,
+    args: tuple[Any, ...] = (),
+    **kwargs: Any,
+) -> Any:
+    """Apply func to a chunk along axis, or to the whole chunk in batch mode."""
+    from pandas import Series
+
+    isseries = isinstance(df_or_series, Series)
+    if batch:
+        return _run_batch(
+            func,
+            df_or_series,
+            1 - (isseries or axis),
+            args=args,
+            **kwargs,
+        )
+    if not isseries:
+        kwargs["axis"] = axis
+    return df_or_series.apply(func, args=args, **kwargs)
+
+
 def mapply(  # noqa: PLR0913
     df_or_series: Any,
     func: Callable,
     axis: int | str = 0,
     *,
-    n_workers: int = -1,
-    chunk_size: int = DEFAULT_CHUNK_SIZE,
+    n_workers: int | str = -1,
+    chunk_size: int | str = DEFAULT_CHUNK_SIZE,
     max_chunks_per_worker: int = DEFAULT_MAX_CHUNKS_PER_WORKER,
     progressbar: bool = True,
+    engine: str = "auto",
+    transport: str = "pickle",
+    batch: bool = False,
+    ordered: bool = True,
+    group_cost: Callable | None = None,
+    stats: MapplyStats | None = None,
+    cache: str | PathLike | ChunkCache | None = None,
+    initializer: Callable | None = None,
+    initargs: tuple[Any, ...] = (),
+    max_memory: float | None = None,
+    retries: int = 0,
+    split_failed: bool = False,
     args: tuple[Any, ...] = (),
     **kwargs: Any,
 ) -> Any:
@@ -99,34 +651,137 @@ def mapply(  # noqa: PLR0913
         df_or_series: Argument reserved to the class instance, a.k.a. 'self'.
         func: func to apply to each column or row.
         axis: Axis along which func is applied.
-        n_workers: Maximum amount of workers (processes) to spawn. Might be lowered
-            depending on chunk_size and max_chunks_per_worker. Will throw a warning if
-            set higher than is sensible (see :meth:`mapply.parallel.sensible_cpu_count`).
+        n_workers: Maximum amount of workers (processes or threads) to spawn. Might be
+            lowered depending on chunk_size and max_chunks_per_worker. Will throw a
+            warning if set higher than is sensible (see
+            :meth:`mapply.parallel.sensible_cpu_count`, or the amount of logical CPUs
+            for threads). Set to "auto" to measure the cost of func and of serializing its inputs and
+            outputs on a few small pilot chunks, and only go multi-core if that is
+            projected to be sufficiently faster than running serially (see
+            :mod:`mapply._chunking`). Groupby objects use all sensible workers.
         chunk_size: Minimum amount of columns/rows per chunk. Higher value means a higher
             threshold to go multi-core. Set to 1 to let max_chunks_per_worker decide.
+            Set to "auto" to measure the cost of func on a few small pilot chunks,
+            and size the remaining chunks to take about 200ms each, shrinking towards
+            the tail (see :mod:`mapply._chunking`). This ignores max_chunks_per_worker.
         max_chunks_per_worker: Upper limit on amount of chunks per worker. Will lower
             n_chunks determined by chunk_size if necessary. Set to 0 to skip this check.
+            For (window) GroupBy objects, groups are batched into about this many
+            chunks per worker (0 for one group per chunk).
         progressbar: Whether to wrap the chunks in a :meth:`tqdm.auto.tqdm`.
-        args: Additional positional arguments to pass to func.
-        **kwargs: Additional keyword arguments to pass to apply/func.
+        engine: Either "processes", or "threads" to apply func in a thread pool sized
+            to the logical CPUs. Threads work on views of the input, so nothing is
+            pickled and transport is ignored. Only speeds up functions that release the
+            GIL (most NumPy and regex operations, I/O), or on free-threaded Python
+            builds. Adaptive chunks target about 50ms each, as dispatching a chunk to
+            a thread is cheap. Defaults to "auto": processes, unless piloting
+            (n_workers="auto" or chunk_size="auto") measures func to run concurrently
+            in threads, and threads are projected to be faster (see
+            :mod:`mapply._chunking`). Pandas engines ("cython", "numba", "python") are passed
+            on to pandas' apply, running it in processes. For rolling/expanding
+            GroupBy objects with raw=True and engine="numba", each worker compiles func
+            once and runs the compiled kernel over all groups of a chunk at once.
+        transport: How chunks are sent to the workers. Either "pickle", or
+            "shared_memory" to write numeric data to a memory-mapped file once, from
+            which workers read their chunks without copying (see
+            :mod:`mapply._shared_memory`). Falls back to "pickle" for data with
+            non-numeric dtypes, or while a :class:`mapply.cluster.Cluster` is active.
+            Or "fork" to have workers slice their chunks from a
+            copy-on-write copy of the input inherited when forking, such that tasks
+            only carry positions (see :mod:`mapply._fork`). Requires the fork start
+            method and a fresh pool, falling back to "pickle" while a persistent pool
+            is active.
+        batch: Whether to call func once per chunk instead of once per column/row. For
+            axis=0, func receives a DataFrame with a subset of the columns. For
+            axis=1 (or a Series), func receives a subset of the rows. Pass raw=True
+            to receive a NumPy array instead. Func should return a result for every
+            column/row of the chunk: a Series/DataFrame, or an array with the shape
+            of the chunk or with one value per column/row.
+        ordered: Whether to process chunks in order. If False, chunks are collected
+            as soon as they complete, and put back in place before concatenating.
+            Avoids a slow chunk holding back the consumption of finished chunks.
+        group_cost: For (window) GroupBy objects, a function mapping an array of group
+            sizes to an array of relative costs, e.g. ``lambda n: n ** 2`` for a func
+            that is quadratic in the group size. Defaults to the group sizes. Expensive
+            groups are sent first, each on their own, and cheap groups are batched
+            into chunks of similar total cost.
+        stats: A :class:`mapply.stats.MapplyStats` instance to populate with pool
+            startup, splitting, per-chunk and concatenation timings and payload sizes.
+        cache: A directory (or :class:`mapply.cache.ChunkCache`) to store chunk
+            results in. Chunks are keyed by a hash of their content, func, args and
+            kwargs, so repeated calls only recompute chunks that changed. Chunk
+            boundaries then depend on the content instead of on chunk_size="auto" or
+            n_workers="auto" piloting. Results must be picklable. Doubles as a
+            checkpoint: if a chunk fails, the other chunks are still completed and
+            stored before raising, so calling again resumes with the failed chunks.
+        initializer: Function to run once in every worker before it processes chunks,
+            e.g. to load a model into :meth:`mapply.parallel.worker_state` for func to
+            look up, see :meth:`mapply.parallel.multiprocessing_imap`. Also runs in
+            the calling process when it applies func itself (piloting, or a single
+            chunk).
+        initargs: Positional arguments to pass to initializer.
+        max_memory: Memory budget in bytes, or as a fraction (up to 1.0) of the
+            available memory (see :meth:`mapply._resources.memory_budget`). Chunks are
+            sliced only when a worker is ready for them, and held back while the
+            estimated footprint of the chunks in flight (three times their deep memory
+            usage) would exceed the budget. Workers whose resident memory grows beyond
+            their share of the budget are recycled, see
+            :meth:`mapply.parallel.multiprocessing_imap`.
+        retries: Amount of times to retry chunks that raised, or that were lost along
+            with their worker (e.g. killed by the OOM killer). Failed chunks are
+            retried once all other chunks completed, waiting
+            ``MAPPLY_RETRY_BACKOFF_SECONDS`` (doubling every retry). Not applicable to
+            (window) GroupBy objects.
+        split_failed: Whether to cut failed chunks in halves before retrying them,
+            isolating the rows that keep failing. The error raised after the last
+            retry notes the positions of the smallest piece that failed.
+        args: Additional positional arguments to pass to func. Wrap large read-only
+            arguments in :meth:`mapply.broadcast` to send them to each worker once,
+            instead of with every chunk.
+        **kwargs: Additional keyword arguments to pass to apply/func, which can be
+            broadcast too.
 
     Returns:
         Series or DataFrame resulting from applying func along given axis.
 
     Raises:
-        ValueError: if a Series is passed in combination with axis=1
+        ValueError: if a Series is passed in combination with axis=1, or if engine or
+            transport is unknown, or if a batch func returns an array of unexpected
+            shape.
     """
-    from numpy import arange, array_split
-    from pandas import Series, concat
+    from pandas import Series
     from pandas.core.groupby import GroupBy
     from pandas.core.window.rolling import BaseWindowGroupby
 
+    if engine in PANDAS_ENGINES:
+        kwargs["engine"] = engine
+        engine = "processes"
+    choose_engine = engine == "auto"
+    if choose_engine:
+        # unless piloting picks threads, see _choose_bounds
+        engine = "processes"
+    check_engine(engine)
+    func = resolving(func, args, kwargs)
+
+    cache = as_cache(cache)
+    # groups are not piloted
+    group_n_workers = -1 if n_workers == "auto" else int(n_workers)
+
     if isinstance(df_or_series, BaseWindowGroupby):
         return run_window_groupby_apply(
             df_or_series,
             func,
-            n_workers=n_workers,
+            n_workers=group_n_workers,
             progressbar=progressbar,
+            max_chunks_per_worker=max_chunks_per_worker,
+            group_cost=group_cost,
+            stats=stats,
+            cache=cache,
+            pool_engine=engine,
+            transport=transport,
+            initializer=initializer,
+            initargs=initargs,
+            max_memory=max_memory,
             args=args,
             **kwargs,
         )
@@ -135,8 +790,16 @@ def mapply(  # noqa: PLR0913
         return run_groupwise_apply(
             df_or_series,
             func,
-            n_workers=n_workers,
+            n_workers=group_n_workers,
             progressbar=progressbar,
+            max_chunks_per_worker=max_chunks_per_worker,
+            group_cost=group_cost,
+            stats=stats,
+            cache=cache,
+            pool_engine=engine,
+            initializer=initializer,
+            initargs=initargs,
+            max_memory=max_memory,
             args=args,
             **kwargs,
         )
@@ -144,6 +807,10 @@ def mapply(  # noqa: PLR0913
     if isinstance(axis, str):
         axis = ["index", "columns"].index(axis)
 
+    if transport not in TRANSPORTS:
+        msg = f"Unknown transport '{transport}', expected one of {TRANSPORTS}"
+        raise ValueError(msg)
+
     isseries = int(isinstance(df_or_series, Series))
 
     if isseries and axis == 1:
@@ -152,38 +819,303 @@ def mapply(  # noqa: PLR0913
 
     opposite_axis = 1 - (isseries or axis)
 
-    n_chunks = _choose_n_chunks(
-        df_or_series.shape,
+    apply = partial(_run_apply, func, axis=axis, batch=batch, args=args, **kwargs)
+
+    assembler = Assembler(df_or_series, opposite_axis, isseries=bool(isseries))
+    if cache is not None:
+        assembler.extend(
+            _cached_imap_chunks(
+                cache,
+                apply,
+                df_or_series,
+                opposite_axis,
+                n_workers=group_n_workers,
+                chunk_size=chunk_size,
+                max_chunks_per_worker=max_chunks_per_worker,
+                engine=engine,
+                transport=transport,
+                progressbar=progressbar,
+                ordered=ordered,
+                stats=stats,
+                initializer=initializer,
+                initargs=initargs,
+                max_memory=max_memory,
+                retries=retries,
+                split_failed=split_failed,
+            ),
+        )
+        with Timer(stats, "concat_seconds"):
+            return assembler.result()
+
+    with Timer(stats, "pilot_seconds"):
+        pilot, bounds, n_workers, engine = _choose_bounds(
+            _piloted(apply, initializer, initargs),
+            df_or_series,
+            opposite_axis,
+            n_workers=n_workers,
+            chunk_size=chunk_size,
+            max_chunks_per_worker=max_chunks_per_worker,
+            engine=engine,
+            choose_engine=choose_engine,
+            max_memory=max_memory,
+        )
+
+    assembler.extend(pilot)
+    imap_chunks = _imap_chunks
+    if retries:
+        imap_chunks = partial(
+            _retried_imap_chunks,
+            retries=retries,
+            split_failed=split_failed,
+        )
+    # written in place as they arrive, so each result can be freed right away
+    processed = imap_chunks(
+        apply,
+        df_or_series,
         opposite_axis,
-        n_workers,
-        chunk_size,
-        max_chunks_per_worker,
+        bounds,
+        transport=transport,
+        n_workers=n_workers,
+        progressbar=progressbar,
+        ordered=ordered,
+        stats=stats,
+        engine=engine,
+        initializer=initializer,
+        initargs=initargs,
+        max_memory=max_memory,
     )
+    assembler.extend((bounds[i], result) for i, result in processed)
 
-    indices = array_split(arange(df_or_series.shape[opposite_axis]), n_chunks)
-    dfs = [df_or_series.take(idx, axis=opposite_axis) for idx in indices]
+    with Timer(stats, "concat_seconds"):
+        return assembler.result()
 
-    def run_apply(
-        func: Callable,
-        df_or_series: Any,
-        args: tuple[Any, ...] = (),
-        **kwargs: Any,
-    ) -> Any:
-        return df_or_series.apply(func, args=args, **kwargs)
 
-    if not isseries:
-        kwargs["axis"] = axis
+async def amapply(  # noqa: PLR0913
+    df_or_series: Any,
+    func: Callable,
+    axis: int | str = 0,
+    *,
+    n_workers: int | str = -1,
+    chunk_size: int | str = DEFAULT_CHUNK_SIZE,
+    max_chunks_per_worker: int = DEFAULT_MAX_CHUNKS_PER_WORKER,
+    progressbar: bool = False,
+    engine: str = "processes",
+    batch: bool = False,
+    ordered: bool = True,
+    stats: MapplyStats | None = None,
+    initializer: Callable | None = None,
+    initargs: tuple[Any, ...] = (),
+    args: tuple[Any, ...] = (),
+    **kwargs: Any,
+) -> Any:
+    """Awaitable version of :meth:`mapply`, for use in asyncio code.
 
-    results = list(
-        multiprocessing_imap(
-            partial(run_apply, func, args=args, **kwargs),
-            dfs,
-            n_workers=n_workers,
-            progressbar=progressbar,
-        ),
-    )
+    Chunks are sent to the workers and awaited without blocking the event loop, see
+    :meth:`mapply.parallel.async_imap`. Concurrent calls share an active persistent
+    :class:`mapply.Pool` fairly, and cancelling the awaiting task cancels the
+    outstanding chunks.
+
+    Example usage:
+    ::
+
+        import asyncio
+        import pandas as pd
+        import mapply
+
+        async def features(df):
+            return await mapply.amapply(df, lambda row: row.A + row.B, axis=1)
+
+        with mapply.Pool(n_workers=-1):
+            results = await asyncio.gather(*(features(df) for df in dfs))
+
+    (Window) GroupBy objects are processed by :meth:`mapply` in a separate thread,
+    which doesn't block the event loop, but can't be cancelled.
 
-    if isseries or len(results) == 1 or sum(map(len, results)) in df_or_series.shape:
-        return concat(results)
+    Args:
+        df_or_series: Series or DataFrame (or (window) GroupBy) to apply func to.
+        func: func to apply to each column or row.
+        axis: Axis along which func is applied.
+        n_workers: Maximum amount of workers (processes or threads) to spawn, see
+            :meth:`mapply`. Piloting with "auto" runs in a separate thread.
+        chunk_size: Minimum amount of columns/rows per chunk, see :meth:`mapply`.
+        max_chunks_per_worker: Upper limit on amount of chunks per worker, see
+            :meth:`mapply`.
+        progressbar: Whether to wrap the chunks in a :meth:`tqdm.auto.tqdm`.
+        engine: Either "processes" or "threads", or a pandas engine, see
+            :meth:`mapply`.
+        batch: Whether to call func once per chunk, see :meth:`mapply`.
+        ordered: Whether to process chunks in order, see :meth:`mapply`.
+        stats: A :class:`mapply.stats.MapplyStats` instance to populate.
+        initializer: Function to run once in every worker, see :meth:`mapply`.
+        initargs: Positional arguments to pass to initializer.
+        args: Additional positional arguments to pass to func.
+        **kwargs: Additional keyword arguments to pass to apply/func.
+
+    Returns:
+        Series or DataFrame resulting from applying func along given axis.
+
+    Raises:
+        ValueError: if a Series is passed in combination with axis=1, or if engine is
+            unknown.
+    """
+    import asyncio
+
+    from pandas import Series
+    from pandas.core.groupby import GroupBy
+    from pandas.core.window.rolling import BaseWindowGroupby
+
+    if isinstance(df_or_series, (GroupBy, BaseWindowGroupby)):
+        return await asyncio.to_thread(
+            partial(
+                mapply,
+                df_or_series,
+                func,
+                axis,
+                n_workers=n_workers,
+                max_chunks_per_worker=max_chunks_per_worker,
+                progressbar=progressbar,
+                engine=engine,
+                stats=stats,
+                initializer=initializer,
+                initargs=initargs,
+                args=args,
+                **kwargs,
+            ),
+        )
+
+    if engine in PANDAS_ENGINES:
+        kwargs["engine"] = engine
+        engine = "processes"
+    check_engine(engine)
+    func = resolving(func, args, kwargs)
+
+    if isinstance(axis, str):
+        axis = ["index", "columns"].index(axis)
+
+    isseries = int(isinstance(df_or_series, Series))
+
+    if isseries and axis == 1:
+        msg = "Passing axis=1 is not allowed for Series"
+        raise ValueError(msg)
+
+    opposite_axis = 1 - (isseries or axis)
+
+    apply = partial(_run_apply, func, axis=axis, batch=batch, args=args, **kwargs)
 
-    return concat(results, axis=1)
+    with Timer(stats, "pilot_seconds"):
+        # piloting runs func in the parent
+        pilot, bounds, n_workers, _ = await asyncio.to_thread(
+            partial(
+                _choose_bounds,
+                _piloted(apply, initializer, initargs),
+                df_or_series,
+                opposite_axis,
+                n_workers=n_workers,
+                chunk_size=chunk_size,
+                max_chunks_per_worker=max_chunks_per_worker,
+                engine=engine,
+            ),
+        )
+
+    def _slices() -> Iterator[tuple[int, Any]]:
+        # sliced as the workers pull them, such that at most the chunks in flight exist
+        for i, (start, stop) in enumerate(bounds):
+            with Timer(stats, "split_seconds"):
+                chunk = slice_chunk(df_or_series, opposite_axis, start, stop)
+            yield i, chunk
+
+    assembler = Assembler(df_or_series, opposite_axis, isseries=bool(isseries))
+    assembler.extend(pilot)
+    async for i, result in async_imap(
+        partial(_call_enumerated, apply),
+        # generator with length defined (for progressbar)
+        tqdm(_slices(), disable=True, total=len(bounds)),
+        n_workers=n_workers,
+        progressbar=progressbar,
+        ordered=ordered,
+        stats=stats,
+        engine=engine,
+        initializer=initializer,
+        initargs=initargs,
+    ):
+        assembler.add(bounds[i], result)
+
+    with Timer(stats, "concat_seconds"):
+        return assembler.result()
+
+
+def stream(  # noqa: PLR0913
+    reader: Iterable[Any],
+    func: Callable,
+    axis: int | str = 0,
+    *,
+    n_workers: int = -1,
+    progressbar: bool = True,
+    engine: str = "processes",
+    batch: bool = False,
+    ordered: bool = True,
+    max_in_flight: int | None = None,
+    initializer: Callable | None = None,
+    initargs: tuple[Any, ...] = (),
+    max_memory: float | None = None,
+    args: tuple[Any, ...] = (),
+    **kwargs: Any,
+) -> Iterator[Any]:
+    """Run apply on each Series/DataFrame yielded by reader on n_workers, lazily.
+
+    Meant for data that doesn't fit in memory: reader is only consumed as fast as the
+    workers can keep up, so at most max_in_flight chunks are held in memory.
+
+    Example usage:
+    ::
+
+        import pandas as pd
+        from mapply.mapply import stream
+
+        reader = pd.read_csv("large.csv", chunksize=100_000)
+        for result in stream(reader, lambda row: row.A + row.B, axis=1):
+            result.to_csv("result.csv", mode="a", header=False)
+
+    Args:
+        reader: Iterable of Series/DataFrames, e.g. from pandas.read_csv with chunksize,
+            pyarrow.parquet.ParquetFile.iter_batches (converted to pandas), or a
+            generator.
+        func: func to apply to each column or row of each chunk.
+        axis: Axis along which func is applied.
+        n_workers: Maximum amount of workers (processes or threads) to spawn.
+        progressbar: Whether to display a :meth:`tqdm.auto.tqdm` of processed chunks.
+        engine: Either "processes" or "threads", see :meth:`mapply`.
+        batch: Whether to call func once per chunk, see :meth:`mapply`.
+        ordered: Whether to yield results in the order of reader. If False, results
+            are yielded as soon as they complete.
+        max_in_flight: Maximum amount of chunks being processed or waiting to be
+            yielded. Defaults to twice the amount of workers.
+        initializer: Function to run once in every worker, see :meth:`mapply`.
+        initargs: Positional arguments to pass to initializer.
+        max_memory: Memory budget, see :meth:`mapply`. Reader is only consumed while
+            the chunks in flight fit.
+        args: Additional positional arguments to pass to func.
+        **kwargs: Additional keyword arguments to pass to apply/func.
+
+    Yields:
+        Result of applying func to each chunk along given axis.
+    """
+    func = resolving(func, args, kwargs)
+    if isinstance(axis, str):
+        axis = ["index", "columns"].index(axis)
+
+    if max_in_flight is None:
+        max_in_flight = 2 * (n_workers if n_workers >= 1 else _n_cores(engine))
+
+    yield from multiprocessing_imap(
+        partial(_run_apply, func, axis=axis, batch=batch, args=args, **kwargs),
+        reader,
+        n_workers=n_workers,
+        progressbar=progressbar,
+        ordered=ordered,
+        max_in_flight=max_in_flight,
+        engine=engine,
+        initializer=initializer,
+        initargs=initargs,
+        max_memory=max_memory,
+    )
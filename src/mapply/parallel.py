@@ -49,45 +49,215 @@ Standalone usage:
             n_workers=-1,
         )
     )
+
+Keeping workers alive across calls:
+::
+
+    from mapply.parallel import Pool, multiprocessing_imap
+
+    with Pool(n_workers=-1):
+        for power in range(10):
+            list(multiprocessing_imap(pow, range(100), power, progressbar=False))
+
+Loading expensive state once per worker:
+::
+
+    from mapply.parallel import multiprocessing_imap, worker_state
+
+    def load_table(path):
+        worker_state()["table"] = load(path)
+
+    def lookup(key):
+        return worker_state()["table"][key]
+
+    list(multiprocessing_imap(lookup, keys, initializer=load_table, initargs=(path,)))
+
+Awaiting results from asyncio, sharing one warm pool between concurrent calls:
+::
+
+    from mapply.parallel import Pool, async_imap
+
+    async def handler(power):
+        return [x async for x in async_imap(pow, range(100), power)]
+
+    with Pool(n_workers=-1):
+        results = await asyncio.gather(*(handler(power) for power in range(10)))
+
+Other executors (see :class:`Executor`) plug in as a persistent :class:`Pool`, like the
+workers on other machines of :class:`mapply.cluster.Cluster`.
 """
 
+import gc
 import logging
 import os
-from collections.abc import Callable, Iterable, Iterator
-from functools import partial
-from typing import Any
+import sys
+import threading
+from collections import deque
+from collections.abc import AsyncIterator, Callable, Iterable, Iterator
+from functools import cache, partial
+from time import time
+from typing import TYPE_CHECKING, Any, Protocol, Self
+from weakref import WeakKeyDictionary
 
-import multiprocess
-import psutil
-from pathos.pools import ProcessPool
-from tqdm.auto import tqdm as _tqdm
+from mapply._broadcast import resolving
+from mapply._resources import WORKER_MEMORY_FACTOR, cpu_budget
+from mapply.stats import ChunkStats, MapplyStats, Timer, measured_call
+
+if TYPE_CHECKING:
+    import asyncio
 
 logger = logging.getLogger(__name__)
 
-tqdm = partial(_tqdm, dynamic_ncols=True, smoothing=0.042, mininterval=0.42)
 
+def tqdm(*args: Any, **kwargs: Any) -> Any:
+    """Instantiate :class:`tqdm.auto.tqdm` (imported on first use) with mapply's defaults."""
+    from tqdm.auto import tqdm as _tqdm
+
+    kwargs = {"dynamic_ncols": True, "smoothing": 0.042, "mininterval": 0.42, **kwargs}
+    return _tqdm(*args, **kwargs)
 
+
+@cache
 def sensible_cpu_count() -> int:
-    """Count amount of physical CPUs (+1 on hyperthreading systems to prioritize the workers over e.g. system processes)."""
-    return min(psutil.cpu_count(logical=False) + 1, psutil.cpu_count(logical=True))
+    """Count amount of physical CPUs (+1 on hyperthreading systems to prioritize the workers over e.g. system processes).
+
+    Capped by the CPU affinity and cgroup CPU quota of this process (e.g. in a
+    container), see :mod:`mapply._resources`. Override with the ``MAPPLY_N_CORES``
+    environment variable.
+
+    Returns:
+        Amount of CPU-bound workers to use.
+    """
+    override = _cpu_override()
+    if override is not None:
+        return override
+    import psutil
+
+    return min(
+        psutil.cpu_count(logical=False) + 1,
+        psutil.cpu_count(logical=True),
+        cpu_budget(),
+    )
+
+
+@cache
+def logical_cpu_count() -> int:
+    """Count amount of logical CPUs, capped by the CPU affinity and cgroup CPU quota.
+
+    Overridden by the ``MAPPLY_N_CORES`` environment variable, like
+    :meth:`sensible_cpu_count`.
+    """
+    override = _cpu_override()
+    if override is not None:
+        return override
+    import psutil
+
+    return min(psutil.cpu_count(logical=True), cpu_budget())
+
+
+def _cpu_override() -> int | None:
+    """Amount of CPUs set by the ``MAPPLY_N_CORES`` environment variable, if any."""
+    override = os.environ.get("MAPPLY_N_CORES")
+    return max(1, int(override)) if override else None
+
+
+def _default_context() -> Any:
+    import multiprocess
+
+    # default start method depends on platform ref https://github.com/uqfoundation/multiprocess/blob/0.70.18/py3.13/multiprocess/context.py#L260-L268
+    return multiprocess.get_context(os.environ.get("MAPPLY_START_METHOD"))  # ty: ignore[unresolved-attribute]  # multiprocess is an unstubbed multiprocessing fork
+
 
+def _process_pool_class() -> type:
+    from pathos.pools import ProcessPool
 
-N_CORES = sensible_cpu_count()
+    return ProcessPool
+
+
+# module attributes computed on first access, see __getattr__
+_LAZY_ATTRIBUTES: dict[str, Callable[[], Any]] = {
+    "N_CORES": sensible_cpu_count,
+    # threads releasing the GIL can make use of all logical CPUs
+    "N_THREADS": logical_cpu_count,
+    "CONTEXT": _default_context,
+    "POOL_CLASS": _process_pool_class,
+}
+ENGINES = ("processes", "threads")
 MAX_TASKS_PER_CHILD = int(os.environ.get("MAPPLY_MAX_TASKS_PER_CHILD", "4"))
-# default start method depends on platform ref https://github.com/uqfoundation/multiprocess/blob/0.70.18/py3.13/multiprocess/context.py#L260-L268
-CONTEXT = multiprocess.get_context(os.environ.get("MAPPLY_START_METHOD"))  # ty: ignore[unresolved-attribute]  # multiprocess is an unstubbed multiprocessing fork
-POOL_CLASS = ProcessPool
+# recycle workers whose resident memory grew by more than this many bytes (0 to disable)
+MAX_WORKER_RSS = int(os.environ.get("MAPPLY_MAX_WORKER_RSS", "0")) or None
+# active persistent pool per engine
+_PERSISTENT_POOLS: dict[str, "Pool"] = {}
+POLL_INTERVAL = 0.01
+_EXHAUSTED = object()
+# state of the current worker (process, or thread for the threads engine)
+_WORKER = threading.local()
+
+
+def __getattr__(name: str) -> Any:
+    """Compute N_CORES, N_THREADS, CONTEXT and POOL_CLASS on first access (PEP 562).
+
+    This defers importing psutil, multiprocess and pathos until mapply goes parallel.
+    The computed value is stored as a regular module attribute, so it can be
+    overridden like one, e.g. ``mapply.parallel.POOL_CLASS = pathos.pools.ThreadPool``.
+
+    Args:
+        name: Name of the attribute.
+
+    Returns:
+        The computed value.
+
+    Raises:
+        AttributeError: If name is not a module attribute.
+    """
+    if name not in _LAZY_ATTRIBUTES:
+        msg = f"module {__name__!r} has no attribute {name!r}"
+        raise AttributeError(msg)
+    value = globals()[name] = _LAZY_ATTRIBUTES[name]()
+    return value
+
+
+def _this() -> Any:
+    """This module, to look up (possibly overridden) attributes through __getattr__."""
+    return sys.modules[__name__]
+
+
+def remote_pool(engine: str = "processes") -> "Pool | None":
+    """The active persistent :class:`Pool` of engine, if its workers run elsewhere."""
+    pool = _PERSISTENT_POOLS.get(engine)
+    return pool if pool is not None and pool.remote else None
+
+
+def default_n_workers(engine: str = "processes") -> int:
+    """Amount of workers to use for n_workers=-1.
 
+    Args:
+        engine: Either "processes" or "threads".
+
+    Returns:
+        The size of an active remote pool (see :meth:`remote_pool`), else the amount of
+        CPUs that workers of engine can make use of.
+    """
+    pool = remote_pool(engine)
+    if pool is not None:
+        return pool.n_workers
+    return _this().N_THREADS if engine == "threads" else _this().N_CORES
 
-def _choose_n_workers(n_chunks: int | None, n_workers: int) -> int:
+
+def _choose_n_workers(
+    n_chunks: int | None,
+    n_workers: int,
+    engine: str = "processes",
+) -> int:
     """Choose final amount of workers to be spawned for received input."""
+    n_cores = default_n_workers(engine)
     if n_workers < 1:
-        n_workers = N_CORES
-    elif n_workers > N_CORES:
+        n_workers = n_cores
+    elif n_workers > n_cores:
         logger.warning(
             "Using more workers (%d) than is sensible (%d). For CPU-bound operations, consider lowering n_workers to avoid bottlenecks on the physical CPUs",
             n_workers,
-            N_CORES,
+            n_cores,
         )
 
     # no sense having more workers than chunks
@@ -97,52 +267,727 @@ def _choose_n_workers(n_chunks: int | None, n_workers: int) -> int:
     return n_workers
 
 
-def multiprocessing_imap(
+def worker_state() -> dict[str, Any]:
+    """State of the current worker, to be populated by an initializer.
+
+    Each worker process (or thread, for the threads engine) has its own dictionary,
+    which is emptied right before the initializer runs. Functions running in the worker
+    can then look up what the initializer loaded, instead of receiving it with every
+    task.
+
+    Returns:
+        Dictionary private to the current worker.
+    """
+    state = getattr(_WORKER, "state", None)
+    if state is None:
+        state = _WORKER.state = {}
+    return state
+
+
+def _initialize(initializer: Callable, initargs: tuple[Any, ...]) -> None:
+    """Run initializer in a fresh worker."""
+    _WORKER.state = {}
+    _WORKER.initialized = (initializer, initargs)
+    initializer(*initargs)
+
+
+def call_initialized(
+    initializer: Callable,
+    initargs: tuple[Any, ...],
+    func: Callable,
+    item: Any,
+) -> Any:
+    """Call func on item, running initializer first if this thread didn't yet."""
+    initialized = getattr(_WORKER, "initialized", (None, None))
+    if initialized[0] is not initializer or initialized[1] is not initargs:
+        _initialize(initializer, initargs)
+    return func(item)
+
+
+def _start_pool(
+    n_workers: int,
+    max_tasks_per_child: int | None = MAX_TASKS_PER_CHILD,
+    engine: str = "processes",
+    *,
+    initializer: Callable | None = None,
+    initargs: tuple[Any, ...] = (),
+    **pool_kwargs: Any,
+) -> Any:
+    """Instantiate POOL_CLASS (or a ThreadPool for the threads engine) with n_workers."""
+    if initializer is not None:
+        pool_kwargs.update(initializer=partial(_initialize, initializer, initargs))
+    from pathos.pools import ProcessPool, ThreadPool
+
+    pool_class = ThreadPool if engine == "threads" else _this().POOL_CLASS
+    if ProcessPool == pool_class:
+        # allow changing pool: import mapply, pathos; mapply.parallel.POOL_CLASS = pathos.pools.ThreadPool
+        pool_kwargs.update(
+            maxtasksperchild=max_tasks_per_child,
+            context=_this().CONTEXT,
+        )
+    elif ThreadPool != pool_class:
+        pool_kwargs.pop("id", None)
+    logger.debug("Starting %s with %d workers", pool_class.__name__, n_workers)
+    return pool_class(n_workers, **pool_kwargs)
+
+
+class Executor(Protocol):
+    """Interface of the pools that mapply dispatches tasks to.
+
+    It is the part of the :class:`pathos.pools.ProcessPool` interface that mapply uses,
+    so pathos pools (and ``POOL_CLASS`` replacements) are executors as is. Other
+    executors are served by a persistent :class:`Pool` subclass overriding
+    ``_serve``, see :class:`mapply.cluster.Cluster`.
+    """
+
+    def apipe(self, func: Callable, *args: Any) -> Any:
+        """Submit func(*args), returning a result with ready, wait and get methods."""
+        ...
+
+    def imap(self, func: Callable, iterable: Iterable[Any]) -> Iterator[Any]:
+        """Apply func to each element of iterable, yielding results in order."""
+        ...
+
+    def uimap(self, func: Callable, iterable: Iterable[Any]) -> Iterator[Any]:
+        """Apply func to each element of iterable, yielding results as they complete."""
+        ...
+
+    def restart(self, force: bool = False) -> Any:  # noqa: FBT001, FBT002
+        """Replace the workers by fresh ones, once no tasks are in flight."""
+        ...
+
+    def terminate(self) -> None:
+        """Stop the workers immediately, abandoning tasks in flight."""
+        ...
+
+    def clear(self) -> None:
+        """Shut down the workers gracefully."""
+        ...
+
+
+class Pool:
+    """Pool of workers which is kept alive across :meth:`multiprocessing_imap` calls.
+
+    While active (as context manager, or after :meth:`mapply.init` with
+    ``persistent_pool=True``), all parallel work is dispatched to this pool instead of
+    spawning (and tearing down) a new pool for every call. Workers are spawned lazily
+    on first use. On errors, the pool is terminated and restarted on next use.
+
+    Persistent pools are kept per engine: an active threads pool serves calls with
+    ``engine="threads"``, an active processes pool serves all other calls.
+
+    Args:
+        n_workers: Amount of workers (processes or threads) to spawn.
+        engine: Either "processes" or "threads", see :meth:`multiprocessing_imap`.
+        max_tasks_per_child: Amount of tasks after which a worker is replaced by a
+            fresh one. Defaults to None, keeping workers warm for the lifetime of the
+            pool. Workers leaking memory are recycled by max_worker_rss or max_memory
+            instead, see :meth:`multiprocessing_imap`.
+        initializer: Function to run once in every worker when it starts, e.g. to
+            load a model into :meth:`worker_state`. Runs again in replacement workers
+            (see max_tasks_per_child).
+        initargs: Positional arguments to pass to initializer.
+    """
+
+    def __init__(
+        self,
+        n_workers: int = -1,
+        *,
+        engine: str = "processes",
+        max_tasks_per_child: int | None = None,
+        initializer: Callable | None = None,
+        initargs: tuple[Any, ...] = (),
+    ) -> None:
+        check_engine(engine)
+        self.n_workers = _choose_n_workers(None, n_workers, engine)
+        self.engine = engine
+        self.max_tasks_per_child = max_tasks_per_child
+        self.initializer = initializer
+        self.initargs = initargs
+        self._pool: Any = None
+        self._previous: Pool | None = None
+        self._slots: WeakKeyDictionary = WeakKeyDictionary()
+
+    @property
+    def remote(self) -> bool:
+        """Whether the workers run on other machines, without access to local files."""
+        return False
+
+    def _serve(self) -> Executor:
+        """Return the underlying pool, starting it if necessary."""
+        if self._pool is None:
+            # unique id so pathos doesn't share (and clear) this pool with others
+            self._pool = _start_pool(
+                self.n_workers,
+                self.max_tasks_per_child,
+                self.engine,
+                initializer=self.initializer,
+                initargs=self.initargs,
+                id=f"mapply-{id(self)}",
+            )
+        return self._pool
+
+    def _async_slots(self, loop: "asyncio.AbstractEventLoop") -> "asyncio.Semaphore":
+        """Task slots shared by all :meth:`async_imap` calls on loop using this pool.
+
+        Slots are handed out first come, first served, and each call waits for a slot
+        before submitting its next task, so concurrent calls take turns.
+        """
+        import asyncio
+
+        if loop not in self._slots:
+            self._slots[loop] = asyncio.Semaphore(2 * self.n_workers)
+        return self._slots[loop]
+
+    def terminate(self) -> None:
+        """Stop the workers immediately. The pool will restart on next use."""
+        if self._pool is not None:
+            logger.debug("Terminating persistent pool")
+            self._pool.terminate()
+            self._pool.clear()
+            self._pool = None
+
+    def shutdown(self) -> None:
+        """Close the pool gracefully, and deactivate it if it was active."""
+        if self._pool is not None:
+            logger.debug("Closing persistent pool")
+            self._pool.clear()
+            self._pool = None
+        if _PERSISTENT_POOLS.get(self.engine) is self:
+            if self._previous is None:
+                del _PERSISTENT_POOLS[self.engine]
+            else:
+                _PERSISTENT_POOLS[self.engine] = self._previous
+        self._previous = None
+
+    def activate(self) -> Self:
+        """Use this pool for all subsequent parallel work with its engine."""
+        if _PERSISTENT_POOLS.get(self.engine) is not self:
+            self._previous = _PERSISTENT_POOLS.get(self.engine)
+            _PERSISTENT_POOLS[self.engine] = self
+        return self
+
+    def __enter__(self) -> Self:
+        """Activate the pool."""
+        self.activate()
+        return self
+
+    def __exit__(self, *exc_info: object) -> None:
+        """Shut down the pool."""
+        self.shutdown()
+
+
+def shutdown() -> None:
+    """Shut down the active persistent :class:`Pool` of each engine, if any."""
+    for pool in list(_PERSISTENT_POOLS.values()):
+        pool.shutdown()
+
+
+def _serial(
+    func: Callable,
+    initializer: Callable | None,
+    initargs: tuple[Any, ...],
+    persistent_pool: Pool | None,
+    *,
+    return_exceptions: bool = False,
+) -> Callable:
+    """Wrap func to run the initializer (of the persistent pool) in the calling thread."""
+    if return_exceptions:
+        func = partial(_captured, func)
+    if initializer is None and persistent_pool is not None:
+        initializer, initargs = persistent_pool.initializer, persistent_pool.initargs
+    if initializer is None:
+        return func
+    return partial(call_initialized, initializer, initargs, func)
+
+
+def _captured(func: Callable, item: Any) -> Any:
+    """Call func on item, returning the error it raised instead of raising it."""
+    try:
+        return func(item)
+    except Exception as error:  # noqa: BLE001
+        return error
+
+
+def _check_initializer(pool: Pool | None, initializer: Callable | None) -> None:
+    """Raise if the workers of a persistent pool were initialized differently.
+
+    Args:
+        pool: The active persistent pool, if any.
+        initializer: Initializer requested for the call.
+
+    Raises:
+        ValueError: If initializer is not the one of pool.
+    """
+    if (
+        pool is not None
+        and initializer is not None
+        and initializer is not pool.initializer
+    ):
+        msg = "The active persistent Pool was started with another initializer, pass initializer to Pool (or init) instead"
+        raise ValueError(msg)
+
+
+def check_engine(engine: str) -> None:
+    """Raise if engine is unknown.
+
+    Args:
+        engine: Engine to check.
+
+    Raises:
+        ValueError: If engine is not one of ENGINES.
+    """
+    if engine not in ENGINES:
+        msg = f"Unknown engine '{engine}', expected one of {ENGINES}"
+        raise ValueError(msg)
+
+
+def estimate_bytes(obj: Any) -> int:
+    """Estimate the size of obj in memory.
+
+    Uses the deep memory usage of pandas objects (also inside tuples, like enumerated
+    chunks), and :func:`sys.getsizeof` for anything else.
+
+    Args:
+        obj: Object to measure.
+
+    Returns:
+        Amount of bytes.
+    """
+    if isinstance(obj, tuple):
+        return sum(map(estimate_bytes, obj))
+    memory_usage = getattr(obj, "memory_usage", None)
+    if callable(memory_usage):
+        usage = memory_usage(deep=True)
+        return int(usage.sum() if hasattr(usage, "sum") else usage)
+    return sys.getsizeof(obj)
+
+
+@cache
+def _malloc_trim() -> Callable[[int], int] | None:
+    """Glibc's malloc_trim, returning freed heap memory to the OS, if available."""
+    import ctypes
+
+    try:
+        return ctypes.CDLL("libc.so.6").malloc_trim
+    except (OSError, AttributeError):
+        return None
+
+
+def _rss() -> int:
+    import psutil
+
+    return psutil.Process().memory_info().rss
+
+
+def _guarded_call(func: Callable, max_rss: int, item: Any) -> tuple[Any, bool]:
+    """Call func on item, reporting whether this worker grew beyond max_rss.
+
+    Growth is measured from the first call, as forked workers start out with the
+    resident memory of the parent. Before reporting, garbage is collected and freed
+    heap memory is returned to the OS, which often suffices.
+    """
+    baseline = getattr(_WORKER, "baseline_rss", None)
+    if baseline is None:
+        baseline = _WORKER.baseline_rss = _rss()
+    result = func(item)
+    if _rss() - baseline <= max_rss:
+        return result, False
+    gc.collect()
+    malloc_trim = _malloc_trim()
+    if malloc_trim is not None:
+        malloc_trim(0)
+    return result, _rss() - baseline > max_rss
+
+
+def resolve_max_memory(max_memory: float | None) -> int | None:
+    """Convert a memory budget to bytes.
+
+    Args:
+        max_memory: Amount of bytes, or a fraction (up to 1.0) of
+            :meth:`mapply._resources.memory_budget`.
+
+    Returns:
+        Amount of bytes, or None if max_memory is None.
+
+    Raises:
+        ValueError: If max_memory is not positive.
+    """
+    if max_memory is None:
+        return None
+    if max_memory <= 0:
+        msg = f"max_memory should be positive, got {max_memory}"
+        raise ValueError(msg)
+    if max_memory <= 1:
+        from mapply._resources import memory_budget
+
+        return max(1, int(max_memory * memory_budget()))
+    return int(max_memory)
+
+
+def _memory_limits(
+    max_memory: float | None,
+    max_worker_rss: int | None,
+    n_workers: int,
+    engine: str,
+) -> tuple[int | None, int | None]:
+    """Resolve the bytes in flight and the growth per worker to allow, if limited."""
+    max_bytes = resolve_max_memory(max_memory)
+    if engine == "threads":
+        # threads share the memory of the caller, and can't be recycled
+        return max_bytes, None
+    if max_worker_rss is None and max_bytes is not None:
+        max_worker_rss = max(1, max_bytes // max(1, n_workers))
+    return max_bytes, max_worker_rss
+
+
+class _Lost:
+    """Stand-in for the async result of a task that was lost along with its worker."""
+
+    def __init__(self, error: Exception) -> None:
+        self._error = error
+
+    def ready(self) -> bool:
+        """Whether the task completed, which it did (unsuccessfully)."""
+        return True
+
+    def wait(self, timeout: float | None = None) -> None:
+        """Return immediately."""
+
+    def get(self, timeout: float | None = None) -> Any:  # noqa: ARG002
+        """Raise the error the task was lost with."""
+        raise self._error
+
+
+def _outcome(result: Any, *, return_exceptions: bool) -> Any:
+    """Get the value of an async result, or the error it failed with if return_exceptions."""
+    try:
+        return result.get()
+    except Exception as error:
+        if not return_exceptions:
+            raise
+        return error
+
+
+def _lose_in_flight(
+    pool: Any,
+    in_flight: deque[tuple[Any, int]],
+    exitcode: int,
+) -> deque[tuple[Any, int]]:
+    """Terminate pool after one of its workers was killed, failing the tasks in flight.
+
+    Tasks that already completed (but weren't yielded yet, e.g. to keep order) keep
+    their result.
+    """
+    error = ChildProcessError(f"Worker killed by signal {-exitcode}")
+    outcomes = deque(
+        (result if result.ready() else _Lost(error), nbytes)
+        for result, nbytes in in_flight
+    )
+    logger.warning(
+        "A worker was killed by signal %d, failing the %d tasks in flight",
+        -exitcode,
+        sum(isinstance(result, _Lost) for result, _ in outcomes),
+    )
+    pool.terminate()
+    pool.clear()
+    return outcomes
+
+
+def _track_workers(pool: Any, workers: dict[int, Any]) -> None:
+    """Keep references to the worker processes of pool in workers, see _killed_worker."""
+    serve = getattr(pool, "_serve", None)
+    if serve is None:
+        # not a pathos pool, e.g. a cluster resubmitting tasks of lost nodes itself
+        return
+    for process in getattr(serve(), "_pool", ()):
+        workers.setdefault(id(process), process)
+
+
+def _killed_worker(pool: Any, workers: dict[int, Any]) -> int | None:
+    """Exit code of a worker process of pool that was killed by a signal, if any.
+
+    A pool silently replaces dead workers, and the task a killed worker was running
+    never completes. As the pool forgets the processes it replaced, workers keeps
+    references to the processes seen so far, which is tracked on every submission
+    such that a worker dying right away isn't missed.
+    """
+    _track_workers(pool, workers)
+    for key, process in list(workers.items()):
+        exitcode = process.exitcode
+        if exitcode is None:
+            continue
+        del workers[key]
+        if exitcode < 0:
+            return exitcode
+    return None
+
+
+def _bounded_imap(  # noqa: C901, PLR0913
+    pool: Any,
+    func: Callable,
+    iterable: Iterable[Any],
+    *,
+    max_in_flight: int,
+    ordered: bool,
+    max_bytes: int | None = None,
+    recycle: bool = False,
+    return_exceptions: bool = False,
+) -> Iterator[Any]:
+    """Like pool.imap, but only pulling from iterable when a task slot frees up.
+
+    If a worker process gets killed (e.g. by the OOM killer), the pool is terminated
+    and the tasks in flight fail with a ChildProcessError, instead of waiting forever.
+
+    Args:
+        pool: Pathos pool to submit tasks to.
+        func: Function to apply to each element in iterable.
+        iterable: Input iterable on which to execute func.
+        max_in_flight: Maximum amount of elements submitted but not yet yielded.
+        ordered: Whether to yield results in the order of iterable.
+        max_bytes: Maximum estimated memory of the elements in flight, see
+            :meth:`estimate_bytes` and :meth:`mapply._resources.max_workers_for_memory`.
+            An element exceeding it on its own is submitted once nothing else is in
+            flight.
+        recycle: Whether func returns (result, over) pairs from :meth:`_guarded_call`.
+            If a worker is over its memory threshold, no more tasks are submitted
+            until all tasks in flight completed, after which the pool is restarted.
+        return_exceptions: Whether to yield the error of a failed task in place of
+            its result, instead of raising it.
+
+    Yields:
+        Results of func.
+    """
+    iterator = iter(iterable)
+    # (async result, estimated bytes) of each task in flight
+    in_flight: deque[tuple[Any, int]] = deque()
+    # element pulled from iterator that didn't fit yet, with its estimated bytes
+    pending: list[tuple[Any, int]] = []
+    loaded = 0
+    draining = False
+    workers: dict[int, Any] = {}
+
+    def submit() -> None:
+        nonlocal loaded
+        while not draining and len(in_flight) < max_in_flight:
+            if not pending:
+                item = next(iterator, _EXHAUSTED)
+                if item is _EXHAUSTED:
+                    return
+                nbytes = 0
+                if max_bytes is not None:
+                    nbytes = WORKER_MEMORY_FACTOR * estimate_bytes(item)
+                pending.append((item, nbytes))
+            item, nbytes = pending[0]
+            if max_bytes is not None and in_flight and loaded + nbytes > max_bytes:
+                return
+            pending.clear()
+            in_flight.append((pool.apipe(func, item), nbytes))
+            _track_workers(pool, workers)
+            loaded += nbytes
+
+    submit()
+    while in_flight:
+        # poll for the first task (or the next in order) to complete
+        candidates = [in_flight[0]] if ordered else in_flight
+        task = next((t for t in candidates if t[0].ready()), None)
+        if task is None:
+            in_flight[0][0].wait(POLL_INTERVAL)
+            exitcode = _killed_worker(pool, workers)
+            if exitcode is not None:
+                in_flight = _lose_in_flight(pool, in_flight, exitcode)
+                workers.clear()
+            continue
+        in_flight.remove(task)
+        loaded -= task[1]
+        value = _outcome(task[0], return_exceptions=return_exceptions)
+        if recycle and not isinstance(value, Exception):
+            value, over = value
+            draining = draining or over
+        if draining and not in_flight:
+            logger.debug("Restarting pool to recycle workers over their memory limit")
+            pool.restart(force=True)
+            draining = False
+        submit()
+        yield value
+
+
+def _imap(  # noqa: PLR0913
+    pool: Any,
+    func: Callable,
+    iterable: Iterable[Any],
+    *,
+    ordered: bool,
+    max_in_flight: int | None,
+    max_bytes: int | None = None,
+    max_rss: int | None = None,
+    return_exceptions: bool = False,
+) -> Iterator[Any]:
+    """Dispatch to the pool method matching ordered and max_in_flight.
+
+    Limiting memory requires max_in_flight, as tasks are only held back (and workers
+    only recycled) in between submissions. So does return_exceptions, as the pool
+    methods stop at the first error.
+    """
+    if max_in_flight:
+        return _bounded_imap(
+            pool,
+            partial(_guarded_call, func, max_rss) if max_rss else func,
+            iterable,
+            max_in_flight=max_in_flight,
+            ordered=ordered,
+            max_bytes=max_bytes,
+            recycle=bool(max_rss),
+            return_exceptions=return_exceptions,
+        )
+    if ordered:
+        return pool.imap(func, iterable)
+    return pool.uimap(func, iterable)
+
+
+def multiprocessing_imap(  # noqa: PLR0913
     func: Callable,
     iterable: Iterable[Any],
     *,
     n_workers: int = -1,
     progressbar: bool = True,
+    ordered: bool = True,
+    max_in_flight: int | None = None,
+    stats: MapplyStats | None = None,
+    engine: str = "processes",
+    initializer: Callable | None = None,
+    initargs: tuple[Any, ...] = (),
+    max_memory: float | None = None,
+    max_worker_rss: int | None = MAX_WORKER_RSS,
+    return_exceptions: bool = False,
     args: tuple[Any, ...] = (),
     **kwargs: Any,
 ) -> Iterator[Any]:
     """Execute func on each element in iterable on n_workers, ensuring order.
 
+    If a persistent :class:`Pool` with the same engine is active, its workers are used
+    instead of spawning a new pool.
+
     Args:
         func: Function to apply to each element in iterable.
         iterable: Input iterable on which to execute func.
-        n_workers: Amount of workers (processes) to spawn.
+        n_workers: Amount of workers (processes or threads) to spawn.
         progressbar: Whether to wrap the chunks in a tqdm.auto.tqdm.
-        args: Additional positional arguments to pass to func.
+        ordered: Whether to yield results in the order of iterable. If False, results
+            are yielded as soon as they complete.
+        max_in_flight: Maximum amount of elements pulled from iterable that have not
+            been yielded yet (backpressure). By default, the pool consumes iterable as
+            fast as it can, or twice the amount of workers when limiting memory.
+        stats: A :class:`mapply.stats.MapplyStats` instance to populate with timings
+            and payload sizes of each element.
+        engine: Either "processes", or "threads" to run func in a
+            :class:`pathos.pools.ThreadPool`. Threads share memory with the caller, so
+            nothing is pickled. Only speeds up functions that release the GIL (most
+            NumPy and regex operations, I/O), or on free-threaded Python builds.
+        initializer: Function to run once in every worker before it processes
+            elements, e.g. to load a model into :meth:`worker_state`. Workers of a
+            pool started for this call are then kept for the whole call, instead of
+            being replaced every ``MAPPLY_MAX_TASKS_PER_CHILD`` tasks. When running
+            serially, runs once in the calling thread. Pass it to :class:`Pool`
+            instead when using a persistent pool.
+        initargs: Positional arguments to pass to initializer.
+        max_memory: Memory budget in bytes, or as a fraction (up to 1.0) of the
+            available memory. Elements are pulled from iterable only while their
+            estimated footprint in flight fits (see :meth:`estimate_bytes`). When using
+            processes, it also sets the default for max_worker_rss to an equal share
+            per worker.
+        max_worker_rss: Recycle the workers once one of them grew its resident memory
+            by more than this many bytes (after collecting garbage), instead of
+            replacing them every ``MAPPLY_MAX_TASKS_PER_CHILD`` tasks. Defaults to
+            ``MAPPLY_MAX_WORKER_RSS``. Ignored when using threads.
+        return_exceptions: Whether to yield the error raised for an element in place
+            of its result, such that the other elements still complete (and can be
+            retried by the caller). This includes a ChildProcessError for elements in
+            flight when a worker process got killed, e.g. by the OOM killer.
+        args: Additional positional arguments to pass to func. Arguments wrapped in
+            :meth:`mapply.broadcast` are sent to each worker once, and replaced by
+            their value.
         **kwargs: Additional keyword arguments to pass to func.
 
     Yields:
-        Results in same order as input iterable.
+        Results in same order as input iterable, unless ordered is False.
 
     Raises:
         Exception: Any error occurred during computation (will terminate the pool early).
         KeyboardInterrupt: Any KeyboardInterrupt sent by the user (will terminate the pool early).
     """
+    check_engine(engine)
     n_chunks: int | None = tqdm(iterable, disable=True).__len__()  # doesn't exhaust
-    func = partial(func, *args, **kwargs)
+    func = partial(resolving(func, args, kwargs), *args, **kwargs)
+    if stats is not None:
+        # nothing is serialized when using threads
+        func = partial(measured_call, func, measure_bytes=engine != "threads")
 
-    n_workers = _choose_n_workers(n_chunks, n_workers)
+    n_workers = _choose_n_workers(n_chunks, n_workers, engine)
+    persistent_pool = _PERSISTENT_POOLS.get(engine)
+    _check_initializer(persistent_pool, initializer)
+    max_bytes, max_rss = _memory_limits(
+        max_memory,
+        max_worker_rss,
+        persistent_pool.n_workers if persistent_pool else n_workers,
+        engine,
+    )
+    if max_in_flight is None and (max_bytes or max_rss or return_exceptions):
+        max_in_flight = 2 * (
+            persistent_pool.n_workers if persistent_pool else n_workers
+        )
+    started = time()
 
     if n_workers <= 1:
         # no sense spawning pool
         pool = None
-        stage = map(func, iterable)
+        stage = map(
+            _serial(
+                func,
+                initializer,
+                initargs,
+                persistent_pool,
+                return_exceptions=return_exceptions,
+            ),
+            iterable,
+        )
+    elif persistent_pool is not None:
+        pool = persistent_pool
+        stage = _imap(
+            persistent_pool._serve(),  # noqa: SLF001
+            func,
+            iterable,
+            ordered=ordered,
+            max_in_flight=max_in_flight,
+            max_bytes=max_bytes,
+            max_rss=max_rss,
+            return_exceptions=return_exceptions,
+        )
     else:
-        pool_kwargs = (
-            # allow changing pool: import mapply, pathos; mapply.parallel.POOL_CLASS = pathos.pools.ThreadPool
-            {"maxtasksperchild": MAX_TASKS_PER_CHILD, "context": CONTEXT}
-            if ProcessPool == POOL_CLASS
-            else {}
+        with Timer(stats, "pool_startup_seconds"):
+            pool = _start_pool(
+                n_workers,
+                # keep initialized workers for the whole call, recycle by memory instead
+                MAX_TASKS_PER_CHILD if initializer is None and not max_rss else None,
+                engine=engine,
+                initializer=initializer,
+                initargs=initargs,
+            )
+        stage = _imap(
+            pool,
+            func,
+            iterable,
+            ordered=ordered,
+            max_in_flight=max_in_flight,
+            max_bytes=max_bytes,
+            max_rss=max_rss,
+            return_exceptions=return_exceptions,
         )
-        logger.debug("Starting ProcessPool with %d workers", n_workers)
-        pool = POOL_CLASS(n_workers, **pool_kwargs)
 
-        stage = pool.imap(func, iterable)
+    if stats is not None:
+        stats.n_workers = n_workers
+        stats.started = started
+        stage = _record(stage, stats)
 
     if progressbar:
         stage = tqdm(stage, total=n_chunks)
@@ -155,6 +1000,287 @@ def multiprocessing_imap(
             pool.terminate()
         raise
     finally:
-        if pool:
+        if pool and pool is not persistent_pool:
+            logger.debug("Closing pool")
+            pool.clear()
+
+
+def _receive(measured: tuple[Any, ChunkStats], stats: MapplyStats) -> Any:
+    """Unpack a result of :meth:`mapply.stats.measured_call`, recording its stats."""
+    result, chunk = measured
+    chunk.received = time()
+    stats.chunks.append(chunk)
+    stats.wall_seconds = chunk.received - stats.started
+    return result
+
+
+def _record(
+    stage: Iterable[tuple[Any, ChunkStats]],
+    stats: MapplyStats,
+) -> Iterator[Any]:
+    """Unpack results of :meth:`mapply.stats.measured_call`, recording their stats."""
+    for measured in stage:
+        # failed elements (see return_exceptions) weren't measured
+        yield measured if isinstance(measured, Exception) else _receive(measured, stats)
+
+
+def _resolve(future: "asyncio.Future", value: Any, *, error: bool = False) -> None:
+    """Set the outcome of future, unless it was cancelled in the meantime."""
+    if future.done():
+        return
+    if error:
+        future.set_exception(value)
+    else:
+        future.set_result(value)
+
+
+def _async_submitter(
+    pool: Any,
+    func: Callable,
+    loop: "asyncio.AbstractEventLoop",
+    workers: dict[int, Any],
+) -> Callable[[Any], "asyncio.Future"]:
+    """Return a function submitting func(item) to pool, returning an awaitable future.
+
+    Completion is signalled from the pool's result handler thread, so awaiting doesn't
+    block the event loop. The worker processes of pool are tracked in workers, see
+    :meth:`_killed_worker`.
+    """
+    if pool is None:
+        # serial, but off the event loop
+        return partial(loop.run_in_executor, None, func)
+    # the underlying multiprocess pool supports callbacks, unlike pathos' apipe
+    raw_pool = pool if hasattr(pool, "apply_async") else pool._serve()  # noqa: SLF001
+
+    def submit(item: Any) -> "asyncio.Future":
+        future = loop.create_future()
+        raw_pool.apply_async(
+            func,
+            (item,),
+            callback=lambda value: loop.call_soon_threadsafe(_resolve, future, value),
+            error_callback=lambda exc: loop.call_soon_threadsafe(
+                partial(_resolve, future, exc, error=True),
+            ),
+        )
+        _track_workers(pool, workers)
+        return future
+
+    return submit
+
+
+async def async_imap(  # noqa: PLR0913
+    func: Callable,
+    iterable: Iterable[Any],
+    *,
+    n_workers: int = -1,
+    progressbar: bool = False,
+    ordered: bool = True,
+    max_in_flight: int | None = None,
+    stats: MapplyStats | None = None,
+    engine: str = "processes",
+    initializer: Callable | None = None,
+    initargs: tuple[Any, ...] = (),
+    args: tuple[Any, ...] = (),
+    **kwargs: Any,
+) -> AsyncIterator[Any]:
+    """Asynchronous version of :meth:`multiprocessing_imap`, for use in asyncio code.
+
+    Tasks are submitted to the pool and awaited without blocking the event loop. If a
+    persistent :class:`Pool` with the same engine is active, concurrent calls share its
+    workers fairly: each call waits for a free task slot before submitting its next
+    task, and slots are handed out first come, first served.
+
+    Cancelling the consuming task (or an error in func) cancels all outstanding tasks
+    of this call. A pool started by this call is terminated, while a shared persistent
+    pool is left running for the other calls (its outstanding tasks of this call still
+    run to completion, but their results are discarded). If a worker process gets
+    killed (e.g. by the OOM killer), the tasks in flight fail with a ChildProcessError.
+
+    Args:
+        func: Function to apply to each element in iterable.
+        iterable: Input iterable on which to execute func.
+        n_workers: Amount of workers (processes or threads) to spawn.
+        progressbar: Whether to display a tqdm.auto.tqdm of processed elements.
+        ordered: Whether to yield results in the order of iterable. If False, results
+            are yielded as soon as they complete.
+        max_in_flight: Maximum amount of elements pulled from iterable that have not
+            been yielded yet. Defaults to twice the amount of workers.
+        stats: A :class:`mapply.stats.MapplyStats` instance to populate with timings
+            and payload sizes of each element.
+        engine: Either "processes" or "threads", see :meth:`multiprocessing_imap`.
+        initializer: Function to run once in every worker, see
+            :meth:`multiprocessing_imap`.
+        initargs: Positional arguments to pass to initializer.
+        args: Additional positional arguments to pass to func.
+        **kwargs: Additional keyword arguments to pass to func.
+
+    Yields:
+        Results in same order as input iterable, unless ordered is False.
+    """
+    import asyncio
+
+    check_engine(engine)
+    loop = asyncio.get_running_loop()
+    n_chunks: int | None = tqdm(iterable, disable=True).__len__()  # doesn't exhaust
+    func = partial(resolving(func, args, kwargs), *args, **kwargs)
+    if stats is not None:
+        func = partial(measured_call, func, measure_bytes=engine != "threads")
+
+    n_workers = _choose_n_workers(n_chunks, n_workers, engine)
+    persistent_pool = _PERSISTENT_POOLS.get(engine)
+    _check_initializer(persistent_pool, initializer)
+    started = time()
+
+    if persistent_pool is not None:
+        pool = persistent_pool._serve()  # noqa: SLF001
+        slots = persistent_pool._async_slots(loop)  # noqa: SLF001
+        n_workers = persistent_pool.n_workers
+    elif n_workers <= 1:
+        pool = None
+        slots = asyncio.Semaphore(1)
+        func = _serial(func, initializer, initargs, persistent_pool)
+    else:
+        with Timer(stats, "pool_startup_seconds"):
+            pool = _start_pool(
+                n_workers,
+                MAX_TASKS_PER_CHILD if initializer is None else None,
+                engine=engine,
+                initializer=initializer,
+                initargs=initargs,
+            )
+        slots = asyncio.Semaphore(2 * n_workers)
+    workers: dict[int, Any] = {}
+    submit = _async_submitter(pool, func, loop, workers)
+
+    if stats is not None:
+        stats.n_workers = n_workers
+        stats.started = started
+
+    in_flight: deque[asyncio.Future] = deque()
+    bar = tqdm(total=n_chunks, disable=not progressbar)
+    try:
+        async for result in _async_stage(
+            submit,
+            iter(iterable),
+            in_flight,
+            slots,
+            max_in_flight=max_in_flight or 2 * n_workers,
+            ordered=ordered,
+            pool=pool,
+            workers=workers,
+        ):
+            bar.update()
+            yield result if stats is None else _receive(result, stats)
+    finally:
+        # cancelled, errored, or closed early by the consumer
+        bar.close()
+        for future in in_flight:
+            future.cancel()
+        if pool is not None and persistent_pool is None:
+            if in_flight:
+                logger.debug("Terminating pool")
+                pool.terminate()
             logger.debug("Closing pool")
             pool.clear()
+
+
+async def _async_stage(  # noqa: PLR0913
+    submit: Callable[[Any], "asyncio.Future"],
+    iterator: Iterator[Any],
+    in_flight: "deque[asyncio.Future]",
+    slots: "asyncio.Semaphore",
+    *,
+    max_in_flight: int,
+    ordered: bool,
+    pool: Any,
+    workers: dict[int, Any],
+) -> AsyncIterator[Any]:
+    """Submit elements of iterator while slots are available, yielding their results.
+
+    Elements are pulled from iterator (e.g. slicing chunks) off the event loop. While
+    waiting, the workers of pool are polled: if one got killed, pool is terminated (as
+    the task it was running never completes) and the tasks in flight fail with a
+    ChildProcessError. Other calls sharing pool notice their workers were terminated.
+    """
+    import asyncio
+
+    loop = asyncio.get_running_loop()
+    while True:
+        while len(in_flight) < max_in_flight:
+            item = await loop.run_in_executor(None, next, iterator, _EXHAUSTED)
+            if item is _EXHAUSTED:
+                break
+            await slots.acquire()
+            try:
+                future = submit(item)
+            except BaseException:
+                slots.release()
+                raise
+            future.add_done_callback(lambda _: slots.release())
+            in_flight.append(future)
+        if not in_flight:
+            return
+        done, _ = await asyncio.wait(
+            [in_flight[0]] if ordered else in_flight,
+            timeout=None if pool is None else POLL_INTERVAL,
+            return_when=asyncio.FIRST_COMPLETED,
+        )
+        if not done:
+            exitcode = None if pool is None else _killed_worker(pool, workers)
+            if exitcode is not None:
+                lost = [future for future in in_flight if not future.done()]
+                logger.warning(
+                    "A worker was killed by signal %d, failing the %d tasks in flight",
+                    -exitcode,
+                    len(lost),
+                )
+                error = ChildProcessError(f"Worker killed by signal {-exitcode}")
+                pool.terminate()
+                pool.clear()
+                for future in lost:
+                    _resolve(future, error, error=True)
+            continue
+        future = next(f for f in in_flight if f in done)
+        in_flight.remove(future)
+        yield future.result()
+
+
+def _call_enumerated(func: Callable, item: tuple[int, Any]) -> tuple[int, Any]:
+    """Call func on the payload of an (ordinal, payload) pair, keeping the ordinal."""
+    ordinal, payload = item
+    return ordinal, func(payload)
+
+
+def enumerated_imap(
+    func: Callable,
+    items: Iterable[Any],
+    *,
+    ordered: bool = True,
+    **kwargs: Any,
+) -> Iterator[tuple[int, Any]]:
+    """Like enumerate(multiprocessing_imap(...)), but optionally in completion order.
+
+    With ordered=False, each result is tagged with the ordinal of its item, so that
+    callers can put it in the right slot. This way, one slow item doesn't hold back
+    consumption of all subsequent results (and the progressbar).
+
+    Args:
+        func: Function to apply to each element in items.
+        items: Input iterable on which to execute func. Pass a sized iterable (e.g.
+            a tqdm with total) to lazily produce items while keeping the length known.
+        ordered: Whether to yield results in the order of items.
+        **kwargs: Keyword arguments for :meth:`multiprocessing_imap`.
+
+    Yields:
+        (ordinal, result) pairs.
+    """
+    if ordered:
+        yield from enumerate(multiprocessing_imap(func, items, **kwargs))
+    else:
+        n_items = tqdm(items, disable=True).__len__()  # doesn't exhaust
+        yield from multiprocessing_imap(
+            partial(_call_enumerated, func),
+            tqdm(enumerate(items), disable=True, total=n_items),
+            ordered=False,
+            **kwargs,
+        )
@@ -0,0 +1,202 @@
+# BSD 3-Clause License
+#
+# Copyright (c) 2024, ddelange, <ddelange@delange.dev>
+#
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#
+# 1. Redistributions of source code must retain the above copyright notice, this
+#    list of conditions and the following disclaimer.
+#
+# 2. Redistributions in binary form must reproduce the above copyright notice,
+#    this list of conditions and the following disclaimer in the documentation
+#    and/or other materials provided with the distribution.
+#
+# 3. Neither the name of the copyright holder nor the names of its
+#    contributors may be used to endorse or promote products derived from
+#    this software without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+# DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE
+# FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL
+# DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR
+# SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER
+# CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY,
+# OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+# OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+#
+# SPDX-License-Identifier: BSD-3-Clause
+"""Submodule containing opt-in instrumentation of where mapply spends its time.
+
+Example usage:
+::
+
+    import pandas as pd
+    from mapply.mapply import mapply
+    from mapply.stats import MapplyStats
+
+    df = pd.DataFrame({"A": list(range(10_000))})
+
+    stats = MapplyStats()
+    mapply(df.A, lambda x: x ** 2, chunk_size=1, progressbar=False, stats=stats)
+    print(stats.summary())
+
+Measuring payload sizes requires an extra serialization of every chunk and result in
+the workers, so only pass stats when investigating performance.
+"""
+
+import os
+import statistics
+from collections.abc import Callable
+from dataclasses import dataclass, field
+from time import perf_counter, time
+from typing import Any
+
+
+@dataclass
+class ChunkStats:
+    """Timings and payload sizes of a single chunk.
+
+    Timestamps are in seconds since the epoch (comparable across processes).
+
+    Attributes:
+        pid: Process ID of the worker that processed the chunk.
+        started: When the worker started processing the chunk.
+        finished: When the worker finished processing the chunk.
+        received: When the parent received the result.
+        input_bytes: Size of the pickled chunk.
+        output_bytes: Size of the pickled result.
+    """
+
+    pid: int
+    started: float
+    finished: float
+    received: float = 0.0
+    input_bytes: int = 0
+    output_bytes: int = 0
+
+    @property
+    def compute_seconds(self) -> float:
+        """Time spent in func."""
+        return self.finished - self.started
+
+    @property
+    def transfer_seconds(self) -> float:
+        """Time between the worker finishing and the parent receiving the result.
+
+        Includes pickling, IPC and unpickling of the result, and for ordered imaps the
+        time waiting for preceding chunks.
+        """
+        return self.received - self.finished
+
+
+@dataclass
+class MapplyStats:
+    """Where time was spent during a :meth:`mapply.mapply.mapply` call.
+
+    Pass an instance as ``stats`` to :meth:`mapply.mapply.mapply` or
+    :meth:`mapply.parallel.multiprocessing_imap` to have it populated.
+
+    Attributes:
+        n_workers: Amount of workers that processed the chunks.
+        started: When the chunks were started to be dispatched (epoch seconds).
+        wall_seconds: Time between dispatching the first chunk and receiving the last.
+        pool_startup_seconds: Time spent starting the pool.
+        pilot_seconds: Time spent processing pilot chunks in the parent.
+        split_seconds: Time spent cutting (or sharing) the input into chunks.
+        concat_seconds: Time spent concatenating the results.
+        chunks: Stats for every chunk, in the order they were received.
+    """
+
+    n_workers: int = 0
+    started: float = 0.0
+    wall_seconds: float = 0.0
+    pool_startup_seconds: float = 0.0
+    pilot_seconds: float = 0.0
+    split_seconds: float = 0.0
+    concat_seconds: float = 0.0
+    chunks: list[ChunkStats] = field(default_factory=list)
+
+    @property
+    def compute_seconds(self) -> float:
+        """Total time spent in func, summed over all chunks."""
+        return sum(chunk.compute_seconds for chunk in self.chunks)
+
+    @property
+    def parallel_efficiency(self) -> float:
+        """Fraction of the available worker time spent computing (1.0 is ideal).
+
+        A low value with a low straggler ratio indicates IPC-bound work.
+        """
+        available = self.wall_seconds * max(self.n_workers, 1)
+        return self.compute_seconds / available if available else 0.0
+
+    @property
+    def straggler_ratio(self) -> float:
+        """Ratio of the slowest chunk's compute time to the median (1.0 is ideal)."""
+        if not self.chunks:
+            return 0.0
+        compute = [chunk.compute_seconds for chunk in self.chunks]
+        median = statistics.median(compute)
+        return max(compute) / median if median else 0.0
+
+    def summary(self) -> str:
+        """Human-readable overview of the collected stats."""
+        return "\n".join(
+            [
+                f"workers:              {self.n_workers}",
+                f"chunks:               {len(self.chunks)}",
+                f"wall time:            {self.wall_seconds:.3f}s",
+                f"pool startup:         {self.pool_startup_seconds:.3f}s",
+                f"pilot:                {self.pilot_seconds:.3f}s",
+                f"split:                {self.split_seconds:.3f}s",
+                f"concat:               {self.concat_seconds:.3f}s",
+                f"compute (sum):        {self.compute_seconds:.3f}s",
+                f"transfer (sum):       {sum(c.transfer_seconds for c in self.chunks):.3f}s",
+                f"input bytes (sum):    {sum(c.input_bytes for c in self.chunks)}",
+                f"output bytes (sum):   {sum(c.output_bytes for c in self.chunks)}",
+                f"parallel efficiency:  {self.parallel_efficiency:.1%}",
+                f"straggler ratio:      {self.straggler_ratio:.2f}",
+            ],
+        )
+
+
+def measured_call(
+    func: Callable,
+    item: Any,
+    *,
+    measure_bytes: bool = True,
+) -> tuple[Any, ChunkStats]:
+    """Call func on item in a worker, recording timings and payload sizes."""
+    import dill
+
+    started = time()
+    result = func(item)
+    finished = time()
+    chunk = ChunkStats(pid=os.getpid(), started=started, finished=finished)
+    if measure_bytes:
+        chunk.input_bytes = len(dill.dumps(item))
+        chunk.output_bytes = len(dill.dumps(result))
+    return result, chunk
+
+
+class Timer:
+    """Context manager adding the elapsed seconds to an attribute of stats, if any."""
+
+    def __init__(self, stats: MapplyStats | None, attr: str) -> None:
+        self.stats = stats
+        self.attr = attr
+
+    def __enter__(self) -> None:
+        """Start the timer."""
+        self.tic = perf_counter()
+
+    def __exit__(self, *exc_info: object) -> None:
+        """Add the elapsed time to stats."""
+        if self.stats is not None:
+            elapsed = perf_counter() - self.tic
+            setattr(self.stats, self.attr, getattr(self.stats, self.attr) + elapsed)
@@ -30,11 +30,28 @@
 # OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
 #
 # SPDX-License-Identifier: BSD-3-Clause
+import asyncio
+import io
+import os
+import signal
+import time
+
+import dill
+import multiprocess
 import numpy as np
 import pandas as pd
 import pytest
 
 import mapply
+from mapply._broadcast import _load
+from mapply._chunking import (
+    adaptive_bounds,
+    balanced_bounds,
+    run_pilot,
+    run_threaded_pilot,
+)
+from mapply._window_groupby import WARM_UP_ROWS, _load_func, _warm_up
+from mapply.cluster import local_cluster
 
 
 def test_df_mapply():
@@ -294,3 +311,859 @@ def test_expanding_groupby_mapply():
     mapply.init(progressbar=False, chunk_size=1)
     with pytest.raises(TypeError, match="Unsupported window groupby type"):
         df.groupby("group").ewm(span=3).mapply(lambda x: x.sum())
+
+
+def test_shared_memory_mapply(monkeypatch):
+    """Assert shared_memory transport behaviour is equivalent."""
+    monkeypatch.setattr("mapply.mapply.N_CORES", 2)
+    monkeypatch.setattr("mapply._shared_memory.MIN_SHARED_RESULT_BYTES", 0)
+    mapply.init(progressbar=False, chunk_size=1, n_workers=2, transport="shared_memory")
+
+    np.random.seed(1)  # noqa: NPY002
+    df = pd.DataFrame(
+        np.random.randint(0, 300, size=(500, 4)),  # noqa: NPY002
+        columns=list("ABCD"),
+        index=np.arange(1000, 1500),
+    )
+    df["E"] = df.A / 7
+    df["F"] = pd.date_range("2020-01-01", periods=len(df), freq="h")
+
+    pd.testing.assert_frame_equal(
+        df.apply(lambda x: x),
+        df.mapply(lambda x: x),
+    )
+    pd.testing.assert_series_equal(
+        df.apply(lambda x: x.A + x.E, axis=1),
+        df.mapply(lambda x: x.A + x.E, axis=1),
+    )
+    pd.testing.assert_series_equal(
+        df.A.apply(lambda x: x**2),
+        df.A.mapply(lambda x: x**2),
+    )
+    pd.testing.assert_series_equal(
+        df[list("ABCDE")].apply(np.sum, raw=True, axis=1),
+        df[list("ABCDE")].mapply(np.sum, raw=True, axis=1),
+    )
+    # window groupby shares obj once, workers take their groups
+    pd.testing.assert_frame_equal(
+        df.groupby(df.A % 7)[["E", "F"]].rolling("3h", on="F").apply(np.sum),
+        df.groupby(df.A % 7)[["E", "F"]].rolling("3h", on="F").mapply(np.sum),
+    )
+
+    # non-numeric data falls back to pickling
+    df["G"] = df.A.astype(str)
+    pd.testing.assert_frame_equal(
+        df.apply(lambda x: x),
+        df.mapply(lambda x: x),
+    )
+
+    with pytest.raises(ValueError, match="Unknown transport"):
+        df.mapply(lambda x: x, transport="carrier pigeon")
+
+
+def test_adaptive_chunk_size_mapply(monkeypatch):
+    """Assert chunk_size="auto" behaviour is equivalent."""
+    monkeypatch.setattr("mapply.mapply.N_CORES", 2)
+    mapply.init(progressbar=False, chunk_size="auto", n_workers=2)
+
+    np.random.seed(1)  # noqa: NPY002
+    df = pd.DataFrame(
+        np.random.randint(0, 300, size=(3000, 4)),  # noqa: NPY002
+        columns=list("ABCD"),
+    )
+
+    pd.testing.assert_series_equal(
+        df.apply(lambda x: x.A + x.B, axis=1),
+        df.mapply(lambda x: x.A + x.B, axis=1),
+    )
+    pd.testing.assert_series_equal(
+        df.A.apply(lambda x: x**2),
+        df.A.mapply(lambda x: x**2),
+    )
+    pd.testing.assert_frame_equal(
+        df.apply(lambda x: x**2),
+        df.mapply(lambda x: x**2),
+    )
+
+    # serial
+    mapply.init(progressbar=False, chunk_size="auto", n_workers=1)
+    pd.testing.assert_frame_equal(
+        df.apply(lambda x: x**2),
+        df.mapply(lambda x: x**2),
+    )
+
+    # guided self-scheduling shrinks chunks towards the tail
+    start, stop = 100, 10_000
+    bounds = adaptive_bounds(start, stop, n_workers=4, seconds_per_row=0.001)
+    sizes = [stop - start for start, stop in bounds]
+    assert bounds[0][0] == start
+    assert bounds[-1][1] == stop
+    assert sizes[0] == 200  # noqa: PLR2004
+    assert sizes == sorted(sizes, reverse=True)
+    assert sizes[-1] == 25  # noqa: PLR2004
+    assert adaptive_bounds(0, 10, n_workers=4, seconds_per_row=0) == [(0, 10)]
+
+
+def test_batch_mapply(monkeypatch):
+    """Assert batch behaviour is equivalent to (vectorized) apply."""
+    monkeypatch.setattr("mapply.mapply.N_CORES", 2)
+    mapply.init(progressbar=False, chunk_size=1, n_workers=2, batch=True)
+
+    np.random.seed(1)  # noqa: NPY002
+    df = pd.DataFrame(
+        np.random.randint(0, 300, size=(500, 4)),  # noqa: NPY002
+        columns=list("ABCD"),
+    )
+
+    # elementwise
+    pd.testing.assert_frame_equal(
+        df.apply(lambda x: x**2),
+        df.mapply(lambda x: x**2),
+    )
+    pd.testing.assert_frame_equal(
+        df.apply(lambda x: x**2),
+        df.mapply(np.square, raw=True),
+    )
+    pd.testing.assert_series_equal(
+        df.A.apply(lambda x: x**2),
+        df.A.mapply(np.square, raw=True),
+    )
+    # one value per column/row
+    pd.testing.assert_series_equal(
+        df.apply(np.sum),
+        df.mapply(lambda x: x.sum(axis=0), raw=True, axis=0),
+    )
+    pd.testing.assert_series_equal(
+        df.apply(np.sum, axis=1),
+        df.mapply(lambda x, power: (x**power).sum(axis=1), axis=1, args=(1,)),
+    )
+    pd.testing.assert_series_equal(
+        df.apply(np.sum, axis=1),
+        df.mapply(np.sum, raw=True, axis=1, args=(1,)),
+    )
+
+    with pytest.raises(ValueError, match="Batch func returned an array of shape"):
+        df.mapply(np.sum, raw=True, axis=1)
+
+
+def test_stream():
+    """Assert stream behaviour is equivalent to apply on the concatenated chunks."""
+    np.random.seed(1)  # noqa: NPY002
+    df = pd.DataFrame(
+        np.random.randint(0, 300, size=(1000, 4)),  # noqa: NPY002
+        columns=list("ABCD"),
+    )
+    reader = pd.read_csv(io.StringIO(df.to_csv(index=False)), chunksize=100)
+
+    pd.testing.assert_series_equal(
+        df.apply(lambda x: x.A + x.B, axis=1),
+        pd.concat(
+            mapply.stream(
+                reader,
+                lambda x: x.A + x.B,
+                axis="columns",
+                n_workers=2,
+                progressbar=False,
+            ),
+        ),
+    )
+
+    chunks = (df.A.iloc[i : i + 100] for i in range(0, len(df), 100))
+    pd.testing.assert_series_equal(
+        df.A.apply(lambda x: x**2),
+        pd.concat(
+            mapply.stream(
+                chunks,
+                np.square,
+                n_workers=2,
+                progressbar=False,
+                batch=True,
+                ordered=False,
+                max_in_flight=2,
+            ),
+        ).sort_index(),
+    )
+
+
+def test_unordered_mapply(monkeypatch):
+    """Assert ordered=False behaviour is equivalent."""
+    monkeypatch.setattr("mapply.mapply.N_CORES", 2)
+
+    np.random.seed(1)  # noqa: NPY002
+    df = pd.DataFrame(
+        np.random.randint(0, 300, size=(500, 4)),  # noqa: NPY002
+        columns=list("ABCD"),
+    )
+
+    def slow_head(x):
+        if x.name == 0:
+            time.sleep(0.2)
+        return x.A + x.B
+
+    for transport in ("pickle", "shared_memory"):
+        mapply.init(
+            progressbar=False,
+            chunk_size=1,
+            n_workers=2,
+            ordered=False,
+            transport=transport,
+        )
+        pd.testing.assert_series_equal(
+            df.apply(slow_head, axis=1),
+            df.mapply(slow_head, axis=1),
+        )
+        pd.testing.assert_frame_equal(
+            df.apply(lambda x: x**2),
+            df.mapply(lambda x: x**2),
+        )
+
+
+def test_stats_mapply(monkeypatch):
+    """Assert stats are populated without changing results."""
+    monkeypatch.setattr("mapply.mapply.N_CORES", 2)
+
+    df = pd.DataFrame({"A": list(range(1000)), "B": list(range(1000))})
+
+    stats = mapply.MapplyStats()
+    pd.testing.assert_series_equal(
+        df.A.apply(lambda x: x**2),
+        mapply.mapply.mapply(
+            df.A,
+            lambda x: x**2,
+            chunk_size=1,
+            n_workers=2,
+            progressbar=False,
+            stats=stats,
+        ),
+    )
+    assert stats.n_workers == 2  # noqa: PLR2004
+    assert len(stats.chunks) == 16  # noqa: PLR2004
+    assert os.getpid() not in {chunk.pid for chunk in stats.chunks}
+    assert all(chunk.input_bytes > 0 for chunk in stats.chunks)
+    assert all(chunk.received >= chunk.finished for chunk in stats.chunks)
+    assert stats.wall_seconds > 0
+    assert stats.pool_startup_seconds > 0
+    assert 0 < stats.parallel_efficiency <= 1
+    assert stats.straggler_ratio >= 1
+    assert "parallel efficiency" in stats.summary()
+
+    # groupby passes stats through to its imap
+    stats = mapply.MapplyStats()
+    mapply.mapply.mapply(
+        df.groupby(df.A % 4),
+        lambda x: x.sum(),
+        n_workers=2,
+        progressbar=False,
+        stats=stats,
+    )
+    assert len(stats.chunks) == 4  # noqa: PLR2004
+
+
+def test_auto_n_workers_mapply(monkeypatch):
+    """Assert n_workers="auto" only goes multi-core when it pays off."""
+    monkeypatch.setattr("mapply.mapply.N_CORES", 2)
+
+    series = pd.Series(range(1000))
+
+    def measuring(compute, serialize):
+        # pilot for real, but report fixed costs per row instead of noisy timings
+        def pilot(*args, **kwargs):
+            results, stop, _, _ = run_pilot(*args, **kwargs)
+            return results, stop, compute, serialize
+
+        return pilot
+
+    for compute, n_workers in ((1e-7, 1), (2e-3, 2)):
+        monkeypatch.setattr("mapply.mapply.run_pilot", measuring(compute, 1e-6))
+        for chunk_size in (1, "auto"):
+            stats = mapply.MapplyStats()
+            pd.testing.assert_series_equal(
+                series.apply(lambda x: x + 1),
+                mapply.mapply.mapply(
+                    series,
+                    lambda x: x + 1,
+                    n_workers="auto",
+                    chunk_size=chunk_size,
+                    progressbar=False,
+                    stats=stats,
+                ),
+            )
+            assert stats.n_workers == n_workers
+
+    # engine="auto" picks threads only if func was measured to run concurrently
+    monkeypatch.setattr("mapply.mapply.N_THREADS", 2)
+    monkeypatch.setattr("mapply.mapply.run_pilot", measuring(2e-3, 1e-6))
+
+    def threading(speedup):
+        def pilot(*args, **kwargs):
+            results, stop, _ = run_threaded_pilot(*args, **kwargs)
+            return results, stop, speedup
+
+        return pilot
+
+    for speedup, in_threads in ((2.0, True), (1.0, False)):
+        monkeypatch.setattr("mapply.mapply.run_threaded_pilot", threading(speedup))
+        stats = mapply.MapplyStats()
+        pids = mapply.mapply.mapply(
+            series,
+            lambda _: os.getpid(),
+            n_workers="auto",
+            progressbar=False,
+            stats=stats,
+        )
+        assert stats.n_workers == 2  # noqa: PLR2004
+        assert (set(pids) == {os.getpid()}) == in_threads
+
+    # measured serialization excludes the fixed cost per chunk, and isn't noise
+    _, stop, _, serialize = run_pilot(lambda x: x + 1, series, 0)
+    assert stop > 0
+    assert 0 <= serialize < 1e-4  # noqa: PLR2004
+
+
+def test_thread_engine_mapply(monkeypatch):
+    """Assert engine="threads" is equivalent, and runs in this process."""
+    monkeypatch.setattr("mapply.mapply.N_THREADS", 2)
+
+    np.random.seed(1)  # noqa: NPY002
+    df = pd.DataFrame(
+        np.random.randint(0, 300, size=(1000, 4)),  # noqa: NPY002
+        columns=list("ABCD"),
+    )
+
+    mapply.init(progressbar=False, chunk_size=1, n_workers=2, engine="threads")
+    pd.testing.assert_series_equal(
+        df.apply(lambda x: x.A + x.B, axis=1),
+        df.mapply(lambda x: x.A + x.B, axis=1),
+    )
+    pd.testing.assert_frame_equal(
+        df.groupby("A").apply(lambda x: x.sum()),
+        df.groupby("A").mapply(lambda x: x.sum()),
+    )
+    pd.testing.assert_series_equal(
+        df.groupby("A").B.rolling(3).apply(np.sum, raw=True),
+        df.groupby("A").B.rolling(3).mapply(np.sum, raw=True),
+    )
+
+    stats = mapply.MapplyStats()
+    pd.testing.assert_series_equal(
+        df.A.apply(lambda x: x**2),
+        df.A.mapply(lambda x: x**2, chunk_size="auto", stats=stats),
+    )
+    assert {chunk.pid for chunk in stats.chunks} == {os.getpid()}
+    assert not any(chunk.input_bytes for chunk in stats.chunks)
+
+    with pytest.raises(ValueError, match="Unknown engine"):
+        df.mapply(lambda x: x, engine="fibers")
+
+
+def test_skewed_groupby_mapply(monkeypatch):
+    """Assert cost-balanced group batches are equivalent, and scheduled largest first."""
+    monkeypatch.setattr("mapply.mapply.N_CORES", 2)
+    mapply.init(progressbar=False, n_workers=2, max_chunks_per_worker=2)
+
+    np.random.seed(1)  # noqa: NPY002
+    # one key holds a third of the rows
+    keys = np.concatenate([np.zeros(1000), np.random.randint(1, 200, 2000)])  # noqa: NPY002
+    df = pd.DataFrame({"k": keys, "v": np.arange(3000)}).sample(frac=1, random_state=1)
+
+    pd.testing.assert_series_equal(
+        df.groupby("k").apply(lambda x: x.v.sum()),
+        df.groupby("k").mapply(lambda x: x.v.sum(), group_cost=lambda n: n**2),
+    )
+    pd.testing.assert_series_equal(
+        df.groupby("k").v.rolling(3).apply(np.sum, raw=True),
+        df.groupby("k").v.rolling(3).mapply(np.sum, raw=True),
+    )
+
+    bounds = balanced_bounds([1, 1, 1, 90, 1, 1, 1, 1], 4)
+    assert bounds[0] == (3, 4)
+    assert sorted(bounds) == [(0, 3), (3, 4), (4, 6), (6, 8)]
+    assert balanced_bounds([], 4) == []
+    assert balanced_bounds([0, 0, 0], 2) == [(0, 2), (2, 3)]
+
+
+def test_batched_groupby_mapply(monkeypatch):
+    """Assert batching many groups per task is equivalent, for any kind of result."""
+    monkeypatch.setattr("mapply.mapply.N_CORES", 2)
+
+    np.random.seed(2)  # noqa: NPY002
+    df = pd.DataFrame(
+        {
+            "k": np.random.randint(0, 300, 3000),  # noqa: NPY002
+            "v": np.arange(3000),
+            "w": np.random.rand(3000),  # noqa: NPY002
+        },
+    )
+
+    def check(grouped, func):
+        stats = mapply.MapplyStats()
+        result = mapply.mapply.mapply(
+            grouped,
+            func,
+            n_workers=2,
+            max_chunks_per_worker=3,
+            progressbar=False,
+            stats=stats,
+        )
+        # several groups per task, in several tasks
+        assert 2 < len(stats.chunks) < 300  # noqa: PLR2004
+        expected = grouped.apply(func)
+        if isinstance(expected, pd.DataFrame):
+            pd.testing.assert_frame_equal(expected, result)
+        else:
+            pd.testing.assert_series_equal(expected, result)
+
+    with mapply.Pool(n_workers=2):
+        grouped = df.groupby("k")
+        for func in (
+            lambda x: x.v.sum(),  # scalar per group
+            lambda x: x.sum(),  # Series per group
+            lambda x: x,  # the group unchanged
+            lambda x: x * 2,  # like-indexed (transform-like)
+            lambda x: x.head(2),  # filter-like
+        ):
+            check(grouped, func)
+        check(grouped.w, lambda x: x)
+        # like-indexed results aren't prefixed with the group keys
+        check(df.groupby("k", group_keys=False), lambda x: x)
+        check(df.groupby("k", group_keys=False).w, lambda x: x * 2)
+
+
+def test_window_engine_mapply(monkeypatch):
+    """Assert pandas engines are passed on, and func is unpickled once per worker."""
+    monkeypatch.setattr("mapply.mapply.N_CORES", 2)
+    mapply.init(progressbar=False, n_workers=2)
+
+    df = pd.DataFrame({"k": np.arange(1000) % 9, "v": np.arange(1000.0)})
+    pd.testing.assert_series_equal(
+        df.groupby("k").v.rolling(4).apply(np.sum, raw=True, engine="cython"),
+        df.groupby("k").v.rolling(4).mapply(np.sum, raw=True, engine="cython"),
+    )
+
+    # also as the default engine of a persistent pool
+    mapply.init(progressbar=False, n_workers=2, engine="cython", persistent_pool=True)
+    pd.testing.assert_series_equal(
+        df.groupby("k").v.rolling(4).apply(np.sum, raw=True, engine="cython"),
+        df.groupby("k").v.rolling(4).mapply(np.sum, raw=True),
+    )
+    mapply.init(progressbar=False, n_workers=2)
+
+    payload = dill.dumps(np.sum)
+    assert _load_func(payload) is _load_func(payload)
+
+    # fresh workers compile func after initializer, before their first task
+    monkeypatch.setattr("mapply._window_groupby.COMPILING_ENGINES", ("cython",))
+    pd.testing.assert_series_equal(
+        df.groupby("k").v.rolling(4).apply(np.sum, raw=True, engine="cython"),
+        df.groupby("k")
+        .v.rolling(4)
+        .mapply(
+            np.sum,
+            raw=True,
+            engine="cython",
+            initializer=load_offset,
+            initargs=(1,),
+        ),
+    )
+    _load_func.cache_clear()
+    _warm_up(
+        lambda task: _load_func(payload)(task[0]),
+        (df.v.head(WARM_UP_ROWS), None, None, None),
+        load_offset,
+        (1,),
+    )
+    assert mapply.worker_state()["offset"] == 1
+    assert _load_func.cache_info().currsize == 1
+
+
+def test_cache_mapply(monkeypatch, tmp_path):
+    """Assert cached chunks are reused, and only changed chunks are recomputed."""
+    monkeypatch.setattr("mapply.mapply.N_CORES", 2)
+
+    df = pd.DataFrame({"A": list(range(2000)), "B": [i % 7 for i in range(2000)]})
+    cache = mapply.ChunkCache(tmp_path)
+
+    def square(x):
+        return x**2
+
+    def cube(x):
+        return x**3
+
+    def run(obj, func, **kwargs):
+        stats = mapply.MapplyStats()
+        result = mapply.mapply.mapply(
+            obj,
+            func,
+            n_workers=2,
+            progressbar=False,
+            cache=cache,
+            stats=stats,
+            **kwargs,
+        )
+        return result, len(stats.chunks)
+
+    expected = df.A.apply(square)
+    result, n_computed = run(df.A, square)
+    pd.testing.assert_series_equal(expected, result)
+    assert n_computed > 1
+    result, n_computed = run(df.A, square)
+    pd.testing.assert_series_equal(expected, result)
+    assert n_computed == 0
+    # another func doesn't hit
+    assert run(df.A, cube)[1] > 1
+
+    changed = df.copy()
+    changed.loc[1000, "A"] = -1
+    result, n_computed = run(changed.A, square)
+    pd.testing.assert_series_equal(changed.A.apply(square), result)
+    assert n_computed == 1
+
+    # broadcast handles are keyed by content, not by their token
+    mapping = {x: -x for x in range(2000)}
+    result, n_computed = run(df.A, lookup, args=(mapply.broadcast(mapping),))
+    pd.testing.assert_series_equal(-df.A, result)
+    assert n_computed > 1
+    handle = mapply.broadcast(dict(mapping))
+    result, n_computed = run(df.A, lookup, args=(handle,))
+    pd.testing.assert_series_equal(-df.A, result)
+    assert n_computed == 0
+    # nothing was sent, so nothing was written
+    assert not os.path.exists(handle.path)  # noqa: PTH110
+
+    for axis in (0, 1):
+        expected = df.apply(sum, axis=axis)
+        for _ in range(2):
+            result, n_computed = run(df, sum, axis=axis)
+            pd.testing.assert_series_equal(expected, result)
+        assert n_computed == 0
+
+    grouped = df.groupby("B")
+    expected = grouped.apply(lambda x: x.A.sum())
+    for _ in range(2):
+        result, n_computed = run(grouped, lambda x: x.A.sum())
+        pd.testing.assert_series_equal(expected, result)
+    assert n_computed == 0
+
+    windowed = df.groupby("B").rolling(3)
+    expected = windowed.apply(np.sum, raw=True)
+    for _ in range(2):
+        result, n_computed = run(windowed, np.sum, raw=True)
+        pd.testing.assert_frame_equal(expected, result)
+    assert n_computed == 0
+
+    # least recently used results are evicted
+    cache.max_bytes = 0
+    run(df.A, lambda x: x**4)
+    assert not list(tmp_path.iterdir())
+
+
+def test_amapply(monkeypatch):
+    """Assert amapply is equivalent to mapply, also when gathered concurrently."""
+    monkeypatch.setattr("mapply.mapply.N_CORES", 2)
+
+    df = pd.DataFrame({"A": list(range(1000)), "B": list(range(1000))})
+
+    async def main():
+        with mapply.Pool(n_workers=2):
+            results = await asyncio.gather(
+                mapply.amapply(df, lambda x: x.A + x.B, axis=1, n_workers=2),
+                mapply.amapply(df.A, lambda x: x**2, n_workers=2, chunk_size=1),
+                mapply.amapply(df, sum, n_workers=2, chunk_size="auto", ordered=False),
+                mapply.amapply(df.groupby(df.A % 4), lambda x: x.sum(), n_workers=2),
+            )
+        pd.testing.assert_series_equal(
+            df.apply(lambda x: x.A + x.B, axis=1),
+            results[0],
+        )
+        pd.testing.assert_series_equal(df.A.apply(lambda x: x**2), results[1])
+        pd.testing.assert_series_equal(df.apply(sum), results[2])
+        pd.testing.assert_frame_equal(df.groupby(df.A % 4).sum(), results[3])
+
+        with pytest.raises(ValueError, match="not allowed"):
+            await mapply.amapply(df.A, sum, axis=1)
+
+    asyncio.run(main())
+
+
+@pytest.mark.skipif(
+    "fork" not in multiprocess.get_all_start_methods(),
+    reason="requires the fork start method",
+)
+def test_fork_transport_mapply(monkeypatch):
+    """Assert the fork transport is equivalent, and only sends positions."""
+    monkeypatch.setattr("mapply.mapply.N_CORES", 2)
+    monkeypatch.setattr("mapply.parallel.CONTEXT", multiprocess.get_context("fork"))
+
+    np.random.seed(1)  # noqa: NPY002
+    df = pd.DataFrame(
+        np.random.randint(0, 300, size=(1000, 64)),  # noqa: NPY002
+    )
+    df["key"] = df[0] % 10
+
+    mapply.init(progressbar=False, chunk_size=1, n_workers=2, transport="fork")
+    stats = mapply.MapplyStats()
+    pd.testing.assert_series_equal(
+        df.apply(lambda x: x.iloc[0] + x.iloc[-2], axis=1),
+        df.mapply(lambda x: x.iloc[0] + x.iloc[-2], axis=1, stats=stats),
+    )
+    # tasks only carry a token and positions
+    assert all(chunk.input_bytes < 1_000 for chunk in stats.chunks)  # noqa: PLR2004
+    pd.testing.assert_frame_equal(
+        df[[0, 1, "key"]].groupby("key").rolling(3).apply(np.sum, raw=True),
+        df[[0, 1, "key"]].groupby("key").rolling(3).mapply(np.sum, raw=True),
+    )
+
+    # workers of a persistent pool predate the input, fall back to pickle
+    with mapply.Pool(n_workers=2):
+        stats = mapply.MapplyStats()
+        pd.testing.assert_series_equal(
+            df.apply(sum, axis=1),
+            df.mapply(sum, axis=1, stats=stats),
+        )
+        assert all(chunk.input_bytes > 1_000 for chunk in stats.chunks)  # noqa: PLR2004
+
+
+def test_assembled_mapply(monkeypatch):
+    """Assert results are assembled equivalently, with and without preallocation."""
+    monkeypatch.setattr("mapply.mapply.N_CORES", 2)
+
+    df = pd.DataFrame(
+        {"A": list(range(1000)), "B": [str(i) for i in range(1000)]},
+        index=pd.date_range("2024-01-01", periods=1000, freq="h"),
+    )
+    mapply.init(progressbar=False, chunk_size=1, n_workers=2, ordered=False)
+
+    # scalar results are written into place, under the original index
+    result = df.A.mapply(lambda x: x / 2)
+    pd.testing.assert_series_equal(df.A.apply(lambda x: x / 2), result)
+    assert np.shares_memory(result.index.asi8, df.index.asi8)
+    pd.testing.assert_series_equal(
+        df.mapply(lambda x: x.A * 2, axis=1),
+        df.apply(lambda x: x.A * 2, axis=1),
+    )
+
+    # differing dtypes, extension dtypes and frames are concatenated
+    for func in (
+        lambda x: x if x < 500 else x / 2,  # noqa: PLR2004
+        lambda x: pd.NA if x < 500 else x,  # noqa: PLR2004
+    ):
+        pd.testing.assert_series_equal(df.A.apply(func), df.A.mapply(func))
+    pd.testing.assert_frame_equal(
+        df.A.apply(lambda x: pd.Series([x, x])),
+        df.A.mapply(lambda x: pd.Series([x, x])),
+    )
+    pd.testing.assert_series_equal(df.B.apply(len), df.B.mapply(len))
+    pd.testing.assert_series_equal(
+        df.B.astype("string").apply(str.upper),
+        df.B.astype("string").mapply(str.upper),
+    )
+
+
+def load_offset(offset):  # noqa: D103
+    mapply.worker_state()["offset"] = offset
+
+
+def add_offset(x):  # noqa: D103
+    return x + mapply.worker_state()["offset"]
+
+
+def test_initializer_mapply(monkeypatch):
+    """Assert func can look up what the initializer loaded, also when piloting."""
+    monkeypatch.setattr("mapply.mapply.N_CORES", 2)
+
+    df = pd.DataFrame({"A": list(range(1000))})
+    expected = df.A + 10
+    for chunk_size in (1, "auto"):
+        mapply.init(
+            progressbar=False,
+            chunk_size=chunk_size,
+            n_workers=2,
+            initializer=load_offset,
+            initargs=(10,),
+        )
+        pd.testing.assert_series_equal(expected, df.A.mapply(add_offset))
+    pd.testing.assert_series_equal(
+        expected,
+        df.groupby(df.A % 3)
+        .A.mapply(lambda s: s.apply(add_offset))
+        .droplevel(0)
+        .sort_index(),
+    )
+
+    mapply.init(
+        progressbar=False,
+        n_workers=2,
+        persistent_pool=True,
+        initializer=load_offset,
+        initargs=(10,),
+    )
+    pd.testing.assert_series_equal(expected, df.A.mapply(add_offset))
+    mapply.shutdown()
+
+
+def lookup(x, mapping, offset=0):  # noqa: D103
+    return mapping[x] + offset
+
+
+def test_broadcast_mapply(monkeypatch):
+    """Assert broadcast arguments are resolved in the workers, from file or memory."""
+    monkeypatch.setattr("mapply.mapply.N_CORES", 2)
+
+    df = pd.DataFrame({"A": list(range(1000))})
+    mapping = pd.Series(np.arange(1000) * 2)
+    expected = df.A.apply(lookup, args=(mapping,))
+    mapply.init(progressbar=False, chunk_size=1, n_workers=2)
+
+    with mapply.Pool(n_workers=2) as pool:
+        # workers started before the handle was created load it from file
+        pd.testing.assert_series_equal(expected, df.A.mapply(lookup, args=(mapping,)))
+        assert pool._pool is not None  # noqa: SLF001
+        with mapply.broadcast(mapping) as handle:
+            # only the location is pickled
+            assert len(dill.dumps(handle)) < 1000  # noqa: PLR2004
+            pd.testing.assert_series_equal(
+                expected,
+                df.A.mapply(lookup, args=(handle,)),
+            )
+            pd.testing.assert_series_equal(
+                expected + 1,
+                df.A.mapply(lookup, mapping=handle, offset=1),
+            )
+            # arrays are memory-mapped read-only
+            loaded = _load(handle.token, handle.path)
+            pd.testing.assert_series_equal(mapping, loaded)
+            assert not loaded.to_numpy().flags.writeable
+            # the digest is only computed for cache keys
+            assert "digest" not in handle.__dict__
+        assert not os.path.exists(handle.path)  # noqa: PTH110
+        with pytest.raises(ValueError, match="closed"):
+            handle.value  # noqa: B018
+        # also if it was never pickled
+        handle = mapply.broadcast(mapping)
+        handle.close()
+        with pytest.raises(ValueError, match="closed"):
+            dill.dumps(handle)
+
+    # fresh (forked) workers and threads find the object in memory
+    with mapply.broadcast(mapping) as handle:
+        for engine in ("processes", "threads"):
+            pd.testing.assert_series_equal(
+                expected,
+                df.A.mapply(lookup, args=(handle,), engine=engine),
+            )
+        pd.testing.assert_series_equal(
+            df.groupby(df.A % 3).A.apply(lambda s, m: s.map(m), handle.value),
+            df.groupby(df.A % 3).A.mapply(lambda s, m: s.map(m), args=(handle,)),
+        )
+
+
+def test_cluster_mapply():
+    """Assert a cluster of local worker servers processes (window) groupby chunks too."""
+    df = pd.DataFrame({"A": list(range(1000)), "B": [i % 7 for i in range(1000)]})
+    mapping = pd.Series(np.arange(1000) * 2)
+    mapply.init(progressbar=False, chunk_size=1)
+
+    with local_cluster(n_nodes=2, n_workers=1):
+        for transport in mapply.mapply.TRANSPORTS:
+            # shared_memory and fork fall back to pickle
+            pd.testing.assert_series_equal(
+                df.apply(lambda row: row.A + row.B, axis=1),
+                df.mapply(lambda row: row.A + row.B, axis=1, transport=transport),
+            )
+        pd.testing.assert_series_equal(
+            df.groupby("B").A.apply(lambda s: s.sum()),
+            df.groupby("B").A.mapply(lambda s: s.sum()),
+        )
+        pd.testing.assert_frame_equal(
+            df.groupby("B").rolling(3).apply(np.sum, raw=True),
+            df.groupby("B").rolling(3).mapply(np.sum, raw=True),
+        )
+        # workers can't read the broadcast file, so the object is pickled along
+        with mapply.broadcast(mapping) as handle:
+            assert len(dill.dumps(handle)) > mapping.nbytes
+            pd.testing.assert_series_equal(
+                df.A.apply(lookup, args=(mapping,)),
+                df.A.mapply(lookup, args=(handle,)),
+            )
+
+
+def test_memory_capped_mapply(monkeypatch, caplog):
+    """Assert n_workers is lowered when their chunks don't fit in memory together."""
+    monkeypatch.setattr("mapply.mapply.N_CORES", 2)
+
+    df = pd.DataFrame({"A": list(range(1000))})
+    for memory_bytes, max_memory, n_workers in (
+        (str(1 << 40), None, 2),
+        ("1000", None, 1),
+        (str(1 << 40), 0.5, 2),
+        (str(1 << 40), 1000, 1),
+    ):
+        monkeypatch.setenv("MAPPLY_MEMORY_BYTES", memory_bytes)
+        stats = mapply.MapplyStats()
+        pd.testing.assert_frame_equal(
+            df.apply(lambda x: x + 1),
+            mapply.mapply.mapply(
+                df,
+                lambda x: x + 1,
+                axis=1,
+                n_workers=2,
+                chunk_size=1,
+                progressbar=False,
+                stats=stats,
+                max_memory=max_memory,
+            ),
+        )
+        assert stats.n_workers == n_workers
+    assert "fit in memory" in caplog.text
+
+
+def flaky(x, marker, *, die=False):  # noqa: D103
+    # fails for one row, until marker exists
+    if x == 1234 and not os.path.exists(marker):  # noqa: PLR2004, PTH110
+        if die:
+            open(marker, "w").close()  # noqa: PTH123
+            os.kill(os.getpid(), signal.SIGKILL)
+        raise ValueError(x)
+    return x + 1
+
+
+def test_retries_mapply(monkeypatch, tmp_path):
+    """Assert failed chunks are retried (split) and checkpointed to the cache."""
+    monkeypatch.setattr("mapply.mapply.N_CORES", 2)
+    monkeypatch.setattr("mapply.mapply.RETRY_BACKOFF_SECONDS", 0)
+
+    df = pd.DataFrame({"A": list(range(2000))})
+    expected = df.A + 1
+
+    def run(**kwargs):
+        stats = mapply.MapplyStats()
+        result = mapply.mapply.mapply(
+            df.A,
+            flaky,
+            n_workers=2,
+            progressbar=False,
+            stats=stats,
+            **kwargs,
+        )
+        return result, len(stats.chunks)
+
+    # a killed worker loses its chunks, which are retried (in pieces)
+    for i, split_failed in enumerate((False, True)):
+        marker = str(tmp_path / f"died-{i}")
+        result, _ = run(marker=marker, die=True, retries=1, split_failed=split_failed)
+        pd.testing.assert_series_equal(expected, result)
+        assert os.path.exists(marker)  # noqa: PTH110
+
+    marker = str(tmp_path / "fixed")
+    with pytest.raises(ValueError, match="1234") as excinfo:
+        run(marker=marker, retries=8, split_failed=True)
+    assert "positions 1234:1235" in excinfo.value.__notes__[0]
+
+    # the chunks that succeeded are stored before raising
+    cache = mapply.ChunkCache(tmp_path / "cache")
+    with pytest.raises(ValueError, match="1234"):
+        run(marker=marker, cache=cache)
+    open(marker, "w").close()  # noqa: PTH123
+    result, n_computed = run(marker=marker, cache=cache)
+    pd.testing.assert_series_equal(expected, result)
+    assert n_computed == 1
@@ -30,9 +30,22 @@
 # OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
 #
 # SPDX-License-Identifier: BSD-3-Clause
+import asyncio
+import os
+import signal
+import subprocess
+import sys
+import threading
+import time
+from functools import partial
+from uuid import uuid4
+
 import pytest
 
-from mapply.parallel import multiprocessing_imap
+import mapply
+from mapply import _resources, cluster, parallel
+from mapply.cluster import local_cluster
+from mapply.parallel import Pool, async_imap, multiprocessing_imap, worker_state
 
 
 def foo(x, power):  # noqa: D103
@@ -96,3 +109,588 @@ def test_multiprocessing_imap(size=100, power=1.1):  # noqa:D103,PT028
                 n_workers=1,
             ),
         )
+
+
+def test_persistent_pool(size=100, power=1.1):  # noqa:PT028
+    """Assert a persistent Pool is reused across calls, and survives errors."""
+    expected = [foo(x, power=power) for x in range(size)]
+
+    with Pool(n_workers=2) as pool:
+        assert parallel._PERSISTENT_POOLS.get("processes") is pool  # noqa: SLF001
+        for _ in range(2):
+            assert expected == list(
+                multiprocessing_imap(
+                    foo,
+                    range(size),
+                    power=power,
+                    progressbar=False,
+                    n_workers=2,
+                ),
+            )
+        underlying_pool = pool._pool  # noqa: SLF001
+        assert underlying_pool is not None
+        assert expected == list(
+            multiprocessing_imap(
+                foo,
+                range(size),
+                power=power,
+                progressbar=False,
+                n_workers=2,
+            ),
+        )
+        assert pool._pool is underlying_pool  # noqa: SLF001
+        # workers stay warm instead of being replaced every few tasks
+        results = multiprocessing_imap(
+            leak,
+            range(size),
+            size=1,
+            progressbar=False,
+            n_workers=2,
+        )
+        assert len({pid for _, pid in results}) <= 2  # noqa: PLR2004
+
+        with pytest.raises(ValueError, match="reraise"):
+            list(
+                multiprocessing_imap(
+                    foo,
+                    range(size),
+                    power=None,
+                    progressbar=False,
+                    n_workers=2,
+                ),
+            )
+        # restarted after termination
+        assert pool._pool is None  # noqa: SLF001
+        assert expected == list(
+            multiprocessing_imap(
+                foo,
+                range(size),
+                power=power,
+                progressbar=False,
+                n_workers=2,
+            ),
+        )
+
+    assert parallel._PERSISTENT_POOLS.get("processes") is None  # noqa: SLF001
+    assert pool._pool is None  # noqa: SLF001
+
+    mapply.init(progressbar=False, n_workers=2, persistent_pool=True)
+    assert parallel._PERSISTENT_POOLS.get("processes") is not None  # noqa: SLF001
+    mapply.init(progressbar=False)
+    assert parallel._PERSISTENT_POOLS.get("processes") is None  # noqa: SLF001
+    mapply.init(progressbar=False, n_workers=2, persistent_pool=True)
+    mapply.shutdown()
+    assert parallel._PERSISTENT_POOLS.get("processes") is None  # noqa: SLF001
+
+
+def test_multiprocessing_imap_backpressure(size=20, power=1.1):  # noqa:PT028
+    """Assert max_in_flight bounds consumption of the iterable, optionally unordered."""
+    expected = [foo(x, power=power) for x in range(size)]
+    pulled = []
+
+    def gen():
+        for i in range(size):
+            pulled.append(i)
+            yield i
+
+    stage = multiprocessing_imap(
+        foo,
+        gen(),
+        power=power,
+        progressbar=False,
+        n_workers=2,
+        max_in_flight=3,
+    )
+    assert next(stage) == expected[0]
+    assert len(pulled) <= 4  # noqa: PLR2004
+    assert [expected[0], *stage] == expected
+
+    for max_in_flight in (None, 3):
+        assert expected == sorted(
+            multiprocessing_imap(
+                foo,
+                range(size),
+                power=power,
+                progressbar=False,
+                n_workers=2,
+                ordered=False,
+                max_in_flight=max_in_flight,
+            ),
+        )
+
+    with pytest.raises(ValueError, match="reraise"):
+        list(
+            multiprocessing_imap(
+                foo,
+                range(size),
+                power=None,
+                progressbar=False,
+                n_workers=2,
+                max_in_flight=3,
+            ),
+        )
+
+
+def test_thread_engine(size=100, power=1.1):  # noqa:PT028
+    """Assert the threads engine yields the same results, with its own persistent pool."""
+    expected = [foo(x, power=power) for x in range(size)]
+
+    with pytest.raises(ValueError, match="Unknown engine"):
+        list(multiprocessing_imap(foo, range(size), power=power, engine="fibers"))
+
+    for ordered in (True, False):
+        assert expected == sorted(
+            multiprocessing_imap(
+                foo,
+                range(size),
+                power=power,
+                progressbar=False,
+                n_workers=2,
+                ordered=ordered,
+                engine="threads",
+            ),
+        )
+
+    with Pool(n_workers=2, engine="threads") as pool:
+        assert parallel._PERSISTENT_POOLS.get("threads") is pool  # noqa: SLF001
+        assert parallel._PERSISTENT_POOLS.get("processes") is None  # noqa: SLF001
+        assert expected == list(
+            multiprocessing_imap(
+                foo,
+                range(size),
+                power=power,
+                progressbar=False,
+                n_workers=2,
+                engine="threads",
+            ),
+        )
+        assert pool._pool is not None  # noqa: SLF001
+    assert parallel._PERSISTENT_POOLS.get("threads") is None  # noqa: SLF001
+
+
+def slow(x, delay=0.05):  # noqa: D103
+    time.sleep(delay)
+    return x
+
+
+def test_async_imap(size=10, power=1.1):  # noqa:PT028
+    """Assert async_imap yields the same results, shares a Pool fairly, and cancels."""
+    expected = [foo(x, power=power) for x in range(size)]
+
+    async def collect(func, items=range(size), n_workers=2, **kwargs):
+        return [
+            x
+            async for x in async_imap(
+                func,
+                items,
+                n_workers=n_workers,
+                **kwargs,
+            )
+        ]
+
+    pulled_by = set()
+
+    def pull():
+        for x in range(size):
+            pulled_by.add(threading.get_ident())
+            yield x
+
+    async def main():
+        for n_workers in (1, 2):
+            assert expected == await collect(foo, n_workers=n_workers, power=power)
+        # elements are pulled off the event loop
+        assert expected == await collect(foo, pull(), power=power)
+        assert threading.get_ident() not in pulled_by
+        # a killed worker fails the call instead of hanging it
+        with pytest.raises(ChildProcessError, match="killed"):
+            await asyncio.wait_for(collect(fail_or_die, range(4, size)), timeout=10)
+        assert expected == sorted(await collect(foo, power=power, ordered=False))
+        with pytest.raises(ValueError, match="reraise"):
+            await collect(foo, power=None)
+
+        with Pool(n_workers=2, engine="threads"):
+            # threads take tasks in the order they were submitted
+            started = []
+
+            def record(tag, x):
+                started.append(tag)
+                return slow(x, delay=0.01)
+
+            async def tagged(tag, n):
+                calls = async_imap(
+                    partial(record, tag),
+                    range(n),
+                    n_workers=2,
+                    engine="threads",
+                )
+                assert list(range(n)) == [x async for x in calls]
+
+            await asyncio.gather(tagged("long", 20), tagged("short", 2))
+            # the short call takes turns with the long call for the shared task slots
+            # (2 per worker), instead of being queued behind all of its tasks
+            assert started.index("short") <= 2 * 2 + 1
+
+        with Pool(n_workers=2):
+            task = asyncio.create_task(collect(slow))
+            await asyncio.sleep(0.1)
+            task.cancel()
+            with pytest.raises(asyncio.CancelledError):
+                await task
+            # the shared pool keeps serving
+            assert list(range(size)) == await collect(slow)
+            with pytest.raises(ChildProcessError, match="killed"):
+                await asyncio.wait_for(collect(fail_or_die, range(4, size)), timeout=10)
+            # and its task slots were released
+            assert list(range(size)) == await collect(slow)
+
+    asyncio.run(main())
+
+
+def load(power):  # noqa: D103
+    worker_state().update(power=power, token=uuid4().hex)
+
+
+def initialized(x):  # noqa: D103
+    state = worker_state()
+    return foo(x, state["power"]), os.getpid(), state["token"]
+
+
+def test_initializer(size=100, power=1.1):  # noqa:PT028
+    """Assert the initializer runs once per worker, for every kind of pool."""
+    expected = [foo(x, power=power) for x in range(size)]
+
+    def check(results):
+        assert expected == [result for result, _, _ in results]
+        tokens = {}
+        for _, pid, token in results:
+            tokens.setdefault(pid, set()).add(token)
+        # one initializer run per worker process (threads share a pid)
+        assert all(len(pid_tokens) <= 2 for pid_tokens in tokens.values())  # noqa: PLR2004
+        return tokens
+
+    for n_workers, engine in ((1, "processes"), (2, "processes"), (2, "threads")):
+        tokens = check(
+            list(
+                multiprocessing_imap(
+                    initialized,
+                    range(size),
+                    n_workers=n_workers,
+                    engine=engine,
+                    initializer=load,
+                    initargs=(power,),
+                ),
+            ),
+        )
+        if engine == "processes":
+            assert all(len(pid_tokens) == 1 for pid_tokens in tokens.values())
+
+    async def collect():
+        return [
+            x
+            async for x in async_imap(
+                initialized,
+                range(size),
+                n_workers=2,
+                initializer=load,
+                initargs=(power,),
+            )
+        ]
+
+    check(asyncio.run(collect()))
+
+    with Pool(
+        n_workers=2,
+        max_tasks_per_child=None,
+        initializer=load,
+        initargs=(power,),
+    ):
+        first = check(list(multiprocessing_imap(initialized, range(size), n_workers=2)))
+        # workers stay initialized across calls
+        second = check(
+            list(multiprocessing_imap(initialized, range(size), n_workers=2)),
+        )
+        assert first == second
+        # serially, the initializer of the pool runs in the calling process
+        check(list(multiprocessing_imap(initialized, range(size), n_workers=1)))
+        with pytest.raises(ValueError, match="another initializer"):
+            list(multiprocessing_imap(foo, range(size), initializer=print))
+
+
+def test_lazy_imports():
+    """Assert importing mapply defers heavy dependencies until they are needed."""
+    heavy = (
+        "asyncio",
+        "dill",
+        "mapply.cluster",
+        "multiprocess",
+        "numpy",
+        "pandas",
+        "pathos",
+        "psutil",
+        "tqdm",
+    )
+    code = f"""
+import sys
+import mapply
+import mapply.parallel
+loaded = {{name.split(".")[0] for name in sys.modules}} | set(sys.modules)
+print(sorted(set({heavy!r}) & loaded))
+mapply.parallel.N_CORES
+print("psutil" in sys.modules)
+"""
+    output = subprocess.check_output([sys.executable, "-c", code], text=True)  # noqa: S603
+    assert output.split("\n")[:2] == ["[]", "True"]
+    assert parallel.sensible_cpu_count() == mapply.parallel.N_CORES
+    with pytest.raises(AttributeError, match="FOO"):
+        parallel.FOO  # noqa: B018
+    assert mapply.Cluster is cluster.Cluster
+
+
+def server_pid(x, delay=0.0):  # noqa: D103
+    time.sleep(delay)
+    # workers are children of the server
+    return x, os.getppid()
+
+
+def test_cluster(size=20, power=1.1):  # noqa:PT028
+    """Assert a cluster processes all tasks, honors locality, and retries lost ones."""
+    expected = [foo(x, power=power) for x in range(size)]
+
+    with local_cluster(n_nodes=2, n_workers=1) as nodes:
+        assert nodes.n_workers == 2  # noqa: PLR2004
+        assert parallel.default_n_workers() == 2  # noqa: PLR2004
+        assert expected == list(
+            multiprocessing_imap(foo, range(size), power=power, progressbar=False),
+        )
+        assert expected == sorted(
+            multiprocessing_imap(
+                foo,
+                range(size),
+                power=power,
+                progressbar=False,
+                ordered=False,
+            ),
+        )
+
+        async def collect():
+            return [x async for x in async_imap(foo, range(size), power=power)]
+
+        assert expected == asyncio.run(collect())
+        with pytest.raises(ValueError, match="reraise"):
+            list(multiprocessing_imap(foo, range(size), power=None, progressbar=False))
+    assert parallel.remote_pool() is None
+
+    authkey = "secret"
+    servers = [cluster.spawn_server(authkey=authkey) for _ in range(2)]
+    (first, first_address), (second, _) = servers
+    try:
+        executor = cluster.ClusterExecutor(
+            [address for _, address in servers],
+            authkey=authkey,
+            locality=lambda _: first_address,
+        )
+        assert {executor.apipe(server_pid, x).get()[1] for x in range(4)} == {first.pid}
+
+        results = executor.imap(partial(server_pid, delay=0.05), range(size))
+        assert next(results) == (0, first.pid)
+        first.kill()
+        results = [(0, first.pid), *results]
+        assert [x for x, _ in results] == list(range(size))
+        assert results[-1][1] == second.pid
+        executor.clear()
+
+        with pytest.raises(ValueError, match="authkey"):
+            cluster.ClusterExecutor([first_address], authkey="")
+    finally:
+        for process, _ in servers:
+            process.kill()
+            process.wait()
+
+
+LEAKED = []
+
+
+def leak(x, size=1 << 20):  # noqa: D103
+    LEAKED.append(b"x" * size)
+    return x, os.getpid()
+
+
+def test_memory_budget(size=12):  # noqa:PT028
+    """Assert max_memory bounds consumption, and workers growing too much are recycled."""
+    import numpy as np
+
+    pulled = []
+
+    def gen():
+        for i in range(size):
+            pulled.append(i)
+            yield np.ones(1 << 17)  # 1 MB
+
+    # about two 1 MB chunks fit, see estimate_bytes and WORKER_MEMORY_FACTOR
+    stage = multiprocessing_imap(
+        len,
+        gen(),
+        progressbar=False,
+        n_workers=2,
+        max_memory=7e6,
+    )
+    assert next(stage) == 1 << 17
+    assert len(pulled) <= 4  # noqa: PLR2004
+    assert [1 << 17, *stage] == [1 << 17] * size
+
+    results = list(
+        multiprocessing_imap(
+            leak,
+            range(size),
+            progressbar=False,
+            n_workers=2,
+            max_worker_rss=1,
+        ),
+    )
+    assert [x for x, _ in results] == list(range(size))
+    # every task leaks, so workers are replaced after each round
+    assert len({pid for _, pid in results}) > 2  # noqa: PLR2004
+
+    with Pool(n_workers=2):
+        results = list(
+            multiprocessing_imap(
+                leak,
+                range(size),
+                progressbar=False,
+                n_workers=2,
+                max_worker_rss=1,
+            ),
+        )
+    assert [x for x, _ in results] == list(range(size))
+    assert len({pid for _, pid in results}) > 2  # noqa: PLR2004
+
+    assert parallel.resolve_max_memory(None) is None
+    assert parallel.resolve_max_memory(1e9) == 1e9  # noqa: PLR2004
+    assert 0 < parallel.resolve_max_memory(0.5) <= _resources.memory_budget()
+    with pytest.raises(ValueError, match="positive"):
+        parallel.resolve_max_memory(0)
+
+
+def fail_or_die(x):  # noqa: D103
+    if x == 3:  # noqa: PLR2004
+        raise ValueError(x)
+    if x == 5:  # noqa: PLR2004
+        # let the earlier elements' results arrive before dying
+        time.sleep(0.2)
+        os.kill(os.getpid(), signal.SIGKILL)
+    return x
+
+
+def test_return_exceptions(size=10):  # noqa:PT028
+    """Assert failed elements are yielded as errors, and killed workers don't hang."""
+    results = list(
+        multiprocessing_imap(
+            fail_or_die,
+            [x for x in range(size) if x != 5],  # noqa: PLR2004
+            progressbar=False,
+            n_workers=1,
+            return_exceptions=True,
+        ),
+    )
+    assert isinstance(results.pop(3), ValueError)
+    assert results == [x for x in range(size) if x not in {3, 5}]
+
+    results = list(
+        multiprocessing_imap(
+            fail_or_die,
+            range(size),
+            progressbar=False,
+            n_workers=2,
+            return_exceptions=True,
+        ),
+    )
+    assert len(results) == size
+    assert isinstance(results[3], ValueError)
+    # the element killing its worker fails, and so might the others in flight
+    assert isinstance(results[5], ChildProcessError)
+    for x, result in enumerate(results):
+        assert result == x or isinstance(result, Exception)
+
+    with pytest.raises(ChildProcessError, match="killed"):
+        list(
+            multiprocessing_imap(
+                fail_or_die,
+                range(4, size),
+                progressbar=False,
+                n_workers=2,
+                max_in_flight=4,
+            ),
+        )
+
+
+def write_files(root, files):  # noqa: D103
+    for name, content in files.items():
+        path = root / name
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(content)
+
+
+def test_cgroup_limits(monkeypatch, tmp_path):
+    """Assert the tightest cgroup (v1 and v2) CPU quota and memory limit are used."""
+    monkeypatch.setattr(_resources, "CGROUP_ROOT", tmp_path / "cgroup")
+    monkeypatch.setattr(_resources, "PROC_CGROUP", tmp_path / "proc")
+    monkeypatch.delenv("MAPPLY_MEMORY_BYTES", raising=False)
+    unlimited = str(1 << 62)
+
+    # v2, limited on the pod level
+    write_files(
+        tmp_path,
+        {
+            "proc": "0::/pod/container\n",
+            "cgroup/cpu.max": "max 100000",
+            "cgroup/pod/cpu.max": "400000 100000",
+            "cgroup/pod/memory.max": "1000000",
+            "cgroup/pod/memory.current": "400000",
+            "cgroup/pod/container/cpu.max": "max 100000",
+            "cgroup/pod/container/memory.max": "max",
+        },
+    )
+    assert _resources.cpu_quota() == 4  # noqa: PLR2004
+    assert _resources.cpu_budget() == min(4, len(os.sched_getaffinity(0)))
+    assert _resources.memory_budget() == 600000  # noqa: PLR2004
+    assert _resources.max_workers_for_memory(100000) == 2  # noqa: PLR2004
+    assert _resources.max_workers_for_memory(1e9) == 1
+
+    # v1, with a host path that doesn't exist in the container's namespace
+    write_files(
+        tmp_path,
+        {
+            "proc": "4:memory:/host/container\n3:cpu,cpuacct:/host/container\n",
+            "cgroup/cpu,cpuacct/cpu.cfs_quota_us": "150000",
+            "cgroup/cpu,cpuacct/cpu.cfs_period_us": "100000",
+            "cgroup/memory/memory.limit_in_bytes": unlimited,
+        },
+    )
+    assert _resources.cpu_quota() == 1.5  # noqa: PLR2004
+    assert _resources.cpu_budget() == min(2, len(os.sched_getaffinity(0)))
+    assert _resources.memory_budget() > 0
+    write_files(
+        tmp_path,
+        {
+            "cgroup/memory/memory.limit_in_bytes": "2000",
+            "cgroup/memory/memory.usage_in_bytes": "500",
+        },
+    )
+    assert _resources.memory_budget() == 1500  # noqa: PLR2004
+
+    # no cgroups at all
+    (tmp_path / "proc").unlink()
+    assert _resources.cpu_quota() is None
+
+    monkeypatch.setenv("MAPPLY_MEMORY_BYTES", "42")
+    assert _resources.memory_budget() == 42  # noqa: PLR2004
+    monkeypatch.setenv("MAPPLY_N_CORES", "3")
+    parallel.sensible_cpu_count.cache_clear()
+    parallel.logical_cpu_count.cache_clear()
+    try:
+        assert parallel.sensible_cpu_count() == 3  # noqa: PLR2004
+        # the thread engine is sized to the same budget
+        assert parallel.logical_cpu_count() == 3  # noqa: PLR2004
+    finally:
+        parallel.sensible_cpu_count.cache_clear()
+        parallel.logical_cpu_count.cache_clear()